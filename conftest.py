@@ -1,4 +1,10 @@
+import json
+import threading
 import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from zoneinfo import ZoneInfo
 
 import pytest
 
@@ -42,3 +48,130 @@ def api_rate_limit(request):
 
     # Update again after the test completes
     last_api_call = time.time()
+
+
+class StubApiBdxHandler(BaseHTTPRequestHandler):
+    """
+    Stub local de l'API d'open data Bordeaux (geojson/aggregate/ci_vcub_p).
+    Génère des points toutes les 5 minutes entre rangeStart et rangeEnd pour chaque station
+    du filtre, avec une latence configurable afin de simuler un aller-retour réseau.
+    Les connexions sont conservées (HTTP/1.1 keep-alive) et comptées dans server.connection_count.
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        """Compte chaque nouvelle connexion TCP (keep-alive) dans server.connection_count."""
+        super().setup()
+        with self.server.lock:
+            self.server.connection_count += 1
+
+    def do_GET(self):
+        """Répond à une requête geojson/aggregate avec des points générés (ou la réponse forcée de server.responses)."""
+        server = self.server
+        with server.lock:
+            server.request_count += 1
+            server.requested_urls.append(self.path)
+            response_override = server.responses.pop(0) if server.responses else None
+
+        time.sleep(server.latency)
+
+        if response_override is not None:
+            status, headers = response_override
+            self.send_response(status)
+            for key, value in headers.items():
+                self.send_header(key, value)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        query = parse_qs(urlparse(self.path).query)
+        station_filter = json.loads(query["filter"][0])["ident"]
+        station_ids = station_filter["$in"] if isinstance(station_filter, dict) else [station_filter]
+        range_start = datetime.fromisoformat(query["rangeStart"][0]).replace(tzinfo=ZoneInfo("Europe/Paris"))
+        range_end = datetime.fromisoformat(query["rangeEnd"][0]).replace(tzinfo=ZoneInfo("Europe/Paris"))
+        if server.now is not None:
+            # Les points postérieurs à "maintenant" n'existent pas encore
+            range_end = min(range_end, server.now.replace(tzinfo=ZoneInfo("Europe/Paris")))
+
+        features = []
+        for station_id in station_ids:
+            total_places = 20 + station_id % 15
+            current = range_start
+            while current < range_end:
+                step = int(current.timestamp()) // 300
+                nbvelos = (step * 7 + station_id * 3) % (total_places + 1)
+                features.append(
+                    {
+                        "type": "Feature",
+                        "properties": {
+                            "time": current.isoformat(timespec="seconds"),
+                            "gid": station_id,
+                            "ident": station_id,
+                            "nom": f"Station {station_id}",
+                            "etat": "CONNECTEE",
+                            "nbplaces": total_places - nbvelos,
+                            "nbvelos": nbvelos,
+                        },
+                    }
+                )
+                current += timedelta(minutes=5)
+
+        body = json.dumps({"type": "FeatureCollection", "features": features}).encode()
+        if server.max_features is not None and len(features) > server.max_features:
+            # Requête trop volumineuse : réponse tronquée (ChunkedEncodingError côté client)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body[: len(body) // 2])
+            self.close_connection = True
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        """Pas de log des requêtes dans la sortie des tests."""
+
+
+@pytest.fixture
+def api_bdx_stub(monkeypatch):
+    """
+    Démarre le stub de l'API Bordeaux dans un thread et redirige URL_API_BDX vers celui-ci.
+
+    Attributs utiles du serveur retourné :
+        - latency : latence (secondes) ajoutée à chaque requête
+        - request_count : nombre de requêtes reçues
+        - connection_count : nombre de connexions TCP ouvertes par les clients
+        - requested_urls : liste des urls reçues
+        - responses : liste de (status, headers) à renvoyer en priorité (simulation d'erreurs)
+        - max_features : au-delà de ce nombre de points, la réponse est tronquée (default None)
+        - now : heure de Paris (sans fuseau horaire) après laquelle aucun point n'est renvoyé (default None)
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubApiBdxHandler)
+    server.daemon_threads = True
+    server.latency = 0.0
+    server.request_count = 0
+    server.connection_count = 0
+    server.requested_urls = []
+    server.responses = []
+    server.max_features = None
+    server.now = None
+    server.lock = threading.Lock()
+
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    monkeypatch.setattr(
+        "vcub_keeper.production.data.URL_API_BDX", f"http://127.0.0.1:{server.server_address[1]}/ci_vcub_p"
+    )
+    monkeypatch.setattr("vcub_keeper.production.data.KEY_API_BDX", "stub")
+
+    yield server
+
+    server.shutdown()
+    server.server_close()
@@ -2,6 +2,7 @@ import os
 import tomllib
 from pathlib import Path
 
+import polars as pl
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -44,6 +45,7 @@ try:
     ROOT_DATA_RAW = str(ROOT_DIR) + "/data/raw/"
     ROOT_DATA_CLEAN = str(ROOT_DIR) + "/data/clean/"
     ROOT_DATA_REF = str(ROOT_DIR) + "/data/ref/"
+    ROOT_DATA_CACHE = str(ROOT_DIR) + "/data/cache/"
     ROOT_MODEL = str(ROOT_DIR) + "/model/"
     ROOT_TESTS_DATA = str(ROOT_DIR) + "/tests/data_for_tests/"
     ROOT_LLM_CONFIG = str(ROOT_DIR) + "/config_llm/"
@@ -51,6 +53,7 @@ try:
 except Exception as e:
     print("Can't have repository variables:", str(e))
     ROOT_DATA_REF = ""  # https://github.com/armgilles/vcub_keeper/issues/56#issuecomment-1007593715
+    ROOT_DATA_CACHE = ""
 
 # Only in dev
 if IS_PROD is False:
@@ -81,6 +84,43 @@ if IS_PROD is False:
 
 SEED = 2020
 
+# Nombre de stations par partition (station_bucket) du learning dataset partitionné
+# cf create/creator.py compact_learning_dataset() & reader/reader.py read_learning_dataset()
+STATION_BUCKET_SIZE = 25
+
+# Taille maximum du cache disque des réponses de l'API (cf production/data.py ApiResponseCache)
+API_CACHE_MAX_SIZE_BYTES = 1024**3  # 1 Go
+
+# Taille des unités du backfill (jours x stations) de create_learning_dataset(adaptive=True),
+# les requêtes dans chaque unité sont découpées par production/data.py AdaptiveChunkPlanner
+ADAPTIVE_UNIT_DAYS = 28
+ADAPTIVE_UNIT_SIZE_STATION = 100
+
+# Mise à jour incrémentale du learning dataset (cf create/creator.py update_learning_dataset()) : les stations
+# dont la dernière donnée a plus de UPDATE_MAX_STATION_LAG_DAYS jours de retard sur la plus récente (stations
+# hors service) ne repoussent pas le début de la période demandée à l'API
+UPDATE_MAX_STATION_LAG_DAYS = 7
+
+# Types (les plus compacts sans perte) des colonnes de l'activité des stations, appliqués par
+# les readers, la transformation des données de l'API et les features (cf reader/reader_utils.py cast_to_schema())
+SCHEMA_ACTIVITY = {
+    "station_id": pl.UInt16,
+    "available_stands": pl.UInt8,
+    "available_bikes": pl.UInt8,
+    "status": pl.UInt8,
+    "transactions_in": pl.UInt8,
+    "transactions_out": pl.UInt8,
+    "transactions_all": pl.UInt8,
+    "consecutive_no_transactions_out": pl.UInt32,
+}
+# Type des colonnes Sin_* / Cos_* (cf transform/features_factory.py get_encoding_time())
+DTYPE_ENCODING_TIME = pl.Float32
+
+# Features de regression (cf ml/prediction_station/transform.py) : décalages et fenêtres glissantes
+# (nom du suffixe : nombre de points de 10 min). Chaque fenêtre est un multiple de la précédente.
+REGRESSION_LAGS = (1, 2, 3)
+REGRESSION_ROLLING_WINDOWS = {"6": 6, "12": 12, "1d": 144, "7d": 1008}
+
 # Key api meteo
 API_METEO = os.getenv("API_METEO")
 # Key api mapbox
@@ -118,6 +158,11 @@ PROFILE_STATION_RULE = {
 # avec un certain niveau d'activité
 THRESHOLD_PROFILE_STATION = 0.06  # On ne prend pas les stations low
 
+# Registre des modèles de toutes les stations dans un seul fichier de ROOT_MODEL
+# (cf ml/cluster_utils.py create_model_registry() et ModelRegistry)
+MODEL_REGISTRY_FILE_NAME = "model_registry.bin"
+MODEL_REGISTRY_CACHE_SIZE = 256  # Nombre de modèles gardés en mémoire (LRU)
+
 
 # LLM config
 def load_toml_files(config_dir):
@@ -1,25 +1,52 @@
 import glob as glob
 import io
+import json
+import os
+import shutil
+import time
 import warnings
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
+from pathlib import Path
+from zoneinfo import ZoneInfo
 
 import pandas as pd
 import polars as pl
+import pyarrow.parquet as pq
 from dotenv import load_dotenv
 
-from vcub_keeper.config import NON_USE_STATION_ID, ROOT_DATA_CLEAN, ROOT_DATA_RAW, ROOT_DATA_REF
+from vcub_keeper.config import (
+    ADAPTIVE_UNIT_DAYS,
+    ADAPTIVE_UNIT_SIZE_STATION,
+    NON_USE_STATION_ID,
+    ROOT_DATA_CLEAN,
+    ROOT_DATA_RAW,
+    ROOT_DATA_REF,
+    STATION_BUCKET_SIZE,
+    UPDATE_MAX_STATION_LAG_DAYS,
+)
 from vcub_keeper.production.data import (
+    AdaptiveChunkPlanner,
+    ApiClient,
+    ApiResponseCache,
+    RateLimiter,
     chunk_list_,
     get_data_from_api_bdx_by_station,
-    transform_json_api_bdx_station_data_to_df,
+    normalize_json_api_bdx_station_data_,
+    process_api_bdx_station_data_,
+)
+from vcub_keeper.reader.reader import (
+    get_features_store_key_,
+    read_features,
+    read_features_store_key_,
+    read_learning_dataset,
+    read_stations_attributes,
 )
-from vcub_keeper.reader.reader import read_learning_dataset, read_stations_attributes
 from vcub_keeper.reader.reader_utils import filter_periode
 from vcub_keeper.transform.features_factory import (
-    get_consecutive_no_transactions_out,
-    get_transactions_all,
-    get_transactions_in,
-    get_transactions_out,
+    collect_streaming,
+    get_station_activity_features,
+    get_transactions,
 )
 
 load_dotenv()
@@ -92,9 +119,7 @@ def create_activity_time_series() -> None:
     activite_full = activite_full.drop_duplicates(subset=["station_id", "date"]).reset_index(drop=True)
 
     # Create features (with polars)
-    activite_full = get_transactions_in(pl.from_pandas(activite_full))
-    activite_full = get_transactions_out(activite_full)
-    activite_full = get_transactions_all(activite_full)
+    activite_full = get_transactions(pl.from_pandas(activite_full), is_sorted=True)
 
     ## Resampling
     activite_full_resample = activite_full.group_by_dynamic(
@@ -217,15 +242,156 @@ def calculate_breakpoints_(ser: list | pl.Series, bins: int) -> list:
     return [min_value + (bin_size * i) for i in range(1, bins)]
 
 
-def create_station_profilage_activity() -> None:
+def get_profile_station_activity_(ts_activity: pl.LazyFrame) -> pl.LazyFrame:
+    """
+    Aggrégation de l'activité par station (nombre de points, moyenne, médiane, écart type, quantiles
+    et max de 'transactions_out_bool'). Only use it in create_station_profilage_activity() fonction
+
+    'transactions_out_bool' valant 0 ou 1, la médiane, l'écart type et les quantiles se déduisent
+    du nombre de points et du nombre de 1 (valeurs identiques à median(), std() et quantile()) :
+    l'aggrégation est compatible avec le moteur streaming de Polars.
+    """
+
+    # On regarde si il y a eu une prise de vélo ou non toutes les 10 min
+    ts_activity = ts_activity.with_columns(transactions_out_bool=pl.col("transactions_out").clip(0, 1))
+
+    profile_station = (
+        ts_activity.filter((pl.col("status") == 1) & (pl.col("consecutive_no_transactions_out") <= 144))
+        .group_by("station_id")
+        .agg(
+            pl.col("transactions_out_bool").count().alias("total_point"),
+            pl.col("transactions_out_bool").sum().alias("total_out"),
+            pl.col("transactions_out_bool").mean().alias("mean"),
+            pl.col("transactions_out_bool").max().alias("max"),
+        )
+    )
+
+    total_point = pl.col("total_point")
+    total_no_out = pl.col("total_point") - pl.col("total_out")
+
+    def quantile_(quantile: float) -> pl.Expr:
+        # Interpolation "nearest" : valeur de rang round((n - 1) * quantile) parmi les n valeurs triées (0 puis 1)
+        return pl.when(total_point > 0).then(
+            pl.when(((total_point - 1) * quantile).round(0) >= total_no_out).then(1.0).otherwise(0.0)
+        )
+
+    profile_station = profile_station.select(
+        "station_id",
+        "total_point",
+        "mean",
+        pl.when(total_point > 0)
+        .then(pl.when(pl.col("mean") > 0.5).then(1.0).when(pl.col("mean") < 0.5).then(0.0).otherwise(0.5))
+        .alias("median"),
+        pl.when(total_point > 1)
+        .then((total_point * pl.col("mean") * (1 - pl.col("mean")) / (total_point - 1)).sqrt())
+        .alias("std"),
+        quantile_(0.95).alias("95%"),
+        quantile_(0.98).alias("98%"),
+        quantile_(0.99).alias("99%"),
+        "max",
+    )
+
+    return profile_station
+
+
+def write_station_activity_features_(
+    file_path: str, file_name: str, path_features: str, station_bucket_size: int = STATION_BUCKET_SIZE
+) -> None:
+    """
+    Calcul des features par station (get_station_activity_features()) du learning dataset par groupe de
+    station_bucket_size stations : seules les données d'un groupe de stations sont chargées en mémoire.
+    Un fichier path_features/part-KKKKK.parquet est écrit par groupe (ordre des fichiers = ordre des stations).
+
+    Only use it in create_features_store() fonction
+    """
+
+    learning_dataset = read_learning_dataset(file_path=file_path, file_name=file_name)
+    station_id_list = sorted(collect_streaming(learning_dataset.select("station_id").unique())["station_id"].to_list())
+
+    if Path(path_features).exists():
+        shutil.rmtree(path_features)
+    Path(path_features).mkdir(parents=True)
+
+    for i, station_id_chunk in enumerate(chunk_list_(station_id_list, station_bucket_size)):
+        ts_activity = (
+            read_learning_dataset(file_path=file_path, file_name=file_name, station_id=station_id_chunk)
+            .pipe(get_station_activity_features, is_sorted=True)
+            .collect()
+        )
+        ts_activity.write_parquet(f"{path_features}part-{i:05d}.parquet")
+
+
+def create_features_store(
+    file_path: str = ROOT_DATA_CLEAN,
+    file_name: str = "learning_dataset",
+    station_bucket_size: int = STATION_BUCKET_SIZE,
+) -> bool:
+    """
+    Création du feature store : les features par station du learning dataset (get_station_activity_features())
+    sont écrites dans {file_path}{file_name}_features/ avec un manifest.json contenant la clé du feature store
+    (empreinte des fichiers du learning dataset et de la version des features, cf reader/reader.py
+    get_features_store_key_()). Le feature store n'est recalculé que si cette clé a changé
+    (learning dataset mis à jour ou fonctions de features modifiées). Il est lu par reader/reader.py read_features().
+
+    Parameters
+    ----------
+    file_path : str
+        Chemin vers le dossier du learning dataset (default: ROOT_DATA_CLEAN)
+    file_name : str
+        Nom du learning dataset (default: "learning_dataset")
+    station_bucket_size : int
+        Nombre de stations par fichier (default: STATION_BUCKET_SIZE)
+
+    Returns
+    -------
+    bool
+        True si le feature store a été (re)calculé
+
+    Examples
+    --------
+    create_features_store()
+    """
+
+    path_features = f"{file_path}{file_name}_features/"
+    key = get_features_store_key_(file_path=file_path, file_name=file_name)
+
+    if read_features_store_key_(path_features) == key:
+        print("Feature store à jour : " + path_features)
+        return False
+
+    print("Création du feature store : " + path_features)
+    write_station_activity_features_(
+        file_path=file_path, file_name=file_name, path_features=path_features, station_bucket_size=station_bucket_size
+    )
+    # Le manifest est écrit en dernier : un feature store incomplet n'est jamais lu
+    with open(f"{path_features}manifest.json", "w") as f:
+        json.dump({"key": key}, f)
+
+    return True
+
+
+def create_station_profilage_activity(streaming: bool = False, features_store: bool = False) -> None:
     """
     Création d'un fichier classifiant les stations suivant leurs activités et
     leurs fréquences d'utilation (données filtré par reader_utils.py filter_periode() )
     Création du fichier `station_profile.csv` dans ROOT_DATA_REF
 
+    Les features par station sont lues dans le feature store (ROOT_DATA_CLEAN/learning_dataset_features/)
+    s'il est à jour, sinon elles sont calculées (cf reader/reader.py read_features()). Avec
+    features_store=True, le feature store est (re)calculé par groupe de stations (STATION_BUCKET_SIZE)
+    si le learning dataset ou les fonctions de features ont changé (cf create_features_store()).
+
+    Avec streaming=True, la mémoire est bornée (learning dataset plus grand que la RAM) : le filtre et
+    l'aggrégation sont exécutés par le moteur streaming de Polars (cf transform/features_factory.py
+    collect_streaming()). Les features doivent alors être lues dans un feature store à jour : une
+    ValueError est levée s'il est absent ou périmé et que features_store=False.
+
     Parameters
     ----------
-    None
+    streaming : bool
+        Calcul à mémoire bornée (default: False)
+    features_store : bool
+        Création / mise à jour du feature store dans ROOT_DATA_CLEAN (default: False)
 
     Returns
     -------
@@ -235,39 +401,31 @@ def create_station_profilage_activity() -> None:
     --------
 
     create_station_profilage_activity()
+    create_station_profilage_activity(streaming=True, features_store=True)
     """
 
-    # Lecture du fichier activité
-    ts_activity = read_learning_dataset(file_path=ROOT_DATA_CLEAN, file_name="learning_dataset")
+    if features_store:
+        create_features_store(file_path=ROOT_DATA_CLEAN, file_name="learning_dataset")
+    elif streaming:
+        # Sans feature store à jour, read_features() calcule les features (plan non streamable)
+        features_store_key = get_features_store_key_(file_path=ROOT_DATA_CLEAN, file_name="learning_dataset")
+        if read_features_store_key_(f"{ROOT_DATA_CLEAN}learning_dataset_features/") != features_store_key:
+            raise ValueError(
+                "Le feature store est absent ou périmé : le calcul des features n'est pas streamable. "
+                "Utilisez create_station_profilage_activity(streaming=True, features_store=True)."
+            )
+    ts_activity = read_features(file_path=ROOT_DATA_CLEAN, file_name="learning_dataset")
 
-    # Some features and filtering using .pipe
-    ts_activity = (
-        ts_activity.pipe(get_transactions_in)
-        .pipe(get_transactions_out)
-        .pipe(get_transactions_all)
-        .pipe(get_consecutive_no_transactions_out)
-        .pipe(filter_periode, non_use_station_id=NON_USE_STATION_ID)
+    # Filtering & Aggrégation de l'activité par stations
+    profile_station = ts_activity.pipe(filter_periode, non_use_station_id=NON_USE_STATION_ID).pipe(
+        get_profile_station_activity_
     )
 
-    # On regarde si il y a eu une prise de vélo ou non toutes les 10 min
-    ts_activity = ts_activity.with_columns(transactions_out_bool=pl.col("transactions_out").clip(0, 1))
-
-    # Aggrégation de l'activité par stations
-    profile_station = (
-        ts_activity.filter((pl.col("status") == 1) & (pl.col("consecutive_no_transactions_out") <= 144))
-        .group_by("station_id")
-        .agg(
-            pl.col("transactions_out_bool").count().alias("total_point"),
-            pl.col("transactions_out_bool").mean().alias("mean"),
-            pl.col("transactions_out_bool").median().alias("median"),
-            pl.col("transactions_out_bool").std().alias("std"),
-            pl.col("transactions_out_bool").quantile(0.95).alias("95%"),
-            pl.col("transactions_out_bool").quantile(0.98).alias("98%"),
-            pl.col("transactions_out_bool").quantile(0.99).alias("99%"),
-            pl.col("transactions_out_bool").max().alias("max"),
-        )
-    )
-    profile_station = profile_station.sort("mean").collect()
+    if streaming:
+        profile_station = collect_streaming(profile_station)
+    else:
+        profile_station = profile_station.collect()
+    profile_station = profile_station.sort("mean")
 
     # Calculate breakpoints (bins in Pandas) to use it in Polars cut
     breakpoints = calculate_breakpoints_(profile_station["mean"], 4)
@@ -387,8 +545,440 @@ def generate_date_intervals_(start_date: str, stop_date: str, chunk_days: int =
     return intervals
 
 
+def generate_backfill_units_(
+    station_id_list: list, intervals: list[dict[str, str]], chunk_size: int = 25
+) -> list[dict[str, str | list]]:
+    """
+    Génère les unités de travail (intervalle x chunk de stations) du backfill
+    de create_learning_dataset().
+
+    Parameters
+    ----------
+    station_id_list : list
+        Liste de station_id
+    intervals : list[dict[str, str]]
+        Intervalles de dates issus de generate_date_intervals_()
+    chunk_size : int, optional
+        Nombre maximum de stations par appel à l'API (default: 25).
+
+    Returns
+    -------
+    list[dict[str, str | list]]
+        Liste d'unités avec les clés "unit_id", "start_date", "stop_date" et "station_id".
+
+    Example
+    -------
+    units = generate_backfill_units_(station_id_list, intervals, chunk_size=25)
+    """
+    units = []
+    for interval in intervals:
+        for chunk_index, station_id_list_chunk in enumerate(chunk_list_(station_id_list, chunk_size), start=1):
+            units.append(
+                {
+                    "unit_id": f"{interval['start_date']}_{interval['stop_date']}_chunk_{chunk_index:03d}",
+                    "start_date": interval["start_date"],
+                    "stop_date": interval["stop_date"],
+                    "station_id": station_id_list_chunk,
+                }
+            )
+    return units
+
+
+def write_parquet_by_station_(station_df: pl.DataFrame, file_path: str) -> None:
+    """
+    Écrit un DataFrame trié par station_id et date dans un fichier parquet avec un row group
+    par station : les statistiques (min / max) de station_id et date de chaque row group
+    permettent de ne lire que la station demandée. Le fichier est d'abord écrit en .tmp puis renommé.
+
+    Parameters
+    ----------
+    station_df : pl.DataFrame
+        Données triées par station_id et date
+    file_path : str
+        Chemin du fichier parquet
+
+    Returns
+    -------
+    None
+
+    Example
+    -------
+    write_parquet_by_station_(station_df, file_path=f"{path_parts}{unit_id}.parquet")
+    """
+    with pq.ParquetWriter(file_path + ".tmp", station_df.to_arrow().schema) as writer:
+        for station_df_station in station_df.partition_by("station_id", maintain_order=True):
+            writer.write_table(station_df_station.to_arrow())
+    os.replace(file_path + ".tmp", file_path)
+
+
+def get_learning_dataset_partition_(station_df: pl.DataFrame) -> dict[tuple[str, int], pl.DataFrame]:
+    """
+    Découpe des données du learning dataset suivant le partitionnement hive
+    month=YYYY-MM/station_bucket=K (K = station_id // STATION_BUCKET_SIZE).
+
+    Parameters
+    ----------
+    station_df : pl.DataFrame
+        Données du learning dataset
+
+    Returns
+    -------
+    dict[tuple[str, int], pl.DataFrame]
+        {(month, station_bucket): données de la partition triées par station_id et date}
+
+    Example
+    -------
+    partitions = get_learning_dataset_partition_(station_df)
+    """
+    station_df = station_df.with_columns(
+        month=pl.col("date").dt.strftime("%Y-%m"),
+        station_bucket=pl.col("station_id") // STATION_BUCKET_SIZE,
+    )
+    return {
+        partition: partition_df.drop("month", "station_bucket").sort(["station_id", "date"])
+        for partition, partition_df in station_df.partition_by(["month", "station_bucket"], as_dict=True).items()
+    }
+
+
+def fetch_backfill_unit_(
+    unit: dict,
+    path_parts: str,
+    api_client: ApiClient | None = None,
+    chunk_planner: AdaptiveChunkPlanner | None = None,
+) -> int:
+    """
+    Récupère une unité de travail (intervalle x chunk) depuis l'API de Bordeaux et écrit
+    ses données brutes (normalize_json_api_bdx_station_data_()) dans son propre fichier parquet.
+    Le fichier est trié par station et date avec un row group par station. Il est d'abord écrit
+    en .tmp puis renommé afin qu'une interruption ne laisse jamais de fichier partiel.
+
+    Parameters
+    ----------
+    unit : dict
+        Unité issue de generate_backfill_units_()
+    path_parts : str
+        Dossier dans lequel écrire le fichier parquet de l'unité
+    api_client : ApiClient | None
+        Client HTTP (pool de connexions, limiteur de débit) partagé par l'ensemble des workers
+    chunk_planner : AdaptiveChunkPlanner | None
+        Planificateur adaptatif partagé par l'ensemble des workers, découpe l'unité en requêtes
+        (default is None, une seule requête par unité)
+
+    Returns
+    -------
+    int
+        Nombre de lignes écrites (0 si l'API ne renvoie aucune donnée, aucun fichier n'est alors écrit)
+
+    Example
+    -------
+    n_rows = fetch_backfill_unit_(unit, path_parts=path_parts, api_client=api_client)
+    """
+    # Réponses brutes décodées directement en colonnes typées
+    station_bytes = get_data_from_api_bdx_by_station(
+        station_id=unit["station_id"],
+        start_date=unit["start_date"],
+        stop_date=unit["stop_date"],
+        chunk_size_station=len(unit["station_id"]) + 1,  # Unité déjà découpée en chunk
+        api_client=api_client,
+        chunk_planner=chunk_planner,
+        as_bytes=True,
+    )
+    station_df = normalize_json_api_bdx_station_data_(station_bytes).collect().sort(["station_id", "date"])
+
+    if len(station_df) == 0:
+        return 0
+
+    # Un row group par station : permet à compact_learning_dataset() de ne lire qu'une station à la fois
+    write_parquet_by_station_(station_df, file_path=f"{path_parts}{unit['unit_id']}.parquet")
+
+    return len(station_df)
+
+
+def read_backfill_manifest_(path_parts: str) -> dict[str, dict]:
+    """
+    Lecture du manifest du backfill (path_parts/manifest.json) qui référence les unités
+    terminées et en erreur. Retourne un manifest vide s'il n'existe pas encore.
+
+    Parameters
+    ----------
+    path_parts : str
+        Dossier des fichiers parquet des unités
+
+    Returns
+    -------
+    dict[str, dict]
+        {"completed": {unit_id: {"station_id": [...], "n_rows": int}}, "failed": {unit_id: message d'erreur}}
+
+    Example
+    -------
+    manifest = read_backfill_manifest_(path_parts)
+    """
+    manifest_file = Path(path_parts) / "manifest.json"
+    if not manifest_file.exists():
+        return {"completed": {}, "failed": {}}
+
+    with open(manifest_file) as f:
+        return json.load(f)
+
+
+def write_backfill_manifest_(manifest: dict[str, dict], path_parts: str) -> None:
+    """
+    Écriture (atomique) du manifest du backfill dans path_parts/manifest.json
+
+    Parameters
+    ----------
+    manifest : dict[str, dict]
+        Manifest issu de read_backfill_manifest_()
+    path_parts : str
+        Dossier des fichiers parquet des unités
+
+    Returns
+    -------
+    None
+
+    Example
+    -------
+    write_backfill_manifest_(manifest, path_parts)
+    """
+    manifest_file = Path(path_parts) / "manifest.json"
+    with open(f"{manifest_file}.tmp", "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(f"{manifest_file}.tmp", manifest_file)
+
+
+def run_backfill_(
+    units: list[dict],
+    path_parts: str,
+    max_workers: int = 1,
+    max_requests_per_second: float | None = None,
+    chunk_planner: AdaptiveChunkPlanner | None = None,
+    cache: ApiResponseCache | None = None,
+) -> dict[str, dict]:
+    """
+    Exécute les unités de travail du backfill sur un pool de workers (ThreadPoolExecutor) borné,
+    avec une limitation de débit par host et un suivi de l'avancement. Les workers partagent un même
+    ApiClient (connexions keep-alive, retry avec backoff) dont les métriques sont affichées à la fin.
+    Chaque unité écrit son résultat indépendamment (cf fetch_backfill_unit_()) et le manifest
+    (path_parts/manifest.json) est mis à jour dès qu'une unité se termine ou échoue.
+
+    Les unités déjà présentes dans le manifest comme terminées (pour la même liste de stations)
+    ne sont pas récupérées à nouveau : relancer la fonction reprend le backfill là où il s'est arrêté.
+    Les unités du manifest absentes de units (construction précédente sur une autre période) sont
+    supprimées du manifest et du dossier path_parts.
+
+    Parameters
+    ----------
+    units : list[dict]
+        Unités issues de generate_backfill_units_()
+    path_parts : str
+        Dossier dans lequel écrire les fichiers parquet des unités
+    max_workers : int, optional
+        Nombre maximum d'unités récupérées en parallèle (default: 1).
+    max_requests_per_second : float | None, optional
+        Nombre maximum de requêtes par seconde vers l'API (default: None, pas de limite).
+    chunk_planner : AdaptiveChunkPlanner | None, optional
+        Planificateur adaptatif des requêtes de chaque unité (default: None, une requête par unité).
+    cache : ApiResponseCache | None, optional
+        Cache disque des réponses de l'API (default: None, pas de cache).
+
+    Returns
+    -------
+    dict[str, dict]
+        Manifest du backfill (cf read_backfill_manifest_())
+
+    Example
+    -------
+    manifest = run_backfill_(units, path_parts=path_parts, max_workers=8, max_requests_per_second=4)
+    """
+    if max_workers < 1:
+        raise ValueError("max_workers doit être supérieur ou égal à 1.")
+
+    rate_limiter = RateLimiter(max_requests_per_second) if max_requests_per_second is not None else None
+    api_client = ApiClient(pool_maxsize=max(max_workers, 10), rate_limiter=rate_limiter, cache=cache)
+    Path(path_parts).mkdir(parents=True, exist_ok=True)
+
+    manifest = read_backfill_manifest_(path_parts)
+
+    # Le manifest ne référence que les unités de cette construction : les unités d'une construction
+    # précédente (autre période ou autres stations) sont supprimées pour ne pas être compactées
+    unit_ids = {unit["unit_id"] for unit in units}
+    stale_unit_ids = [unit_id for unit_id in manifest["completed"] if unit_id not in unit_ids]
+    for unit_id in stale_unit_ids:
+        manifest["completed"].pop(unit_id)
+        Path(f"{path_parts}{unit_id}.parquet").unlink(missing_ok=True)
+    manifest["failed"] = {unit_id: error for unit_id, error in manifest["failed"].items() if unit_id in unit_ids}
+    if len(stale_unit_ids) > 0:
+        print(f"Suppression de {len(stale_unit_ids)} unités d'une construction précédente dans {path_parts}")
+        write_backfill_manifest_(manifest, path_parts)
+
+    # Reprise : on ne récupère que les unités manquantes ou en erreur
+    units_to_fetch = [
+        unit
+        for unit in units
+        if manifest["completed"].get(unit["unit_id"], {}).get("station_id") != list(unit["station_id"])
+    ]
+    total_units = len(units_to_fetch)
+    if total_units < len(units):
+        print(f"Reprise du backfill : {len(units) - total_units} unités déjà récupérées sur {len(units)}")
+
+    start = time.perf_counter()
+
+    with api_client, ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(fetch_backfill_unit_, unit, path_parts, api_client, chunk_planner): unit
+            for unit in units_to_fetch
+        }
+        for unit_index, future in enumerate(as_completed(futures), start=1):
+            unit = futures[future]
+            unit_id = unit["unit_id"]
+            try:
+                n_rows = future.result()
+                manifest["completed"][unit_id] = {"station_id": list(unit["station_id"]), "n_rows": n_rows}
+                manifest["failed"].pop(unit_id, None)
+            except Exception as e:
+                manifest["failed"][unit_id] = str(e)
+                print(f"Erreur lors de la récupération des données pour l'unité {unit_id}: {e}")
+            write_backfill_manifest_(manifest, path_parts)
+
+            elapsed = time.perf_counter() - start
+            remaining = elapsed / unit_index * (total_units - unit_index)
+            print(
+                f"Backfill : {unit_index} / {total_units} unités ({len(manifest['failed'])} en erreur) "
+                f"- {elapsed:.0f}s écoulées, ~{remaining:.0f}s restantes"
+            )
+
+    metrics = api_client.get_metrics()
+    if metrics["n_requests"] > 0:
+        print(
+            f"API : {metrics['n_requests']} requêtes, {metrics['n_retries']} nouvelles tentatives, "
+            f"{metrics['n_cache_hits']} réponses en cache, "
+            f"latence p50 {metrics['latency_p50']:.2f}s / p95 {metrics['latency_p95']:.2f}s"
+        )
+    if chunk_planner is not None:
+        print(
+            f"Plan adaptatif final : {chunk_planner.chunk_size_station} stations x {chunk_planner.chunk_days} jours "
+            f"par requête ({len(chunk_planner.history)} requêtes)"
+        )
+
+    return manifest
+
+
+def compact_learning_dataset(
+    path_to_export: str, file_name: str = "learning_dataset", partitioned: bool = False
+) -> None:
+    """
+    Étape finale de create_learning_dataset() : transforme les données brutes de toutes les
+    unités (path_to_export/{file_name}_parts/*.parquet) en un seul fichier
+    path_to_export/{file_name}.parquet, tel qu'attendu par read_learning_dataset().
+
+    La transformation est faite station par station (lecture du seul row group de la station
+    dans les fichiers des unités qui la contiennent) et chaque station est ajoutée au fichier
+    final via un ParquetWriter : la mémoire est bornée par l'historique d'une station et non
+    par l'ensemble des données. Le fichier final est trié par station_id et date.
+
+    Avec partitioned=True, le learning dataset est écrit dans le dossier path_to_export/{file_name}/
+    partitionné (hive) par mois et groupe de stations : month=YYYY-MM/station_bucket=K/part-0.parquet,
+    avec un row group par station dans chaque fichier (cf read_learning_dataset()).
+
+    Les données ajoutées par update_learning_dataset() (dossier {file_name}_append/) et un learning
+    dataset existant dans l'autre format (fichier ou dossier partitionné) sont supprimés.
+
+    Parameters
+    ----------
+    path_to_export : str
+        Chemin vers le dossier d'export.
+    file_name : str, optional
+        Nom du fichier d'export (default: "learning_dataset").
+    partitioned : bool, optional
+        Export partitionné par mois et groupe de stations (default: False).
+
+    Returns
+    -------
+    None
+
+    Example
+    -------
+    compact_learning_dataset(path_to_export=ROOT_DATA_CLEAN, file_name="learning_dataset")
+    """
+    path_parts = f"{path_to_export}{file_name}_parts/"
+    manifest = read_backfill_manifest_(path_parts)
+
+    # Fichiers des unités pour chaque station (d'après le manifest)
+    part_files_by_station = {}
+    for unit_id, unit in sorted(manifest["completed"].items()):
+        if unit["n_rows"] == 0:
+            continue
+        for station_id in unit["station_id"]:
+            part_files_by_station.setdefault(station_id, []).append(f"{path_parts}{unit_id}.parquet")
+
+    if len(part_files_by_station) == 0:
+        raise ValueError(f"Aucune donnée à compacter dans {path_parts}")
+
+    if partitioned:
+        file_export = f"{path_to_export}{file_name}"
+    else:
+        file_export = f"{path_to_export}{file_name}.parquet"
+    print(f"Export des données dans : {file_export}")
+
+    # Un ParquetWriter par fichier de sortie ((month, station_bucket) si partitioned), une station à la fois
+    writers = {}
+    try:
+        for station_id in sorted(part_files_by_station):
+            station_df = process_api_bdx_station_data_(
+                pl.scan_parquet(part_files_by_station[station_id]).filter(pl.col("station_id") == station_id)
+            ).collect()
+
+            if partitioned:
+                station_partitions = get_learning_dataset_partition_(station_df)
+                # Les stations sont triées : les fichiers des groupes de stations précédents sont terminés
+                for partition in [
+                    partition for partition in writers if partition[1] < station_id // STATION_BUCKET_SIZE
+                ]:
+                    writers.pop(partition).close()
+            else:
+                station_partitions = {None: station_df}
+
+            for partition, partition_df in station_partitions.items():
+                if partition not in writers:
+                    if partition is None:
+                        writer_file = file_export + ".tmp"
+                    else:
+                        month, station_bucket = partition
+                        writer_dir = Path(f"{file_export}.tmp/month={month}/station_bucket={station_bucket}")
+                        writer_dir.mkdir(parents=True, exist_ok=True)
+                        writer_file = f"{writer_dir}/part-0.parquet"
+                    writers[partition] = pq.ParquetWriter(writer_file, partition_df.to_arrow().schema)
+                writers[partition].write_table(partition_df.to_arrow())
+    finally:
+        for writer in writers.values():
+            writer.close()
+
+    if partitioned and Path(file_export).exists():
+        shutil.rmtree(file_export)
+    os.replace(file_export + ".tmp", file_export)
+
+    # Le learning dataset est reconstruit entièrement : les ajouts de update_learning_dataset()
+    # ({file_name}_append/) et l'export dans l'autre format ne doivent plus être lus
+    path_append = f"{path_to_export}{file_name}_append/"
+    if Path(path_append).exists():
+        shutil.rmtree(path_append)
+    if partitioned:
+        Path(f"{path_to_export}{file_name}.parquet").unlink(missing_ok=True)
+    elif Path(f"{path_to_export}{file_name}").is_dir():
+        shutil.rmtree(f"{path_to_export}{file_name}")
+
+
 def create_learning_dataset(
-    start_time: str, end_time: str, path_to_export: str, file_name: str = "learning_dataset"
+    start_time: str,
+    end_time: str,
+    path_to_export: str,
+    file_name: str = "learning_dataset",
+    max_workers: int = 1,
+    max_requests_per_second: float | None = None,
+    allow_failed_units: bool = False,
+    partitioned: bool = False,
+    adaptive: bool = False,
+    cache: ApiResponseCache | None = None,
 ) -> None:
     """
     Permets de créer le learning dataset à partir de données de l'API
@@ -397,7 +987,18 @@ def create_learning_dataset(
     de 4 jours. Idem pour le nombre de stations, on les découpe en chunks
     de 25 stations afin de ne pas faire planter l'API.
 
+    Chaque couple (intervalle, chunk) est une unité de travail exécutée sur un pool
+    de max_workers workers (cf run_backfill_()) et écrite dans son propre fichier parquet
+    dans le dossier path_to_export/{file_name}_parts/, avec un manifest des unités terminées
+    et en erreur. En cas d'interruption ou d'erreur, relancer la fonction ne récupère que
+    les unités manquantes.
+
+    Avec adaptive=True, les unités sont plus grandes (ADAPTIVE_UNIT_DAYS jours x ADAPTIVE_UNIT_SIZE_STATION
+    stations) et découpées en requêtes par un AdaptiveChunkPlanner partagé : la taille des requêtes
+    augmente tant que l'API répond vite et diminue sur un Timeout / ChunkedEncodingError.
+
     Export le résulatat dans le dossier path_to_export sous le nom learning_dataset.parquet (par défaut)
+    via compact_learning_dataset().
 
     Parameters
     ----------
@@ -409,6 +1010,19 @@ def create_learning_dataset(
         Chemin vers le dossier d'export.
     file_name : str, optional
         Nom du fichier d'export (default: "learning_dataset").
+    max_workers : int, optional
+        Nombre maximum d'appels simultanés à l'API (default: 1).
+    max_requests_per_second : float | None, optional
+        Nombre maximum de requêtes par seconde vers l'API (default: None, pas de limite).
+    allow_failed_units : bool, optional
+        Si True, exporte le learning dataset même si des unités sont en erreur (default: False).
+    partitioned : bool, optional
+        Export partitionné par mois et groupe de stations (cf compact_learning_dataset()) (default: False).
+    adaptive : bool, optional
+        Taille des requêtes adaptative (cf AdaptiveChunkPlanner) (default: False).
+    cache : ApiResponseCache | None, optional
+        Cache disque des réponses de l'API : un backfill relancé sur une période passée ne fait
+        aucun appel réseau (default: None, pas de cache).
 
     Returns
     -------
@@ -417,59 +1031,208 @@ def create_learning_dataset(
     Exemple
     -------
     create_learning_dataset(start_time="2022-01-01", end_time="2025-02-22",
-                            parh_to_export="ROOT_DATA_CLEAN", file_name="learning_dataset")
+                            parh_to_export="ROOT_DATA_CLEAN", file_name="learning_dataset",
+                            max_workers=8, max_requests_per_second=4)
     """
 
     # Récupération de la liste des id des stations
     stations_attributes = read_stations_attributes(path_directory=ROOT_DATA_REF)
     station_id_list = stations_attributes["station_id"].to_list()
 
-    # On découpe la période en intervalles de 5 jours pour ne pas faire planter l'API
-    intervals = generate_date_intervals_(start_date=start_time, stop_date=end_time, chunk_days=4)
-
-    # Initialisation et récupération des données
-    station_df = pl.DataFrame()
-    # Découpage en intervals de temps
-    for interval in intervals:
-        start_date = interval["start_date"]
-        stop_date = interval["stop_date"]
-        print(f"Récupération des données sur la période de : {start_date} - {stop_date}")
-
-        chunk_size = 25
-        # Si beaucoup de stations, on les découpe en chunks
-        if len(station_id_list) >= chunk_size:
-            total_chunks = len(list(chunk_list_(station_id_list, chunk_size)))
-
-            for chunk_index, station_id_list_chunk in enumerate(chunk_list_(station_id_list, chunk_size), start=1):
-                print(f"Récupération des données pour le chunk {chunk_index} / {total_chunks}")
-                try:
-                    station_json_chunk = get_data_from_api_bdx_by_station(
-                        station_id=station_id_list_chunk,
-                        start_date=start_date,
-                        stop_date=stop_date,
-                    )
-
-                    if "station_json" not in locals():
-                        station_json = station_json_chunk
-                    else:
-                        station_json["features"].extend(station_json_chunk["features"])
-                except Exception as e:
-                    print(f"Erreur lors de la récupération des données pour le chunk {station_id_list_chunk}: {e}")
+    if adaptive:
+        # Unités plus grandes, découpées en requêtes par le planificateur adaptatif
+        intervals = generate_date_intervals_(start_date=start_time, stop_date=end_time, chunk_days=ADAPTIVE_UNIT_DAYS)
+        units = generate_backfill_units_(
+            station_id_list=station_id_list, intervals=intervals, chunk_size=ADAPTIVE_UNIT_SIZE_STATION
+        )
+        chunk_planner = AdaptiveChunkPlanner()
+    else:
+        # On découpe la période en intervalles de 4 jours et les stations en chunks de 25 pour ne pas faire planter l'API
+        intervals = generate_date_intervals_(start_date=start_time, stop_date=end_time, chunk_days=4)
+        units = generate_backfill_units_(station_id_list=station_id_list, intervals=intervals, chunk_size=25)
+        chunk_planner = None
+    print(f"Récupération des données sur la période de : {start_time} - {end_time} ({len(units)} unités)")
+
+    # Récupération des données, chaque unité est écrite dans son propre fichier
+    path_parts = f"{path_to_export}{file_name}_parts/"
+    manifest = run_backfill_(
+        units=units,
+        path_parts=path_parts,
+        max_workers=max_workers,
+        max_requests_per_second=max_requests_per_second,
+        chunk_planner=chunk_planner,
+        cache=cache,
+    )
 
-        else:
-            # Récupération des données de l'API
-            station_json = get_data_from_api_bdx_by_station(
-                station_id=station_id_list,
-                start_date=start_date,
-                stop_date=stop_date,
+    unit_ids = {unit["unit_id"] for unit in units}
+    failed_units = sorted(unit_id for unit_id in manifest["failed"] if unit_id in unit_ids)
+    if len(failed_units) > 0:
+        print(f"{len(failed_units)} unités en erreur (cf {path_parts}manifest.json) : {failed_units}")
+        if not allow_failed_units:
+            raise RuntimeError(
+                f"{len(failed_units)} unités en erreur, relancer create_learning_dataset() pour les récupérer "
+                "(ou utiliser allow_failed_units=True)."
             )
 
-    # Transformation des données en DataFrame
-    df_temp = transform_json_api_bdx_station_data_to_df(station_json).collect()
+    compact_learning_dataset(path_to_export=path_to_export, file_name=file_name, partitioned=partitioned)
 
-    # Concaténation des données
-    station_df = pl.concat([station_df, df_temp])
 
-    # Export
-    print(f"Export des données dans le fichier : {path_to_export}{file_name}.parquet")
-    station_df.write_parquet(f"{path_to_export}{file_name}.parquet")
+def get_last_complete_window_(now: datetime | None = None) -> datetime:
+    """
+    Date de la dernière fenêtre de 10 min terminée (heure de Paris, sans fuseau horaire) : la date d'une
+    ligne resamplée est la borne droite de sa fenêtre (cf production/data.py process_api_bdx_station_data_()),
+    une ligne dont la date est postérieure est encore incomplète. Est uniquement utilisé par
+    update_learning_dataset()
+
+    Parameters
+    ----------
+    now : datetime | None
+        Heure de Paris sans fuseau horaire (default: None, maintenant)
+
+    Returns
+    -------
+    datetime
+
+    Example
+    -------
+    last_complete_window = get_last_complete_window_()
+    """
+    if now is None:
+        now = datetime.now(ZoneInfo("Europe/Paris")).replace(tzinfo=None)
+
+    return now.replace(minute=now.minute - now.minute % 10, second=0, microsecond=0)
+
+
+def update_learning_dataset(
+    path_to_export: str,
+    file_name: str = "learning_dataset",
+    end_time: str | None = None,
+    max_workers: int = 1,
+    adaptive: bool = False,
+    cache: ApiResponseCache | None = None,
+) -> None:
+    """
+    Mise à jour incrémentale du learning dataset : récupère uniquement les données postérieures
+    à la date max de chaque station du learning dataset existant et les ajoute dans un nouveau
+    fichier path_to_export/{file_name}_append/{file_name}_[date].parquet sans réécrire les
+    données existantes (lu par read_learning_dataset()). Si le learning dataset est partitionné
+    (cf compact_learning_dataset()), un nouveau fichier part-[date].parquet est ajouté dans chaque
+    partition concernée.
+
+    Les transactions_* de la première ligne ajoutée sont calculées à partir du dernier état
+    connu de la station (cf process_api_bdx_station_data_()). La fenêtre de 10 min en cours n'est
+    pas ajoutée (cf get_last_complete_window_()) : elle le sera complète lors de la mise à jour suivante.
+
+    Les données sont demandées à l'API à partir de la plus ancienne des dernières dates des stations de
+    ROOT_DATA_REF, sans tenir compte des stations dont la dernière donnée a plus de
+    UPDATE_MAX_STATION_LAG_DAYS jours de retard (stations hors service).
+
+    Parameters
+    ----------
+    path_to_export : str
+        Chemin vers le dossier du learning dataset.
+    file_name : str, optional
+        Nom du fichier (default: "learning_dataset").
+    end_time : str | None, optional
+        Date de fin au format "YYYY-MM-DD" (default: None, jusqu'à aujourd'hui inclus).
+    max_workers : int, optional
+        Nombre maximum d'appels simultanés à l'API (default: 1).
+    adaptive : bool, optional
+        Récupère toute la période avec une taille de requête adaptative (cf AdaptiveChunkPlanner),
+        max_workers est alors ignoré (default: False).
+    cache : ApiResponseCache | None, optional
+        Cache disque des réponses de l'API (default: None, pas de cache).
+
+    Returns
+    -------
+    None
+
+    Exemple
+    -------
+    update_learning_dataset(path_to_export=ROOT_DATA_CLEAN, file_name="learning_dataset")
+    """
+
+    # Dernier état connu de chaque station
+    previous_state = (
+        read_learning_dataset(file_path=path_to_export, file_name=file_name)
+        .group_by("station_id")
+        .agg(pl.all().sort_by("date").last())
+        .select("station_id", "date", "status", "available_stands", "available_bikes")
+        .collect()
+    )
+    if end_time is None:
+        end_time = (datetime.now() + timedelta(days=1)).strftime("%Y-%m-%d")
+
+    # Récupération de la liste des id des stations
+    stations_attributes = read_stations_attributes(path_directory=ROOT_DATA_REF)
+    station_id_list = stations_attributes["station_id"].to_list()
+
+    # Début de la période : dernière date des stations demandées, hors stations sans données récentes
+    stations_state = previous_state.filter(pl.col("station_id").is_in(station_id_list))
+    if len(stations_state) == 0:
+        stations_state = previous_state
+    min_date = stations_state["date"].max() - timedelta(days=UPDATE_MAX_STATION_LAG_DAYS)
+    stations_late = stations_state.filter(pl.col("date") < min_date)
+    if len(stations_late) > 0:
+        print(
+            f"{len(stations_late)} station(s) sans données depuis plus de {UPDATE_MAX_STATION_LAG_DAYS} jours "
+            f"ignorée(s) pour le début de la période : {stations_late['station_id'].sort().to_list()}"
+        )
+    start_time = stations_state.filter(pl.col("date") >= min_date)["date"].min().strftime("%Y-%m-%d")
+
+    if adaptive:
+        intervals = [{"start_date": start_time, "stop_date": end_time}]
+        chunk_planner = AdaptiveChunkPlanner()
+    else:
+        intervals = generate_date_intervals_(start_date=start_time, stop_date=end_time, chunk_days=4)
+        chunk_planner = None
+    station_raw_list = []
+    # Un seul client (pool de connexions keep-alive) pour l'ensemble des intervalles
+    with ApiClient(pool_maxsize=max(max_workers, 10), cache=cache) as api_client:
+        for interval in intervals:
+            print(f"Récupération des données sur la période de : {interval['start_date']} - {interval['stop_date']}")
+            station_bytes = get_data_from_api_bdx_by_station(
+                station_id=station_id_list,
+                start_date=interval["start_date"],
+                stop_date=interval["stop_date"],
+                max_workers=max_workers,
+                api_client=api_client,
+                chunk_planner=chunk_planner,
+                as_bytes=True,
+            )
+            station_raw_df = normalize_json_api_bdx_station_data_(station_bytes).collect()
+            if len(station_raw_df) > 0:
+                station_raw_list.append(station_raw_df)
+
+    if len(station_raw_list) == 0:
+        print("Aucune nouvelle donnée à ajouter au learning dataset.")
+        return
+
+    # La fenêtre de 10 min en cours est incomplète : elle n'est pas ajoutée
+    station_df = (
+        process_api_bdx_station_data_(pl.concat(station_raw_list).lazy(), previous_state=previous_state.lazy())
+        .filter(pl.col("date") <= get_last_complete_window_())
+        .collect()
+    )
+
+    if len(station_df) == 0:
+        print("Aucune nouvelle donnée à ajouter au learning dataset.")
+        return
+
+    update_id = station_df["date"].max().strftime("%Y%m%d%H%M%S")
+
+    # Learning dataset partitionné : un nouveau fichier dans chaque partition concernée
+    if Path(f"{path_to_export}{file_name}").is_dir():
+        print(f"Ajout de {len(station_df)} lignes dans : {path_to_export}{file_name}")
+        for (month, station_bucket), partition_df in get_learning_dataset_partition_(station_df).items():
+            partition_dir = Path(f"{path_to_export}{file_name}/month={month}/station_bucket={station_bucket}")
+            partition_dir.mkdir(parents=True, exist_ok=True)
+            write_parquet_by_station_(partition_df, file_path=f"{partition_dir}/part-{update_id}.parquet")
+        return
+
+    path_append = f"{path_to_export}{file_name}_append/"
+    Path(path_append).mkdir(parents=True, exist_ok=True)
+    file_export = f"{path_append}{file_name}_{update_id}.parquet"
+    print(f"Ajout de {len(station_df)} lignes dans le fichier : {file_export}")
+    station_df.write_parquet(file_export + ".tmp")
+    os.replace(file_export + ".tmp", file_export)
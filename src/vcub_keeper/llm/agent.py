@@ -17,6 +17,7 @@ from vcub_keeper.llm.crewai.tool_python import (
     get_prediction_station,
 )
 from vcub_keeper.llm.utils_agent import set_current_dataframes
+from vcub_keeper.ml.prediction_station.transform import RegressionFeatureCache
 
 load_dotenv()
 
@@ -125,6 +126,8 @@ def create_agent(chat: ChatMistralAI, list_dfs: list[pl.DataFrame, pl.LazyFrame]
         {
             "last_info_station_pd": last_info_station_pd,
             "df_historical_station": df_historical_station,  # Keep as LazyFrame
+            # Features de regression de toutes les stations calculées au premier appel de get_prediction_station
+            "regression_feature_cache": RegressionFeatureCache(df_historical_station),
         }
     )
 
@@ -9,7 +9,7 @@ from langchain_core.tools import tool
 from vcub_keeper.llm.utils_agent import get_current_dataframe
 from vcub_keeper.ml.prediction_station.model import get_feature_to_use_for_model, train_model_for_station
 from vcub_keeper.ml.prediction_station.production import make_prediction_for_user
-from vcub_keeper.ml.prediction_station.transform import build_feat_for_regression
+from vcub_keeper.ml.prediction_station.transform import RegressionFeatureCache
 from vcub_keeper.ml.prediction_station.utils import create_target
 
 
@@ -218,18 +218,16 @@ def get_prediction_station(params: str) -> int | pl.DataFrame:
     horizon_prediction = str(params.get("horizon_prediction"))
     # return_df = ast.literal_eval(params.get("return_df"))
 
-    # Get df_historical_station datatframe from thread-local storage
-    df_historical_station = get_current_dataframe("df_historical_station")
+    # Get regression features cache (all stations) from thread-local storage
+    feature_cache = get_current_dataframe("regression_feature_cache")
+    if feature_cache is None:
+        feature_cache = RegressionFeatureCache(get_current_dataframe("df_historical_station"))
 
-    # Filter station
-    station_to_pred = df_historical_station.filter(pl.col("station_id") == target_station_id)
     feat_to_use = get_feature_to_use_for_model(target_col=target_col)
+    # Features of the station (computed once for all stations)
+    station_to_pred = feature_cache.get_station(target_station_id, target_col=target_col)
     # Create target
     station_to_pred = create_target(station_to_pred, target_col=target_col, horizon_prediction=horizon_prediction)
-    # Create features
-    station_to_pred = build_feat_for_regression(
-        station_to_pred=station_to_pred, target_col=target_col
-    )  # collect lazyframe
 
     # Train model
     model = train_model_for_station(station_to_pred=station_to_pred, feat_to_use=feat_to_use)
@@ -13,19 +13,22 @@ from vcub_keeper.config import (
     ROOT_DATA_REF,
     SEED,
 )
-from vcub_keeper.reader.reader import read_station_profile
+from vcub_keeper.ml.cluster_utils import ModelRegistry
+from vcub_keeper.reader.reader import get_station_profile_lookup
 from vcub_keeper.reader.reader_utils import filter_periode
 from vcub_keeper.transform.features_factory import process_data_cluster
 
 
-def train_cluster_station(data: pl.LazyFrame, station_id: int, profile_station_activity: str | None = None) -> Pipeline:
+def train_cluster_station(
+    data: pl.LazyFrame, station_id: int, profile_station_activity: str | None = None, n_jobs: int = -1
+) -> Pipeline:
     """
     Train estimator on a single station_id Time Serie.
     Process some features.
     Filter data based on filter_periode() function.
     Filter data based on status = 1.
     Use sclaler / pca / IsolationForest (contamination based on PROFILE_STATION_RULE).
-    contamination is based on station profile (from read_station_profile() ).
+    contamination is based on station profile (from get_station_profile_lookup() ).
 
     Parameters
     ----------
@@ -35,6 +38,9 @@ def train_cluster_station(data: pl.LazyFrame, station_id: int, profile_station_a
         ID Station
     profile_station_activity : str
         Profile type of station (ex: "very high")
+    n_jobs : int
+        Nombre de threads de l'IsolationForest (default: -1, tous les coeurs). 1 lorsque les stations
+        sont apprises en parallèle (cf ml/train_cluster.py train_cluster_stations()).
 
     Returns
     -------
@@ -62,10 +68,7 @@ def train_cluster_station(data: pl.LazyFrame, station_id: int, profile_station_a
 
     # Lecture du profile activité des stations
     if profile_station_activity is None:
-        station_profile = read_station_profile(path_directory=ROOT_DATA_REF)
-        profile_station_activity = (
-            station_profile.filter(pl.col("station_id") == station_id).select("profile_station_activity").to_series()[0]
-        )
+        profile_station_activity = get_station_profile_lookup(path_directory=ROOT_DATA_REF)[station_id]
     else:
         print("Using specifique profile station activity : " + profile_station_activity)
 
@@ -88,7 +91,7 @@ def train_cluster_station(data: pl.LazyFrame, station_id: int, profile_station_a
     clf_cluster = IsolationForest(
         n_estimators=50,
         random_state=SEED,
-        n_jobs=-1,
+        n_jobs=n_jobs,
         contamination=contaminsation_station,
     )
 
@@ -143,6 +146,196 @@ def predict_anomalies_station(data: pl.LazyFrame, clf: Pipeline, station_id: int
     return data_station
 
 
+def get_data_by_station(
+    data: pl.LazyFrame, stations_id: list[int] | None = None, columns: list[str] | None = None
+) -> dict[int, pl.DataFrame]:
+    """
+    Collect() une seule fois l'activité (et les features calculées en amont dans le LazyFrame) puis la
+    découpe par station. Évite de ré-exécuter le plan lazy à chaque station lors de l'apprentissage ou de
+    la prédiction de plusieurs stations (cf train_cluster_stations() et predict_anomalies_stations()).
+
+    Parameters
+    ----------
+    data : LazyFrame
+        Activité des stations Vcub
+    stations_id : list[int] | None
+        Stations à conserver (default: None, toutes les stations)
+    columns : list[str] | None
+        Colonnes à conserver (default: None, toutes les colonnes)
+
+    Returns
+    -------
+    dict[int, pl.DataFrame]
+        Activité de chaque station (les stations sans données sont absentes)
+
+    Examples
+    --------
+    data_by_station = get_data_by_station(ts_activity, stations_id=[22, 106])
+    data_station = data_by_station[22]
+    """
+
+    data = data.lazy()
+    if stations_id is not None:
+        data = data.filter(pl.col("station_id").is_in(stations_id))
+    if columns is not None:
+        data = data.select(columns)
+
+    data_by_station = data.collect().partition_by("station_id", as_dict=True, maintain_order=True)
+
+    return {station_id: data_station for (station_id,), data_station in data_by_station.items()}
+
+
+def predict_anomalies_stations(data: pl.LazyFrame, clf_by_station: dict[int, Pipeline]) -> pl.DataFrame:
+    """
+    Predict anomalies on many stations, each with its own estimator.
+    Les données sont collectées et les features calculées (process_data_cluster()) une seule fois pour
+    toutes les stations, puis chaque estimateur prédit sa station (cf get_data_by_station()).
+    Même résultat que predict_anomalies_station() appelé pour chaque station.
+
+    Parameters
+    ----------
+    data : LazyFrame
+        Activité des stations Vcub
+    clf_by_station : dict[int, Pipeline]
+        Estimateur de chaque station (ex: {22: clf_22, 106: clf_106})
+
+    Returns
+    -------
+    data : DataFrame
+        anomaly's column (-1 is an anomaly), stations dans l'ordre de clf_by_station
+
+    Examples
+    --------
+    stations_pred = predict_anomalies_stations(data=ts_activity, clf_by_station={22: clf_22, 106: clf_106})
+    """
+
+    data_by_station = get_data_by_station(process_data_cluster(data.lazy()), stations_id=list(clf_by_station))
+
+    stations_pred = []
+    for station_id, clf in clf_by_station.items():
+        if station_id not in data_by_station:
+            print("No data for station_id " + str(station_id))
+            continue
+        data_station = data_by_station[station_id]
+        predictions = clf.predict(data_station.select(FEATURES_TO_USE_CLUSTER))
+        stations_pred.append(data_station.with_columns(pl.Series(name="anomaly", values=predictions)))
+
+    if len(stations_pred) == 0:
+        return process_data_cluster(data.lazy()).head(0).collect().with_columns(anomaly=pl.lit(None, pl.Int64))
+
+    return pl.concat(stations_pred)
+
+
+def score_anomalies_(data: pl.DataFrame, clf: Pipeline, features: list[str] = FEATURES_TO_USE_CLUSTER) -> pl.DataFrame:
+    """
+    Ajoute les colonnes anomaly (-1 is an anomaly) et anomaly_score (0 à 100) avec un seul appel à
+    clf.decision_function() : IsolationForest.predict() vaut -1 lorsque decision_function() < 0.
+    Les features doivent déjà être calculées (cf process_data_cluster()).
+    Est utilisé par score_anomalies_station() et score_all_stations()
+    """
+    decision = clf.decision_function(data.select(features))
+    return data.with_columns(
+        pl.Series(name="anomaly", values=np.where(decision < 0, -1, 1)),
+        pl.Series(name="anomaly_score", values=logistic_predict_proba_from_model(decision) * 100),
+    )
+
+
+def score_anomalies_station(data: pl.LazyFrame, clf: Pipeline, station_id: int) -> pl.DataFrame:
+    """
+    Predict anomalies and anomaly score on given station with an estimator.
+    Même colonne anomaly que predict_anomalies_station() et anomaly_score
+    (cf logistic_predict_proba_from_model()) en un seul passage dans l'estimateur.
+
+    Parameters
+    ----------
+    data : DataFrame
+        Activité des stations Vcub
+    clf : Pipeline
+        Pipeline Scikit Learn
+    station_id : int
+        ID Station
+
+    Returns
+    -------
+    data : DataFrame
+        anomaly's column (-1 is an anomaly) and anomaly_score's column (0 à 100)
+
+    Examples
+    --------
+    station_pred = score_anomalies_station(data=ts_activity, clf=clf, station_id=106)
+    """
+
+    data_station = data.filter(pl.col("station_id") == station_id).collect()
+    if len(data_station) == 0:
+        print("No data for station_id " + str(station_id))
+        return data_station
+
+    return score_anomalies_(process_data_cluster(data_station), clf)
+
+
+def score_all_stations(latest_data: pl.LazyFrame, model_registry: ModelRegistry | None = None) -> pl.DataFrame:
+    """
+    Anomalies et score d'anomalie de toutes les stations du réseau en une passe (rafraîchissement
+    toutes les 10 minutes) :
+        - Les données sont collectées et les features calculées une seule fois (cf get_data_by_station()).
+        - Chaque modèle du registre (cf ml/cluster_utils.py ModelRegistry, gardés en mémoire entre
+          deux appels) score en un seul appel toutes les lignes de sa station, anomaly et anomaly_score
+          sont issus du même decision_function().
+    Les stations sans modèle sont conservées avec anomaly et anomaly_score à null.
+
+    Parameters
+    ----------
+    latest_data : LazyFrame
+        Activité récente des stations Vcub avec la feature consecutive_no_transactions_out
+    model_registry : ModelRegistry | None
+        Registre des modèles (default: None, registre de ROOT_MODEL)
+
+    Returns
+    -------
+    data : DataFrame
+        anomaly's column (-1 is an anomaly) and anomaly_score's column (0 à 100), triées par
+        station_id et date
+
+    Examples
+    --------
+    model_registry = ModelRegistry(path_directory=ROOT_MODEL)
+    network_pred = score_all_stations(latest_data, model_registry=model_registry)
+    """
+
+    if model_registry is None:
+        model_registry = ModelRegistry()
+
+    data_by_station = get_data_by_station(process_data_cluster(latest_data.lazy().sort(["station_id", "date"])))
+
+    stations_pred = []
+    stations_id_without_model = []
+    for station_id, data_station in data_by_station.items():
+        if station_id not in model_registry:
+            stations_id_without_model.append(station_id)
+            stations_pred.append(
+                data_station.with_columns(
+                    anomaly=pl.lit(None, dtype=pl.Int64), anomaly_score=pl.lit(None, dtype=pl.Float64)
+                )
+            )
+            continue
+        clf = model_registry.load_model(station_id)
+        features = model_registry.get_metadata(station_id)["features"]
+        stations_pred.append(score_anomalies_(data_station, clf, features=features))
+
+    if len(stations_id_without_model) > 0:
+        print(f"Pas de modèle pour {len(stations_id_without_model)} station(s) : {stations_id_without_model}")
+
+    if len(stations_pred) == 0:
+        return (
+            process_data_cluster(latest_data.lazy())
+            .head(0)
+            .collect()
+            .with_columns(anomaly=pl.lit(None, dtype=pl.Int64), anomaly_score=pl.lit(None, dtype=pl.Float64))
+        )
+
+    return pl.concat(stations_pred)
+
+
 def logistic_predict_proba_from_model(x: pl.Series, k: int = 20) -> pl.Series:
     """
     Logistic function apply to Isolation Forest decision_function
@@ -1,5 +1,25 @@
+import glob
+import io
+import json
+import mmap
+import os
+import pickle
+import re
+import struct
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
 from joblib import dump, load
 
+from vcub_keeper.config import FEATURES_TO_USE_CLUSTER, MODEL_REGISTRY_CACHE_SIZE, MODEL_REGISTRY_FILE_NAME, ROOT_MODEL
+
+# Format du registre : MODEL_REGISTRY_MAGIC_, taille de l'en-tête (uint64), en-tête json puis les modèles
+# sérialisés (pickle) les uns à la suite des autres. pickle.loads() d'un Pipeline est ~10x plus rapide
+# que joblib.load() (pas de parcours à la recherche de tableaux numpy à projeter en mémoire)
+MODEL_REGISTRY_MAGIC_ = b"VCUBMREG"
+MODEL_REGISTRY_FORMAT_VERSION_ = 1
+
 
 def export_model(clf, station_id, path_directory):
     """
@@ -49,3 +69,226 @@ def load_model(station_id, path_directory):
     """
     clf = load(path_directory + "model_station_" + str(station_id) + ".joblib")
     return clf
+
+
+def get_model_metadata_(clf, trained_at: datetime) -> dict:
+    """
+    Métadonnées d'un modèle du registre : date d'apprentissage, contamination de l'IsolationForest
+    et features utilisées. Est uniquement utilisé par create_model_registry()
+    """
+    cluster = clf.steps[-1][1]
+    features = list(getattr(clf, "feature_names_in_", FEATURES_TO_USE_CLUSTER))
+    return {
+        "trained_at": trained_at.isoformat(timespec="seconds"),
+        "contamination": float(cluster.contamination) if cluster.contamination != "auto" else "auto",
+        "features": features,
+    }
+
+
+def read_model_registry_header_(file) -> tuple[dict, int]:
+    """
+    Lecture de l'en-tête du registre (fichier ouvert en binaire).
+
+    Returns
+    -------
+    tuple[dict, int]
+        En-tête et position du premier modèle dans le fichier
+    """
+    magic = file.read(len(MODEL_REGISTRY_MAGIC_))
+    if magic != MODEL_REGISTRY_MAGIC_:
+        raise ValueError("Le fichier n'est pas un registre de modèles Vcub Keeper.")
+    (header_size,) = struct.unpack("<Q", file.read(8))
+    header = json.loads(file.read(header_size))
+    if header["format_version"] != MODEL_REGISTRY_FORMAT_VERSION_:
+        raise ValueError(f"Format du registre de modèles non supporté : {header['format_version']}")
+
+    return header, len(MODEL_REGISTRY_MAGIC_) + 8 + header_size
+
+
+def create_model_registry(
+    path_directory: str = ROOT_MODEL,
+    stations_id: list[int] | None = None,
+    file_name: str = MODEL_REGISTRY_FILE_NAME,
+) -> str:
+    """
+    Regroupe les modèles des stations (model_station_[station_id].joblib, cf export_model()) dans un seul
+    fichier versionné : un en-tête json (position, date d'apprentissage, contamination et features de chaque
+    modèle) suivi des modèles sérialisés. Les modèles sont ensuite chargés un à un à la demande
+    (cf ModelRegistry) sans ouvrir un fichier par station.
+    Le registre est écrit dans un fichier temporaire puis renommé : un lecteur ne voit jamais de registre
+    partiel. Sa version est incrémentée à chaque création.
+
+    Parameters
+    ----------
+    path_directory : str
+        chemin d'accès (ROOT_MODEL)
+    stations_id : list[int] | None
+        Stations à inclure (default: None, tous les modèles du dossier)
+    file_name : str
+        Nom du registre (default: MODEL_REGISTRY_FILE_NAME)
+
+    Returns
+    -------
+    str
+        Chemin du registre
+
+    Examples
+    --------
+    create_model_registry(path_directory=ROOT_MODEL)
+    """
+
+    if stations_id is None:
+        stations_id = sorted(
+            int(re.search(r"model_station_(\d+)\.joblib$", model_file).group(1))
+            for model_file in glob.glob(path_directory + "model_station_*.joblib")
+        )
+
+    registry_file = path_directory + file_name
+    version = 1
+    if os.path.exists(registry_file):
+        with open(registry_file, "rb") as file:
+            try:
+                version = read_model_registry_header_(file)[0]["version"] + 1
+            except ValueError:
+                pass
+
+    stations = {}
+    models = io.BytesIO()
+    for station_id in stations_id:
+        model_file = path_directory + "model_station_" + str(station_id) + ".joblib"
+        clf = load(model_file)
+        model = pickle.dumps(clf, protocol=pickle.HIGHEST_PROTOCOL)
+        trained_at = datetime.fromtimestamp(os.path.getmtime(model_file))
+        stations[str(station_id)] = {
+            "offset": models.tell(),
+            "length": len(model),
+            **get_model_metadata_(clf, trained_at),
+        }
+        models.write(model)
+
+    header = json.dumps(
+        {
+            "format_version": MODEL_REGISTRY_FORMAT_VERSION_,
+            "version": version,
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "stations": stations,
+        }
+    ).encode()
+
+    registry_file_tmp = registry_file + ".tmp"
+    with open(registry_file_tmp, "wb") as file:
+        file.write(MODEL_REGISTRY_MAGIC_)
+        file.write(struct.pack("<Q", len(header)))
+        file.write(header)
+        file.write(models.getbuffer())
+    os.replace(registry_file_tmp, registry_file)
+
+    print(f"Registre de modèles v{version} : {len(stations)} stations ({registry_file})")
+
+    return registry_file
+
+
+class ModelRegistry:
+    """
+    Accès aux modèles des stations regroupés dans un seul fichier (cf create_model_registry()).
+    Seul l'en-tête est lu à l'ouverture, le fichier est projeté en mémoire (mmap) et chaque modèle
+    n'est désérialisé qu'à sa première demande. Les max_cached_models derniers modèles utilisés
+    sont gardés en mémoire (LRU).
+
+    Le registre peut être partagé entre plusieurs threads.
+
+    Parameters
+    ----------
+    path_directory : str
+        chemin d'accès (default: ROOT_MODEL)
+    file_name : str
+        Nom du registre (default: MODEL_REGISTRY_FILE_NAME)
+    max_cached_models : int
+        Nombre de modèles gardés en mémoire (default: MODEL_REGISTRY_CACHE_SIZE)
+
+    Examples
+    --------
+    with ModelRegistry(path_directory=ROOT_MODEL) as model_registry:
+        clf = model_registry.load_model(station_id=110)
+        contamination = model_registry.get_metadata(station_id=110)["contamination"]
+    """
+
+    def __init__(
+        self,
+        path_directory: str = ROOT_MODEL,
+        file_name: str = MODEL_REGISTRY_FILE_NAME,
+        max_cached_models: int = MODEL_REGISTRY_CACHE_SIZE,
+    ):
+        """Lit l'en-tête du registre et projette le fichier en mémoire."""
+        self.registry_file = path_directory + file_name
+        self.max_cached_models = max_cached_models
+        self.lock = threading.Lock()
+        self.models = OrderedDict()
+
+        with open(self.registry_file, "rb") as file:
+            header, self.models_start = read_model_registry_header_(file)
+            self.mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        self.version = header["version"]
+        self.created_at = header["created_at"]
+        self.metadata_by_station = {int(station_id): metadata for station_id, metadata in header["stations"].items()}
+
+    @property
+    def stations_id(self) -> list[int]:
+        """Stations présentes dans le registre."""
+        return list(self.metadata_by_station)
+
+    def __contains__(self, station_id: int) -> bool:
+        """La station a un modèle dans le registre."""
+        return station_id in self.metadata_by_station
+
+    def get_metadata(self, station_id: int) -> dict:
+        """
+        Métadonnées du modèle d'une station : trained_at, contamination, features (et sa position dans
+        le fichier : offset, length). Lève une KeyError si la station n'est pas dans le registre.
+        """
+        return self.metadata_by_station[station_id]
+
+    def load_model(self, station_id: int):
+        """
+        Modèle d'une station (désérialisé à la première demande puis gardé en mémoire, LRU).
+        Lève une KeyError si la station n'est pas dans le registre.
+
+        Parameters
+        ----------
+        station_id : int
+            ID Station
+
+        Returns
+        -------
+        clf : Pipeline
+            Pipeline Scikit Learn
+        """
+        with self.lock:
+            if station_id in self.models:
+                self.models.move_to_end(station_id)
+                return self.models[station_id]
+
+            metadata = self.metadata_by_station[station_id]
+            start = self.models_start + metadata["offset"]
+            clf = pickle.loads(self.mmap[start : start + metadata["length"]])  # noqa: S301 (fichier local, cf joblib)
+
+            self.models[station_id] = clf
+            if len(self.models) > self.max_cached_models:
+                self.models.popitem(last=False)
+
+        return clf
+
+    def close(self) -> None:
+        """Libère les modèles en mémoire et le fichier projeté."""
+        with self.lock:
+            self.models.clear()
+            self.mmap.close()
+
+    def __enter__(self):
+        """Utilisation comme context manager (with ModelRegistry() as model_registry: ...)."""
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        """Ferme le registre en sortie du context manager."""
+        self.close()
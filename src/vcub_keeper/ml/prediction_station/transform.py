@@ -1,6 +1,7 @@
 import polars as pl
 
-from vcub_keeper.transform.features_factory import get_encoding_time
+from vcub_keeper.config import REGRESSION_LAGS, REGRESSION_ROLLING_WINDOWS
+from vcub_keeper.transform.features_factory import get_encoding_time, get_position_in_station_, get_rolling_extrema
 
 
 def build_feat_for_regression(station_to_pred: pl.LazyFrame, target_col: str) -> pl.DataFrame:
@@ -62,7 +63,7 @@ def process_temporal_feat(data: pl.LazyFrame) -> pl.LazyFrame:
 
     data = get_encoding_time(data, "weekday", max_val=7)
     data = get_encoding_time(data, "hours", max_val=24)
-    data = get_encoding_time(data, "minutes", max_val=6)  # 10 min
+    data = get_encoding_time(data, "minutes", max_val=6, n_values=60)  # 10 min
 
     return data
 
@@ -110,3 +111,126 @@ def build_lag_and_rolling_feat(station_to_pred: pl.LazyFrame, target_col: str) -
     )
 
     return station_to_pred
+
+
+def build_lag_and_rolling_feat_by_station(data: pl.LazyFrame, target_col: str) -> pl.LazyFrame:
+    """
+    Même features que build_lag_and_rolling_feat() calculées pour toutes les stations en une seule passe.
+    Les données doivent être triées par station_id et date : les décalages et fenêtres glissantes sont
+    calculés sur toute la colonne puis masqués (null) lorsqu'ils débordent sur la station précédente.
+
+    Les max / min glissants sont calculés par get_rolling_extrema() (transform/features_factory.py) :
+    le coût de chaque fenêtre (6 points à 7 jours) ne dépend pas de sa taille.
+
+    Parameters
+    ----------
+    data : pl.LazyFrame
+        Activité des stations Vcub triée par station_id et date
+    target_col : str
+        Nom de la colonne cible à prédire
+
+    Returns
+    -------
+    pl.LazyFrame
+
+    Examples
+    --------
+    data = build_lag_and_rolling_feat_by_station(data, target_col="available_stands")
+    """
+
+    position = pl.col("position_in_station")
+    data = data.with_columns(get_position_in_station_().alias("position_in_station"))
+
+    # lag
+    data = data.with_columns(
+        pl.when(position >= lag).then(pl.col(target_col).shift(lag)).alias(f"{target_col}_lag_{lag}")
+        for lag in REGRESSION_LAGS
+    )
+
+    # rolling max / min (une passe O(n) par fenêtre, cf get_rolling_extrema())
+    data = get_rolling_extrema(
+        data.drop("position_in_station"), target_col, windows=REGRESSION_ROLLING_WINDOWS, is_sorted=True
+    )
+
+    return data
+
+
+def build_feat_for_regression_by_station(data: pl.LazyFrame, target_col: str) -> pl.DataFrame:
+    """
+    Même features que build_feat_for_regression() pour toutes les stations en une seule passe
+    (données triées par station_id et date). Collect() le LazyFrame
+
+    Parameters
+    ----------
+    data : pl.LazyFrame
+        Activité des stations Vcub triée par station_id et date
+    target_col : str
+        La colonne à prédire "available_stands" ou "available_bikes"
+
+    Returns
+    -------
+    pl.DataFrame
+
+    Example
+    -------
+    features = build_feat_for_regression_by_station(df_historical_station, target_col="available_stands")
+    """
+
+    return (
+        data.lazy()
+        .pipe(process_temporal_feat)
+        .pipe(build_lag_and_rolling_feat_by_station, target_col=target_col)
+        .collect()
+    )
+
+
+class RegressionFeatureCache:
+    """
+    Cache des features de regression de toutes les stations : les features sont calculées une seule fois
+    par colonne cible (cf build_feat_for_regression_by_station()) puis servies station par station.
+
+    Parameters
+    ----------
+    data : pl.LazyFrame
+        Historique de l'activité des stations Vcub
+
+    Examples
+    --------
+    feature_cache = RegressionFeatureCache(df_historical_station)
+    station_to_pred = feature_cache.get_station(102, target_col="available_bikes")
+    """
+
+    def __init__(self, data: pl.LazyFrame):
+        """Initialise le cache (vide, les features sont calculées au premier appel de get_station())."""
+        self.data = data
+        self.features_by_station = {}
+
+    def get_station(self, station_id: int, target_col: str) -> pl.DataFrame:
+        """
+        Features de regression d'une station
+
+        Parameters
+        ----------
+        station_id : int
+            Identifiant de la station
+        target_col : str
+            La colonne à prédire "available_stands" ou "available_bikes"
+
+        Returns
+        -------
+        pl.DataFrame
+            Les features de la station (vide si la station n'est pas dans l'historique)
+        """
+
+        if target_col not in self.features_by_station:
+            features = build_feat_for_regression_by_station(
+                self.data.lazy().sort(["station_id", "date"]), target_col=target_col
+            )
+            self.features_by_station[target_col] = (
+                features.head(0),
+                features.partition_by("station_id", as_dict=True, maintain_order=True),
+            )
+
+        empty, features_by_station = self.features_by_station[target_col]
+
+        return features_by_station.get((station_id,), empty)
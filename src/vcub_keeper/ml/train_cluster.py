@@ -1,19 +1,201 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
 import polars as pl
+from threadpoolctl import threadpool_limits
 
 from vcub_keeper.config import NON_USE_STATION_ID, ROOT_DATA_CLEAN, ROOT_DATA_REF, ROOT_MODEL, THRESHOLD_PROFILE_STATION
-from vcub_keeper.ml.cluster import train_cluster_station
-from vcub_keeper.ml.cluster_utils import export_model
-from vcub_keeper.reader.reader import read_learning_dataset, read_station_profile
-from vcub_keeper.transform.features_factory import get_consecutive_no_transactions_out
+from vcub_keeper.create.creator import create_features_store
+from vcub_keeper.ml.cluster import get_data_by_station, train_cluster_station
+from vcub_keeper.ml.cluster_utils import create_model_registry, export_model
+from vcub_keeper.reader.reader import read_features, read_station_profile
+
+# Colonnes utilisées par train_cluster_station() (process_data_cluster(), filter_periode() et filtre sur status)
+COLUMNS_TRAIN_CLUSTER = ["station_id", "date", "status", "consecutive_no_transactions_out"]
+
+
+def get_available_cpu_count_() -> int:
+    """Nombre de coeurs utilisables par le processus (affinité CPU si disponible)."""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def init_train_worker_() -> None:
+    """
+    Initialise un processus d'apprentissage : un seul thread pour les librairies numériques
+    (BLAS / OpenMP), la parallélisation se faisant entre les stations. Le nombre de threads de Polars
+    est fixé par l'environnement hérité du processus parent (POLARS_MAX_THREADS est lu à l'import de
+    Polars). Est uniquement utilisé par train_cluster_stations()
+    """
+    threadpool_limits(limits=1)
+
+
+def train_and_export_station_(
+    data_station: pl.DataFrame, station_id: int, profile_station_activity: str | None, path_directory: str, n_jobs: int
+) -> dict:
+    """
+    Apprentissage et export du modèle d'une station. Les erreurs sont retournées (et non levées) pour
+    ne pas interrompre l'apprentissage des autres stations. Est uniquement utilisé par train_cluster_stations()
 
+    Returns
+    -------
+    dict
+        station_id, elapsed (secondes), error (None si l'apprentissage a réussi)
+    """
+    start = time.perf_counter()
+    try:
+        clf = train_cluster_station(
+            data_station.lazy(),
+            station_id=station_id,
+            profile_station_activity=profile_station_activity,
+            n_jobs=n_jobs,
+        )
+        export_model(clf, station_id=station_id, path_directory=path_directory)
+        error = None
+    except Exception as e:  # noqa: BLE001 (erreur reportée par station)
+        error = f"{type(e).__name__}: {e}"
 
-def run_train_cluster():
-    """ """
+    return {"station_id": station_id, "elapsed": time.perf_counter() - start, "error": error}
 
-    # Lecture du fichier activité
-    ts_activity = read_learning_dataset(file_path=ROOT_DATA_CLEAN, file_name="learning_dataset")
-    # Some features engi
-    ts_activity = get_consecutive_no_transactions_out(ts_activity)
+
+def train_cluster_stations(
+    data: pl.LazyFrame,
+    stations_id: list[int],
+    profile_station_activity: dict[int, str] | None = None,
+    path_directory: str = ROOT_MODEL,
+    max_workers: int | None = None,
+) -> pl.DataFrame:
+    """
+    Apprentissage et export des modèles de plusieurs stations en parallèle.
+    Les données sont collectées une seule fois puis partitionnées par station (cf ml/cluster.py
+    get_data_by_station()). Chaque station est apprise dans un processus (ProcessPoolExecutor, contexte
+    "spawn") limité à un thread (IsolationForest n_jobs=1, Polars et BLAS) : le temps d'apprentissage
+    baisse quasi linéairement avec le nombre de coeurs.
+
+    Parameters
+    ----------
+    data : pl.LazyFrame
+        Activité des stations Vcub avec la feature consecutive_no_transactions_out (cf reader.py read_features())
+    stations_id : list[int]
+        Stations à apprendre
+    profile_station_activity : dict[int, str] | None
+        Profil de chaque station (ex: {110: "very high"}). Si None ou station absente, lu par
+        train_cluster_station() dans station_profile.csv (cf get_station_profile_lookup()) (default: None)
+    path_directory : str
+        Dossier d'export des modèles (default: ROOT_MODEL)
+    max_workers : int | None
+        Nombre de processus (default: None, nombre de coeurs disponibles). Avec 1, les stations sont
+        apprises dans le processus courant.
+
+    Returns
+    -------
+    pl.DataFrame
+        Rapport par station : station_id, elapsed (secondes), error (None si l'apprentissage a réussi)
+
+    Examples
+    --------
+    report = train_cluster_stations(ts_activity, stations_id=[22, 106], max_workers=4)
+    """
+    if max_workers is None:
+        max_workers = get_available_cpu_count_()
+    if max_workers < 1:
+        raise ValueError("max_workers doit être supérieur ou égal à 1.")
+    if profile_station_activity is None:
+        profile_station_activity = {}
+
+    # Une seule lecture des données, partitionnées par station
+    data_by_station = get_data_by_station(data, stations_id=stations_id, columns=COLUMNS_TRAIN_CLUSTER)
+    empty_station = pl.DataFrame(schema=data.lazy().select(COLUMNS_TRAIN_CLUSTER).collect_schema())
+
+    def get_args(station_id):
+        return (
+            data_by_station.get(station_id, empty_station),
+            station_id,
+            profile_station_activity.get(station_id),
+            path_directory,
+        )
+
+    start = time.perf_counter()
+    report = []
+    if max_workers == 1:
+        for station_id in stations_id:
+            report.append(train_and_export_station_(*get_args(station_id), n_jobs=-1))
+            print_station_report_(report[-1], len(report), len(stations_id))
+    else:
+        # Un seul thread Polars par processus : la variable doit être définie avant l'import de Polars
+        # dans les processus (spawn), qui héritent de l'environnement du processus parent
+        polars_max_threads = os.environ.get("POLARS_MAX_THREADS")
+        os.environ["POLARS_MAX_THREADS"] = "1"
+        try:
+            with ProcessPoolExecutor(
+                max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"), initializer=init_train_worker_
+            ) as executor:
+                futures = [
+                    executor.submit(train_and_export_station_, *get_args(station_id), n_jobs=1)
+                    for station_id in stations_id
+                ]
+                for future in as_completed(futures):
+                    report.append(future.result())
+                    print_station_report_(report[-1], len(report), len(stations_id))
+        finally:
+            if polars_max_threads is None:
+                os.environ.pop("POLARS_MAX_THREADS")
+            else:
+                os.environ["POLARS_MAX_THREADS"] = polars_max_threads
+
+    report = pl.DataFrame(report, schema={"station_id": pl.Int64, "elapsed": pl.Float64, "error": pl.String}).sort(
+        "station_id"
+    )
+    n_errors = report.filter(pl.col("error").is_not_null()).height
+    print(
+        f"Apprentissage de {len(stations_id)} stations en {time.perf_counter() - start:.1f}s "
+        f"({max_workers} processus) : {n_errors} erreur(s)."
+    )
+
+    return report
+
+
+def print_station_report_(station_report: dict, n_done: int, n_total: int) -> None:
+    """Affiche le temps d'apprentissage (ou l'erreur) d'une station. Est uniquement utilisé par train_cluster_stations()"""
+    status = "OK" if station_report["error"] is None else "ERREUR " + station_report["error"]
+    print(
+        f"[{n_done}/{n_total}] Station N°{station_report['station_id']} : {station_report['elapsed']:.2f}s - {status}"
+    )
+
+
+def run_train_cluster(max_workers: int | None = 1, features_store: bool = False) -> pl.DataFrame:
+    """
+    Apprentissage des modèles de toutes les stations actives (profil >= THRESHOLD_PROFILE_STATION)
+    (cf train_cluster_stations()), export dans ROOT_MODEL et création du registre des modèles
+    (cf ml/cluster_utils.py create_model_registry()).
+
+    Parameters
+    ----------
+    max_workers : int | None
+        Nombre de processus (default: 1, stations apprises une à une dans le processus courant avec
+        l'IsolationForest sur tous les coeurs). None : un processus par coeur disponible.
+    features_store : bool
+        Création / mise à jour du feature store dans ROOT_DATA_CLEAN avant la lecture des features
+        (cf create/creator.py create_features_store()) (default: False)
+
+    Returns
+    -------
+    pl.DataFrame
+        Rapport par station (cf train_cluster_stations())
+
+    Examples
+    --------
+    report = run_train_cluster()
+    report = run_train_cluster(max_workers=None, features_store=True)
+    """
+
+    # Lecture du fichier activité avec les features (feature store si à jour, sinon calculées)
+    if features_store:
+        create_features_store(file_path=ROOT_DATA_CLEAN, file_name="learning_dataset")
+    ts_activity = read_features(file_path=ROOT_DATA_CLEAN, file_name="learning_dataset")
 
     # Lecture de profile des stations pour connaitre ceux que l'on clusterise
     station_profile = read_station_profile(path_directory=ROOT_DATA_REF)
@@ -29,16 +211,25 @@ def run_train_cluster():
     # Filter station we don't want to use
     stations_id_to_fit = [station for station in stations_id_to_fit if station not in NON_USE_STATION_ID]
 
-    # Pour chaque station, on fit le cluster
-    for station_id in stations_id_to_fit:
-        # Apprentissage du cluster pour la station
-        clf = train_cluster_station(ts_activity, station_id=station_id)
+    # Apprentissage des clusters (profil de chaque station lu par train_cluster_station(),
+    # cf get_station_profile_lookup())
+    report = train_cluster_stations(
+        ts_activity,
+        stations_id=stations_id_to_fit,
+        path_directory=ROOT_MODEL,
+        max_workers=max_workers,
+    )
 
-        # Export model
-        export_model(clf, station_id=station_id, path_directory=ROOT_MODEL)
+    # Regroupement des modèles appris dans un seul fichier (cf ModelRegistry)
+    create_model_registry(
+        path_directory=ROOT_MODEL,
+        stations_id=report.filter(pl.col("error").is_null()).get_column("station_id").to_list(),
+    )
 
     print("Fin d'apprentissage des cluster par station ID.")
 
+    return report
+
 
 if __name__ == "__main__":
     run_train_cluster()
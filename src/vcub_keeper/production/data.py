@@ -1,19 +1,476 @@
+import gzip
+import hashlib
+import io
+import json
+import os
+import random
+import threading
 import time
+import zlib
 from collections.abc import Generator
+from concurrent.futures import ThreadPoolExecutor
+from datetime import UTC, date, datetime, timedelta
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from urllib.parse import parse_qsl, urlparse
+from zoneinfo import ZoneInfo
 
 import numpy as np
 import polars as pl
 import requests
+from requests.adapters import HTTPAdapter
 from requests.exceptions import ChunkedEncodingError, Timeout
 
-from vcub_keeper.config import KEY_API_BDX
-from vcub_keeper.transform.features_factory import get_transactions_all, get_transactions_in, get_transactions_out
+from vcub_keeper.config import API_CACHE_MAX_SIZE_BYTES, KEY_API_BDX, ROOT_DATA_CACHE
+from vcub_keeper.reader.reader_utils import cast_to_schema
+from vcub_keeper.transform.features_factory import get_transactions
+
+#############################################
+###            Client HTTP
+#############################################
+
+# Status HTTP pour lesquels une nouvelle tentative est faite
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class RateLimiter:
+    """
+    Limiteur de débit par host (thread-safe) : espace les requêtes vers un même host
+    d'au moins 1 / max_requests_per_second secondes, quel que soit le nombre de threads.
+
+    Parameters
+    ----------
+    max_requests_per_second : float
+        Nombre maximum de requêtes par seconde et par host
+
+    Examples
+    --------
+    rate_limiter = RateLimiter(max_requests_per_second=2)
+    rate_limiter.wait(url)
+    """
+
+    def __init__(self, max_requests_per_second: float):
+        """Initialise l'intervalle minimum entre deux requêtes vers un même host."""
+        if max_requests_per_second <= 0:
+            raise ValueError("max_requests_per_second doit être strictement positif.")
+        self.min_interval = 1 / max_requests_per_second
+        self.next_call_by_host = {}
+        self.lock = threading.Lock()
+
+    def wait(self, url: str) -> None:
+        """Bloque jusqu'à ce que le host de l'url puisse de nouveau être appelé."""
+        host = urlparse(url).netloc
+        with self.lock:
+            now = time.monotonic()
+            call_time = max(now, self.next_call_by_host.get(host, now))
+            self.next_call_by_host[host] = call_time + self.min_interval
+        delay = call_time - now
+        if delay > 0:
+            time.sleep(delay)
+
+
+class ApiResponseCache:
+    """
+    Cache disque des réponses de l'API, adressé par le contenu de la requête :
+        - La clé est le sha256 de la requête normalisée (host, chemin et paramètres triés, sans la clé
+          d'API, liste de stations triée), les réponses sont stockées compressées (gzip).
+        - Les réponses sur une période entièrement passée (rangeEnd antérieur à now - stable_after)
+          n'expirent jamais, les autres (période incluant "maintenant", requêtes sans période)
+          expirent après ttl_recent secondes.
+        - La taille du cache est bornée par max_size_bytes : les entrées les moins récemment
+          utilisées sont supprimées en premier (LRU sur la date de modification des fichiers).
+
+    Le cache peut être partagé entre plusieurs threads.
+
+    Parameters
+    ----------
+    cache_dir : str
+        Dossier du cache (default is ROOT_DATA_CACHE)
+    max_size_bytes : int
+        Taille maximum du cache sur disque en octets (default is API_CACHE_MAX_SIZE_BYTES)
+    ttl_recent : float
+        Durée de validité en secondes des réponses sur une période récente (default is 300)
+    stable_after : timedelta
+        Délai après lequel une période terminée n'est plus modifiée par l'API (default is 1 heure)
+
+    Examples
+    --------
+    with ApiClient(cache=ApiResponseCache()) as api_client:
+        station_json = get_data_from_api_bdx_by_station(station_id=19, start_date='2020-10-14',
+                                                        stop_date='2020-10-17', api_client=api_client)
+    """
+
+    def __init__(
+        self,
+        cache_dir: str = ROOT_DATA_CACHE,
+        max_size_bytes: int = API_CACHE_MAX_SIZE_BYTES,
+        ttl_recent: float = 300,
+        stable_after: timedelta = timedelta(hours=1),
+    ):
+        """Initialise le dossier du cache et sa taille courante."""
+        self.cache_dir = Path(cache_dir)
+        self.max_size_bytes = max_size_bytes
+        self.ttl_recent = ttl_recent
+        self.stable_after = stable_after
+        self.lock = threading.Lock()
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.size_bytes = sum(file.stat().st_size for file in self.cache_dir.glob("*.json.gz"))
+
+    @staticmethod
+    def normalize_url_(url: str) -> str:
+        """
+        Requête normalisée : host + chemin + paramètres triés, sans la clé d'API, avec les
+        paramètres json (filter, attributes) réécrits et la liste de stations ($in) triée.
+        """
+        parsed_url = urlparse(url)
+        params = {}
+        for name, value in parse_qsl(parsed_url.query, keep_blank_values=True):
+            if name == "key":
+                continue
+            try:
+                value_json = json.loads(value)
+            except ValueError:
+                params[name] = value
+                continue
+            if isinstance(value_json, dict) and isinstance(value_json.get("ident"), dict):
+                value_json["ident"] = {
+                    operator: sorted(set(values)) if isinstance(values, list) else values
+                    for operator, values in value_json["ident"].items()
+                }
+            params[name] = json.dumps(value_json, sort_keys=True)
+        return json.dumps([parsed_url.netloc, parsed_url.path, sorted(params.items())])
+
+    def get_key(self, url: str) -> str:
+        """Clé du cache (sha256 de la requête normalisée)."""
+        return hashlib.sha256(self.normalize_url_(url).encode()).hexdigest()
+
+    def get_expires_at_(self, url: str) -> float | None:
+        """Date d'expiration (timestamp) de la réponse, None si la période est entièrement passée."""
+        range_end = dict(parse_qsl(urlparse(url).query)).get("rangeEnd")
+        if range_end is not None:
+            try:
+                range_end_date = datetime.fromisoformat(range_end)
+            except ValueError:
+                range_end_date = None
+            now_paris = datetime.now(ZoneInfo("Europe/Paris")).replace(tzinfo=None)
+            if range_end_date is not None and range_end_date <= now_paris - self.stable_after:
+                return None
+        return time.time() + self.ttl_recent
+
+    def get(self, url: str) -> bytes | None:
+        """
+        Réponse en cache pour l'url (None si absente ou expirée). Une entrée illisible (fichier
+        tronqué ou corrompu, en-tête invalide) est supprimée et traitée comme absente.
+
+        Parameters
+        ----------
+        url : str
+            Url de l'API
+
+        Returns
+        -------
+        bytes | None
+            Contenu de la réponse
+        """
+        cache_file = self.cache_dir / f"{self.get_key(url)}.json.gz"
+        try:
+            with gzip.open(cache_file, "rb") as f:
+                header = json.loads(f.readline())
+                if header["expires_at"] is not None and header["expires_at"] < time.time():
+                    return None
+                content = f.read()
+            os.utime(cache_file)  # LRU : dernière utilisation
+        except FileNotFoundError:
+            return None
+        except (OSError, EOFError, zlib.error, ValueError, KeyError, TypeError) as e:
+            print(f"Entrée du cache illisible supprimée ({cache_file.name}) : {type(e).__name__}: {e}")
+            self.remove_(cache_file)
+            return None
+        return content
+
+    def remove_(self, cache_file: Path) -> None:
+        """Supprime une entrée du cache et met à jour la taille du cache."""
+        with self.lock:
+            try:
+                size = cache_file.stat().st_size
+                cache_file.unlink()
+            except FileNotFoundError:
+                return
+            self.size_bytes -= size
+
+    def set(self, url: str, content: bytes) -> None:
+        """
+        Ajoute la réponse de l'url dans le cache puis supprime les entrées les moins récemment
+        utilisées si la taille du cache dépasse max_size_bytes.
+
+        Parameters
+        ----------
+        url : str
+            Url de l'API
+        content : bytes
+            Contenu de la réponse
+        """
+        key = self.get_key(url)
+        cache_file = self.cache_dir / f"{key}.json.gz"
+        header = json.dumps({"expires_at": self.get_expires_at_(url)}).encode() + b"\n"
+        data = gzip.compress(header + content)
+
+        # Écriture atomique : un lecteur ne voit jamais de fichier partiel
+        tmp_file = self.cache_dir / f"{key}.{threading.get_ident()}.tmp"
+        tmp_file.write_bytes(data)
+        with self.lock:
+            previous_size = cache_file.stat().st_size if cache_file.exists() else 0
+            os.replace(tmp_file, cache_file)
+            self.size_bytes += len(data) - previous_size
+            if self.size_bytes > self.max_size_bytes:
+                self.evict_()
+
+    def evict_(self) -> None:
+        """Supprime les entrées les moins récemment utilisées jusqu'à repasser sous max_size_bytes."""
+        cache_files = []
+        for cache_file in self.cache_dir.glob("*.json.gz"):
+            try:
+                stat = cache_file.stat()
+            except FileNotFoundError:
+                continue
+            cache_files.append((stat.st_mtime, stat.st_size, cache_file))
+
+        self.size_bytes = sum(size for _, size, _ in cache_files)
+        for _, size, cache_file in sorted(cache_files, key=lambda cache_entry: cache_entry[0]):
+            if self.size_bytes <= self.max_size_bytes:
+                break
+            cache_file.unlink(missing_ok=True)
+            self.size_bytes -= size
+
+
+class ApiClient:
+    """
+    Client HTTP réutilisable pour les API (open data Bordeaux, Oslandia) :
+        - Session requests avec un pool de connexions (keep-alive, pas de handshake TLS à chaque appel)
+        - Nouvelles tentatives sur Timeout, ChunkedEncodingError, ConnectionError et status 429 / 5xx
+          avec un backoff exponentiel + jitter, en respectant le header Retry-After
+        - Limitation de débit optionnelle (RateLimiter)
+        - Cache disque optionnel des réponses (ApiResponseCache), une réponse en cache ne fait
+          aucun appel réseau
+        - Métriques de latence et de nouvelles tentatives (cf get_metrics())
+
+    Le client peut être partagé entre plusieurs threads.
+
+    Parameters
+    ----------
+    timeout : int
+        Timeout d'une requête en secondes (default is 10)
+    max_retries : int
+        Nombre maximum de tentatives par requête (default is 3)
+    backoff_factor : float
+        Délai de base du backoff exponentiel en secondes : backoff_factor * 2 ** (tentative - 1) (default is 1)
+    max_backoff : float
+        Délai maximum entre deux tentatives en secondes (default is 60)
+    pool_maxsize : int
+        Nombre maximum de connexions conservées par host (default is 10)
+    rate_limiter : RateLimiter | None
+        Limiteur de débit partagé par l'ensemble des requêtes du client (default is None)
+    cache : ApiResponseCache | None
+        Cache disque des réponses (default is None)
+
+    Examples
+    --------
+    with ApiClient(timeout=10, max_retries=5) as api_client:
+        station_json = get_data_from_api_bdx_by_station(station_id=19, start_date='2020-10-14',
+                                                        stop_date='2020-10-17', api_client=api_client)
+        print(api_client.get_metrics())
+    """
+
+    def __init__(
+        self,
+        timeout: int = 10,
+        max_retries: int = 3,
+        backoff_factor: float = 1,
+        max_backoff: float = 60,
+        pool_maxsize: int = 10,
+        rate_limiter: RateLimiter | None = None,
+        cache: ApiResponseCache | None = None,
+    ):
+        """Initialise la session HTTP et les métriques."""
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.rate_limiter = rate_limiter
+        self.cache = cache
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_maxsize, pool_maxsize=pool_maxsize)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self.lock = threading.Lock()
+        self.latencies = []
+        self.n_retries = 0
+        self.n_errors = 0
+        self.n_cache_hits = 0
+
+    def __enter__(self):
+        """Utilisation du client avec with."""
+        return self
+
+    def __exit__(self, *args):
+        """Fermeture de la session à la sortie du with."""
+        self.close()
+
+    def close(self) -> None:
+        """Ferme les connexions de la session."""
+        self.session.close()
+
+    def get_backoff_delay(self, attempt: int, retry_after: str | None = None) -> float:
+        """
+        Délai avant la prochaine tentative : valeur du header Retry-After (secondes ou date HTTP)
+        si présent, sinon backoff exponentiel avec jitter (entre 50 % et 100 % du délai).
+        """
+        if retry_after is not None:
+            try:
+                delay = float(retry_after)
+            except ValueError:
+                try:
+                    delay = (parsedate_to_datetime(retry_after) - datetime.now(UTC)).total_seconds()
+                except (TypeError, ValueError):
+                    delay = None
+            if delay is not None:
+                return min(max(delay, 0), self.max_backoff)
+
+        delay = min(self.backoff_factor * 2 ** (attempt - 1), self.max_backoff)
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def get_json(self, url: str, max_retries: int | None = None) -> dict:
+        """
+        Requête GET sur l'url avec la logique de nouvelles tentatives et retourne le json.
+
+        Parameters
+        ----------
+        url : str
+            Url de l'API
+        max_retries : int | None
+            Nombre maximum de tentatives pour cette requête (default is None, self.max_retries)
+
+        Returns
+        -------
+        dict
+        """
+        return json.loads(self.get_content(url, max_retries=max_retries))
+
+    def get_content(self, url: str, max_retries: int | None = None) -> bytes:
+        """
+        Requête GET sur l'url avec la logique de nouvelles tentatives et retourne le contenu brut
+        de la réponse (sans décodage json, cf normalize_json_api_bdx_station_data_()).
+
+        Parameters
+        ----------
+        url : str
+            Url de l'API
+        max_retries : int | None
+            Nombre maximum de tentatives pour cette requête (default is None, self.max_retries)
+
+        Returns
+        -------
+        bytes
+        """
+        if max_retries is None:
+            max_retries = self.max_retries
+
+        if self.cache is not None:
+            content = self.cache.get(url)
+            if content is not None:
+                with self.lock:
+                    self.n_cache_hits += 1
+                return content
+
+        attempts = 0
+        while True:
+            attempts += 1
+            if self.rate_limiter is not None:
+                self.rate_limiter.wait(url)
+
+            start = time.perf_counter()
+            retry_after = None
+            try:
+                response = self.session.get(url, timeout=self.timeout)
+                if response.status_code in RETRY_STATUS_CODES:
+                    retry_after = response.headers.get("Retry-After")
+                response.raise_for_status()  # Raise an exception for HTTP errors
+                content = response.content
+                self.record_request_(time.perf_counter() - start, is_error=False)
+                if self.cache is not None:
+                    self.cache.set(url, content)
+                return content
+            except (Timeout, ChunkedEncodingError, requests.ConnectionError, requests.HTTPError) as e:
+                self.record_request_(time.perf_counter() - start, is_error=True)
+                is_retryable = not isinstance(e, requests.HTTPError) or e.response.status_code in RETRY_STATUS_CODES
+                if not is_retryable:
+                    raise Exception(
+                        f"Erreur lors de la récupération des données depuis l'API Bordeaux Métropole: {url}\n{e}"
+                    ) from e
+                if attempts >= max_retries:
+                    raise Exception(
+                        f"Erreur lors de la récupération des données après {max_retries} tentatives : {url}\n{e}"
+                    ) from e
+
+                delay = self.get_backoff_delay(attempts, retry_after=retry_after)
+                with self.lock:
+                    self.n_retries += 1
+                print(
+                    f"Tentative {attempts}/{max_retries} échouée avec l'erreur : {e}. "
+                    f"Nouvelle tentative dans {delay:.1f}s..."
+                )
+                time.sleep(delay)
+            except requests.RequestException as e:
+                self.record_request_(time.perf_counter() - start, is_error=True)
+                raise Exception(
+                    f"Erreur lors de la récupération des données depuis l'API Bordeaux Métropole: {url}\n{e}"
+                ) from e
+
+    def record_request_(self, latency: float, is_error: bool) -> None:
+        """Enregistre la latence d'une requête (et si elle est en erreur)."""
+        with self.lock:
+            self.latencies.append(latency)
+            if is_error:
+                self.n_errors += 1
+
+    def get_metrics(self) -> dict[str, float]:
+        """
+        Métriques des requêtes effectuées par le client.
+
+        Returns
+        -------
+        dict[str, float]
+            n_requests, n_retries, n_errors, n_cache_hits, latency_mean, latency_p50, latency_p95,
+            latency_max (secondes)
+        """
+        with self.lock:
+            latencies = np.array(self.latencies)
+            metrics = {
+                "n_requests": len(latencies),
+                "n_retries": self.n_retries,
+                "n_errors": self.n_errors,
+                "n_cache_hits": self.n_cache_hits,
+            }
+        if len(latencies) > 0:
+            metrics.update(
+                {
+                    "latency_mean": float(latencies.mean()),
+                    "latency_p50": float(np.percentile(latencies, 50)),
+                    "latency_p95": float(np.percentile(latencies, 95)),
+                    "latency_max": float(latencies.max()),
+                }
+            )
+        return metrics
 
 
 #############################################
 ###            API Oslandia
 #############################################
-def get_data_from_api_by_station(station_id: str | list, start_date: str, stop_date: str) -> dict:
+def get_data_from_api_by_station(
+    station_id: str | list, start_date: str, stop_date: str, api_client: ApiClient | None = None
+) -> dict:
     """
     Permet d'obtenir les données d'activité d'une station via une API d'Oslandia
 
@@ -25,6 +482,8 @@ def get_data_from_api_by_station(station_id: str | list, start_date: str, stop_d
         Date de début de la Time Serie
     stop_date : str
         Date de fin de la Time Serie
+    api_client : ApiClient | None
+        Client HTTP à réutiliser entre plusieurs appels (default is None, un client est créé)
 
     Returns
     -------
@@ -50,8 +509,10 @@ def get_data_from_api_by_station(station_id: str | list, start_date: str, stop_d
         + stop_date
     )
 
-    response = requests.get(url)  # noqa: S113
-    return response.json()
+    if api_client is None:
+        with ApiClient() as default_client:
+            return default_client.get_json(url)
+    return api_client.get_json(url)
 
 
 def transform_json_station_data_to_df(station_json: dict) -> pl.LazyFrame:
@@ -95,14 +556,14 @@ def transform_json_station_data_to_df(station_json: dict) -> pl.LazyFrame:
     station_df = station_df.rename({"id": "station_id", "ts": "date"})
 
     # Casting & sorting DataFrame on station_id & date
-    station_df = station_df.with_columns(station_id=pl.col("station_id").cast(pl.Int32()))
+    station_df = station_df.pipe(cast_to_schema)
     station_df = station_df.with_columns(date=pl.col("date").str.to_datetime(format="%Y-%m-%dT%H:%M:%S"))
 
     station_df = station_df.unique(subset=["station_id", "date"])
     station_df = station_df.sort(["station_id", "date"], descending=[False, False])
 
     # Create features
-    station_df = station_df.pipe(get_transactions_in).pipe(get_transactions_out).pipe(get_transactions_all)
+    station_df = station_df.pipe(get_transactions, is_sorted=True)
 
     ## Resampling
     station_df_resample = (
@@ -128,6 +589,7 @@ def transform_json_station_data_to_df(station_json: dict) -> pl.LazyFrame:
         transactions_out=pl.col.transactions_out.fill_null(0),
         transactions_all=pl.col.transactions_all.fill_null(0),
     )
+    station_df_resample = station_df_resample.pipe(cast_to_schema)
 
     return station_df_resample
 
@@ -136,6 +598,8 @@ def transform_json_station_data_to_df(station_json: dict) -> pl.LazyFrame:
 ###        API open data bordeaux
 #############################################
 
+URL_API_BDX = "https://data.bordeaux-metropole.fr/geojson/aggregate/ci_vcub_p"
+
 
 def chunk_list_(station_id_list: list, chunk_size: int) -> Generator[list, None, None]:
     """Divise une liste en sous-listes de taille chunk_size. Est uniquement utilisé par la fonction create_learning_dataset()
@@ -159,6 +623,314 @@ def chunk_list_(station_id_list: list, chunk_size: int) -> Generator[list, None,
         yield station_id_list[i : i + chunk_size]
 
 
+def build_url_api_bdx_(station_id: str | list, start_date: str, stop_date: str) -> str:
+    """
+    Construit l'url de l'API d'open data Bordeaux pour une ou plusieurs stations.
+    Est uniquement utilisé par la fonction get_data_from_api_bdx_by_station()
+
+    Parameters
+    ----------
+    station_id : Int or List
+        Numéro de la station de Vcub
+    start_date : str
+        Date de début de la Time Serie
+    stop_date : str
+        Date de fin de la Time Serie
+
+    Returns
+    -------
+    url : str
+
+    Examples
+    --------
+    url = build_url_api_bdx_(station_id=[124, 15, 60], start_date="2020-10-14", stop_date="2020-10-17")
+    """
+
+    # Si plusieurs station_id ([124,  15,  60,]) -> list
+    if isinstance(station_id, list | np.ndarray):
+        station_id_join = ",".join(map(str, station_id))
+        station_filter = '{"ident":{"$in":[' + station_id_join + "]}}"
+    # Si une seul station_id -> str
+    else:
+        station_filter = '{"ident":' + str(station_id) + "}"
+
+    url = (
+        URL_API_BDX
+        + "?key="
+        + str(KEY_API_BDX)
+        + "&rangeStart="
+        + str(start_date)
+        + "&filter="
+        + station_filter
+        + "&rangeEnd="
+        + str(stop_date)
+        + '&rangeStep=5min&attributes={"nom": "mode", "etat": "mode", "nbplaces": "max", "nbvelos": "max", "ident": "min"}'
+    )
+    return url
+
+
+class AdaptiveChunkPlanner:
+    """
+    Planificateur adaptatif de la taille des requêtes (nombre de stations x nombre de jours)
+    vers l'API de Bordeaux afin de minimiser le nombre de requêtes sans faire planter l'API :
+        - La taille augmente (x growth_factor, d'abord les stations puis les jours) tant que la
+          latence et le nombre de points estimés pour la requête suivante restent sous
+          target_latency et max_features.
+        - La taille diminue (/ 2, d'abord les stations puis les jours) sur un Timeout ou
+          un ChunkedEncodingError, et la requête est refaite avec la nouvelle taille. La taille
+          ne regrandit ensuite pas jusqu'à la plus petite taille en erreur.
+
+    Chaque requête est affichée et conservée dans self.history (cf get_plan()).
+    Le planificateur peut être partagé entre plusieurs threads.
+
+    Parameters
+    ----------
+    chunk_size_station : int
+        Nombre de stations initial par requête (default is 25)
+    chunk_days : int
+        Nombre de jours initial par requête (default is 4)
+    max_chunk_size_station : int
+        Nombre maximum de stations par requête (default is 400)
+    max_chunk_days : int
+        Nombre maximum de jours par requête (default is 31)
+    target_latency : float
+        Latence maximum visée par requête en secondes (default is 5)
+    max_features : int
+        Nombre maximum de points visé par requête (default is 200 000)
+    growth_factor : float
+        Facteur d'augmentation de la taille des requêtes (default is 2)
+
+    Examples
+    --------
+    chunk_planner = AdaptiveChunkPlanner()
+    station_json = get_data_from_api_bdx_by_station(station_id=station_id_list, start_date='2024-01-01',
+                                                    stop_date='2024-03-01', chunk_planner=chunk_planner)
+    """
+
+    def __init__(
+        self,
+        chunk_size_station: int = 25,
+        chunk_days: int = 4,
+        max_chunk_size_station: int = 400,
+        max_chunk_days: int = 31,
+        target_latency: float = 5,
+        max_features: int = 200_000,
+        growth_factor: float = 2,
+    ):
+        """Initialise la taille des requêtes et l'historique du plan."""
+        self.chunk_size_station = chunk_size_station
+        self.chunk_days = chunk_days
+        self.max_chunk_size_station = max_chunk_size_station
+        self.max_chunk_days = max_chunk_days
+        self.target_latency = target_latency
+        self.max_features = max_features
+        self.growth_factor = growth_factor
+        self.history = []
+        # Plus petite taille (stations x jours) en erreur : la taille ne regrandit pas jusqu'à celle-ci
+        self.failed_size = float("inf")
+        self.lock = threading.Lock()
+
+    def can_shrink(self) -> bool:
+        """La taille des requêtes peut-elle encore être réduite ?"""
+        with self.lock:
+            return self.chunk_size_station > 1 or self.chunk_days > 1
+
+    def record_success(
+        self, n_stations: int, n_days: int, latency: float, n_features: int, n_stations_total: int | None = None
+    ) -> None:
+        """
+        Enregistre une requête réussie et augmente la taille des requêtes suivantes si la requête
+        estimée (x growth_factor) reste sous target_latency et max_features.
+
+        Parameters
+        ----------
+        n_stations : int
+            Nombre de stations de la requête
+        n_days : int
+            Nombre de jours de la requête
+        latency : float
+            Latence de la requête en secondes
+        n_features : int
+            Nombre de points renvoyés par l'API
+        n_stations_total : int | None
+            Nombre total de stations à récupérer, au-delà duquel on augmente le nombre de jours (default is None)
+        """
+        with self.lock:
+            self.history.append(
+                {
+                    "n_stations": n_stations,
+                    "n_days": n_days,
+                    "latency": latency,
+                    "n_features": n_features,
+                    "status": "ok",
+                }
+            )
+
+            max_chunk_size_station = self.max_chunk_size_station
+            if n_stations_total is not None:
+                max_chunk_size_station = min(max_chunk_size_station, n_stations_total)
+
+            new_chunk_size_station, new_chunk_days = self.chunk_size_station, self.chunk_days
+            if self.chunk_size_station < max_chunk_size_station:
+                new_chunk_size_station = min(int(self.chunk_size_station * self.growth_factor), max_chunk_size_station)
+            else:
+                new_chunk_days = min(int(self.chunk_days * self.growth_factor), self.max_chunk_days)
+
+            # Estimation de la requête suivante (latence et nombre de points proportionnels à stations x jours)
+            ratio = new_chunk_size_station * new_chunk_days / (n_stations * n_days)
+            if (
+                latency * ratio <= self.target_latency
+                and n_features * ratio <= self.max_features
+                and new_chunk_size_station * new_chunk_days < self.failed_size
+            ):
+                self.chunk_size_station, self.chunk_days = new_chunk_size_station, new_chunk_days
+
+        print(
+            f"Plan adaptatif : {n_stations} stations x {n_days} jours -> {n_features} points en {latency:.2f}s, "
+            f"requête suivante {self.chunk_size_station} stations x {self.chunk_days} jours"
+        )
+
+    def record_failure(self, n_stations: int, n_days: int, error: Exception) -> bool:
+        """
+        Enregistre une requête en erreur (Timeout, ChunkedEncodingError) et réduit la taille
+        des requêtes suivantes.
+
+        Parameters
+        ----------
+        n_stations : int
+            Nombre de stations de la requête
+        n_days : int
+            Nombre de jours de la requête
+        error : Exception
+            Erreur de la requête
+
+        Returns
+        -------
+        bool
+            False si la taille ne peut plus être réduite
+        """
+        with self.lock:
+            self.history.append(
+                {"n_stations": n_stations, "n_days": n_days, "latency": None, "n_features": None, "status": "error"}
+            )
+            self.failed_size = min(self.failed_size, n_stations * n_days)
+            # Une autre requête a déjà réduit la taille en dessous de celle-ci
+            if n_stations > self.chunk_size_station or n_days > self.chunk_days:
+                shrunk = True
+            elif self.chunk_size_station > 1:
+                self.chunk_size_station = max(n_stations // 2, 1)
+                shrunk = True
+            elif self.chunk_days > 1:
+                self.chunk_days = max(n_days // 2, 1)
+                shrunk = True
+            else:
+                shrunk = False
+
+        print(
+            f"Plan adaptatif : {n_stations} stations x {n_days} jours en erreur ({type(error.__cause__ or error).__name__}), "
+            f"nouvelle taille {self.chunk_size_station} stations x {self.chunk_days} jours"
+        )
+        return shrunk
+
+    def get_plan(self) -> pl.DataFrame:
+        """
+        Historique des requêtes du plan.
+
+        Returns
+        -------
+        pl.DataFrame
+            Colonnes n_stations, n_days, latency, n_features, status ("ok" ou "error")
+        """
+        with self.lock:
+            return pl.DataFrame(
+                self.history,
+                schema={
+                    "n_stations": pl.Int64,
+                    "n_days": pl.Int64,
+                    "latency": pl.Float64,
+                    "n_features": pl.Int64,
+                    "status": pl.String,
+                },
+            )
+
+
+def is_chunk_size_error_(error: Exception) -> bool:
+    """
+    L'erreur est-elle due à une requête trop volumineuse (Timeout ou ChunkedEncodingError,
+    éventuellement encapsulée par ApiClient.get_json()) ?
+    """
+    return isinstance(error, Timeout | ChunkedEncodingError) or isinstance(
+        error.__cause__, Timeout | ChunkedEncodingError
+    )
+
+
+def get_data_from_api_bdx_adaptive_(
+    station_id_list: list,
+    start_date: date,
+    stop_date: date,
+    api_client: ApiClient,
+    chunk_planner: AdaptiveChunkPlanner,
+) -> list[bytes]:
+    """
+    Récupère les points des stations entre start_date et stop_date (exclu) avec des requêtes dont
+    la taille (stations x jours) est choisie par chunk_planner. Sur un Timeout ou un
+    ChunkedEncodingError, la taille est réduite et les stations restantes de la période sont
+    récupérées avec la nouvelle taille.
+
+    Returns
+    -------
+    list[bytes]
+        Contenu brut (GeoJSON) de chaque réponse de l'API
+    """
+    contents = []
+    current_date = start_date
+    while current_date < stop_date:
+        window_stop = min(current_date + timedelta(days=chunk_planner.chunk_days), stop_date)
+        n_days = (window_stop - current_date).days
+
+        index = 0
+        while index < len(station_id_list):
+            station_id_list_chunk = station_id_list[index : index + chunk_planner.chunk_size_station]
+            url = build_url_api_bdx_(
+                station_id=station_id_list_chunk,
+                start_date=current_date.isoformat(),
+                stop_date=window_stop.isoformat(),
+            )
+            can_shrink = chunk_planner.can_shrink()
+            start = time.perf_counter()
+            try:
+                # Pas de nouvelle tentative à taille identique tant que la taille peut être réduite
+                content = api_client.get_content(url, max_retries=1 if can_shrink else None)
+            except Exception as e:
+                if not can_shrink or not is_chunk_size_error_(e):
+                    raise
+                chunk_planner.record_failure(len(station_id_list_chunk), n_days, e)
+                if chunk_planner.chunk_days < n_days:
+                    # Période réduite : les stations restantes sont récupérées avec des périodes plus courtes
+                    contents.extend(
+                        get_data_from_api_bdx_adaptive_(
+                            station_id_list[index:], current_date, window_stop, api_client, chunk_planner
+                        )
+                    )
+                    break
+                continue
+
+            chunk_planner.record_success(
+                n_stations=len(station_id_list_chunk),
+                n_days=n_days,
+                latency=time.perf_counter() - start,
+                # Un seul "properties" par feature : comptage sans décoder le json
+                n_features=content.count(b'"properties"'),
+                n_stations_total=len(station_id_list),
+            )
+            contents.append(content)
+            index += len(station_id_list_chunk)
+
+        current_date = window_stop
+
+    return contents
+
+
 def get_data_from_api_bdx_by_station(
     station_id: str | list,
     start_date: str,
@@ -166,10 +938,23 @@ def get_data_from_api_bdx_by_station(
     timeout: int = 10,
     max_retries: int = 3,
     chunk_size_station: int = 25,
-) -> dict:
+    max_workers: int = 1,
+    api_client: ApiClient | None = None,
+    chunk_planner: AdaptiveChunkPlanner | None = None,
+    cache: ApiResponseCache | None = None,
+    as_bytes: bool = False,
+) -> dict | list[bytes]:
     """
     Permet d'obtenir les données d'activité d'une station via une API d'open data Bordeaux
 
+    Si le nombre de stations est supérieur à chunk_size_station, les stations sont découpées
+    en chunks. Avec max_workers > 1, les chunks sont récupérés en parallèle (ThreadPoolExecutor)
+    et fusionnés dans l'ordre des chunks : le GeoJSON retourné est identique au mode séquentiel.
+
+    Avec chunk_planner, les stations et la période sont découpées de manière adaptative
+    (cf AdaptiveChunkPlanner) et les requêtes sont faites séquentiellement : chunk_size_station
+    et max_workers sont alors ignorés. Les points sont regroupés par période puis par chunk de stations.
+
     Parameters
     ----------
     station_id : Int or List
@@ -179,100 +964,174 @@ def get_data_from_api_bdx_by_station(
     stop_date : str
         Date de fin de la Time Serie
     timeout : int
-        Timeout for the API request (default is 10 seconds)
+        Timeout for the API request (default is 10 seconds), ignoré si api_client est renseigné
     max_retries : int
-        Maximum number of retries for the API request (default is 3)
+        Maximum number of retries for the API request (default is 3), ignoré si api_client est renseigné
     chunk_size_station : int
         Chunk size for number of station to help API request (default is 25)
+    max_workers : int
+        Nombre maximum de requêtes simultanées sur l'API (default is 1, séquentiel)
+    api_client : ApiClient | None
+        Client HTTP (pool de connexions, retry, métriques) à réutiliser entre plusieurs appels
+        (default is None, un client est créé pour l'appel)
+    chunk_planner : AdaptiveChunkPlanner | None
+        Planificateur adaptatif de la taille des requêtes, peut être partagé entre plusieurs appels
+        (default is None, découpage fixe par chunk_size_station)
+    cache : ApiResponseCache | None
+        Cache disque des réponses, ignoré si api_client est renseigné (cf ApiClient(cache=...))
+        (default is None, pas de cache)
+    as_bytes : bool
+        Retourne le contenu brut de chaque réponse de l'API sans décodage json, à passer directement
+        à transform_json_api_bdx_station_data_to_df() (default is False)
 
     Returns
     -------
-    Time serie in Json format
+    Time serie in Json format (list[bytes] si as_bytes=True)
+
+    Raises
+    ------
+    RuntimeError
+        Si aucun chunk de stations n'a pu être récupéré, ou si un chunk est en erreur avec as_bytes=True
 
     Examples
     --------
     station_json = get_data_from_api_bdx_by_station(station_id=19,
                                                     start_date='2020-10-14',
                                                     stop_date='2020-10-17')
+
+    station_json = get_data_from_api_bdx_by_station(station_id=station_id_list,
+                                                    start_date='2020-10-14',
+                                                    stop_date='2020-10-17',
+                                                    max_workers=4)
+
+    station_json = get_data_from_api_bdx_by_station(station_id=station_id_list,
+                                                    start_date='2020-01-01',
+                                                    stop_date='2020-03-01',
+                                                    chunk_planner=AdaptiveChunkPlanner())
+
+    # Les requêtes déjà faites sur une période passée sont lues depuis le disque
+    station_json = get_data_from_api_bdx_by_station(station_id=station_id_list,
+                                                    start_date='2020-10-14',
+                                                    stop_date='2020-10-17',
+                                                    cache=ApiResponseCache())
+
+    # Réponses brutes, décodées directement en colonnes typées
+    station_bytes = get_data_from_api_bdx_by_station(station_id=station_id_list,
+                                                     start_date='2020-10-14',
+                                                     stop_date='2020-10-17',
+                                                     as_bytes=True)
+    station_df = transform_json_api_bdx_station_data_to_df(station_bytes)
     """
 
-    # Si plusieurs station_id ([124,  15,  60,]) -> list
-    if isinstance(station_id, list | np.ndarray):
-        station_id_join = ",".join(map(str, station_id))
+    if max_workers < 1:
+        raise ValueError("max_workers doit être supérieur ou égal à 1.")
 
-        url = (
-            "https://data.bordeaux-metropole.fr/geojson/aggregate/ci_vcub_p?key="
-            + KEY_API_BDX
-            + "&rangeStart="
-            + str(start_date)
-            + '&filter={"ident":{"$in":['
-            + str(station_id_join)
-            + "]}}&rangeEnd="
-            + str(stop_date)
-            + '&rangeStep=5min&attributes={"nom": "mode", "etat": "mode", "nbplaces": "max", "nbvelos": "max", "ident": "min"}'
-        )
-    # Si une seul station_id -> str
-    else:
-        url = (
-            "https://data.bordeaux-metropole.fr/geojson/aggregate/ci_vcub_p?key="
-            + KEY_API_BDX
-            + "&rangeStart="
-            + str(start_date)
-            + '&filter={"ident":'
-            + str(station_id)
-            + "}&rangeEnd="
-            + str(stop_date)
-            + '&rangeStep=5min&attributes={"nom": "mode", "etat": "mode", "nbplaces": "max", "nbvelos": "max", "ident": "min"}'
+    if api_client is None:
+        with ApiClient(
+            timeout=timeout, max_retries=max_retries, pool_maxsize=max(max_workers, 10), cache=cache
+        ) as default_client:
+            return get_data_from_api_bdx_by_station(
+                station_id=station_id,
+                start_date=start_date,
+                stop_date=stop_date,
+                chunk_size_station=chunk_size_station,
+                max_workers=max_workers,
+                api_client=default_client,
+                chunk_planner=chunk_planner,
+                as_bytes=as_bytes,
+            )
+
+    # Découpage adaptatif des stations et de la période
+    if chunk_planner is not None:
+        station_id_list = list(station_id) if isinstance(station_id, list | np.ndarray) else [station_id]
+        contents = get_data_from_api_bdx_adaptive_(
+            station_id_list=station_id_list,
+            start_date=date.fromisoformat(start_date),
+            stop_date=date.fromisoformat(stop_date),
+            api_client=api_client,
+            chunk_planner=chunk_planner,
         )
+        if as_bytes:
+            return contents
+        features = [feature for content in contents for feature in json.loads(content)["features"]]
+        return {"type": "FeatureCollection", "features": features}
+
+    fetch_ = api_client.get_content if as_bytes else api_client.get_json
 
-    # Retry logic
-    attempts = 0
-    while attempts < max_retries:
+    # Si peu de stations, un seul appel à l'API
+    if not isinstance(station_id, list | np.ndarray) or len(station_id) < chunk_size_station:
+        url = build_url_api_bdx_(station_id=station_id, start_date=start_date, stop_date=stop_date)
+        return [fetch_(url)] if as_bytes else fetch_(url)
+
+    # Si beaucoup de stations, on les découpe en chunks
+    station_id_chunks = list(chunk_list_(station_id, chunk_size_station))
+    total_chunks = len(station_id_chunks)
+
+    chunk_errors = {}
+
+    def fetch_chunk_(chunk_index: int, station_id_list_chunk: list) -> dict | bytes | None:
+        print(f"Récupération des données pour le chunk {chunk_index} / {total_chunks}")
+        url = build_url_api_bdx_(station_id=station_id_list_chunk, start_date=start_date, stop_date=stop_date)
         try:
-            # Si beaucoup de stations, on les découpe en chunks
-            if (isinstance(station_id, list) or isinstance(station_id, np.ndarray)) and len(
-                station_id
-            ) >= chunk_size_station:
-                total_chunks = len(list(chunk_list_(station_id, chunk_size_station)))
-
-                for chunk_index, station_id_list_chunk in enumerate(
-                    chunk_list_(station_id, chunk_size_station), start=1
-                ):
-                    print(f"Récupération des données pour le chunk {chunk_index} / {total_chunks}")
-                    try:
-                        station_json_chunk = get_data_from_api_bdx_by_station(
-                            station_id=station_id_list_chunk,
-                            start_date=start_date,
-                            stop_date=stop_date,
-                        )
+            return fetch_(url)
+        except Exception as e:
+            print(f"Erreur lors de la récupération des données pour le chunk {station_id_list_chunk}: {e}")
+            chunk_errors[chunk_index] = e
+            return None
 
-                        if "station_json" not in locals():
-                            station_json = station_json_chunk
-                        else:
-                            station_json["features"].extend(station_json_chunk["features"])
-                    except Exception as e:
-                        print(f"Erreur lors de la récupération des données pour le chunk {station_id_list_chunk}: {e}")
-                return station_json
+    if max_workers == 1:
+        station_json_chunks = [
+            fetch_chunk_(chunk_index, station_id_list_chunk)
+            for chunk_index, station_id_list_chunk in enumerate(station_id_chunks, start=1)
+        ]
+    else:
+        with ThreadPoolExecutor(max_workers=min(max_workers, total_chunks)) as executor:
+            # executor.map conserve l'ordre des chunks
+            station_json_chunks = list(
+                executor.map(fetch_chunk_, range(1, total_chunks + 1), station_id_chunks),
+            )
 
-            else:
-                response = requests.get(url, timeout=timeout)  # noqa: S113
-                response.raise_for_status()  # Raise an exception for HTTP errors
-                return response.json()
-        except (Timeout, ChunkedEncodingError) as e:
-            attempts += 1
-            time.sleep(10)  # Aout d'une time.sleep de 10 secondes
-            print(f"Tentative {attempts}/{max_retries} échouée avec l'erreur : {e}. Nouvelle tentative...")
-            if attempts == max_retries:
-                raise Exception(
-                    f"Erreur lors de la récupération des données après {max_retries} tentatives : {url}\n{e}"
-                ) from e
-        except requests.RequestException as e:
-            raise Exception(
-                f"Erreur lors de la récupération des données depuis l'API Bordeaux Métropole: {url}\n{e}"
-            ) from e
+    # Contenu brut (backfill, mise à jour du learning dataset) : un chunk manquant est une erreur,
+    # les données ne sont jamais écrites partiellement. GeoJSON : les chunks en erreur sont ignorés
+    # tant qu'au moins un chunk a été récupéré.
+    if len(chunk_errors) == total_chunks or (as_bytes and len(chunk_errors) > 0):
+        first_error = chunk_errors[min(chunk_errors)]
+        raise RuntimeError(
+            f"Erreur lors de la récupération des données de {len(chunk_errors)} / {total_chunks} chunks "
+            f"de stations ({start_date} - {stop_date}) : {first_error}"
+        ) from first_error
+
+    if as_bytes:
+        return station_json_chunks
+
+    # Fusion des chunks dans l'ordre
+    station_json = None
+    for station_json_chunk in station_json_chunks:
+        if station_json_chunk is None:
+            continue
+        if station_json is None:
+            station_json = station_json_chunk
+        else:
+            station_json["features"].extend(station_json_chunk["features"])
+
+    return station_json
+
+
+# Schéma des properties des features GeoJSON de l'API de Bordeaux, seules les propriétés utilisées sont lues
+SCHEMA_API_BDX_PROPERTIES = pl.Struct(
+    {
+        "time": pl.String,
+        "ident": pl.Int64,
+        "etat": pl.String,
+        "nbplaces": pl.Int64,
+        "nbvelos": pl.Int64,
+    }
+)
 
 
-def transform_json_api_bdx_station_data_to_df(station_json: dict) -> pl.LazyFrame:
+def transform_json_api_bdx_station_data_to_df(
+    station_json: dict | bytes | list[bytes], previous_state: pl.LazyFrame | None = None
+) -> pl.LazyFrame:
     """
     Tranforme la Time Serie d'activité d'une ou plusieurs station en DataFrame
     à partir de la fonction get_data_from_api_bdx_by_station()
@@ -286,8 +1145,13 @@ def transform_json_api_bdx_station_data_to_df(station_json: dict) -> pl.LazyFram
 
     Parameters
     ----------
-    station_json : json
-        Time serie au format json de l'activité d'une station (ou plusieurs)
+    station_json : json | bytes | list[bytes]
+        Time serie au format json de l'activité d'une station (ou plusieurs), ou contenu brut
+        des réponses de l'API (get_data_from_api_bdx_by_station(as_bytes=True)), plus rapide
+        (cf normalize_json_api_bdx_station_data_())
+    previous_state : LazyFrame | None
+        Dernière ligne connue de chaque station (cf process_api_bdx_station_data_()),
+        utilisé pour ajouter des données à un learning dataset existant.
     Returns
     -------
     station_df_resample : LazyFrame
@@ -301,24 +1165,74 @@ def transform_json_api_bdx_station_data_to_df(station_json: dict) -> pl.LazyFram
 
     """
 
-    station_df = pl.json_normalize(station_json["features"], max_level=1).lazy()
+    station_df = normalize_json_api_bdx_station_data_(station_json)
+
+    station_df_resample = process_api_bdx_station_data_(station_df, previous_state=previous_state)
+
+    return station_df_resample
+
+
+def normalize_json_api_bdx_station_data_(station_json: dict | bytes | list[bytes]) -> pl.LazyFrame:
+    """
+    Première étape de transform_json_api_bdx_station_data_to_df() : structuration, naming
+    et typage des données brutes (5 min) de l'API de Bordeaux, sans resampling.
+    Permet de stocker les données brutes d'un appel API (cf create/creator.py create_learning_dataset())
+
+    Le contenu brut des réponses (bytes) est lu directement en colonnes typées par le lecteur
+    json de Polars (schéma SCHEMA_API_BDX_PROPERTIES), sans créer de dict Python par point.
+    Un json déjà décodé (dict) est converti avec le même schéma.
+
+    Parameters
+    ----------
+    station_json : json | bytes | list[bytes]
+        Time serie au format json de l'activité d'une station (ou plusieurs), ou contenu brut
+        d'une ou plusieurs réponses de l'API (cf get_data_from_api_bdx_by_station(as_bytes=True))
+
+    Returns
+    -------
+    station_df : LazyFrame
+        Colonnes date, station_id, status, available_stands, available_bikes
+
+    Examples
+    --------
+    station_df = normalize_json_api_bdx_station_data_(station_json)
+    """
+
+    if isinstance(station_json, dict):
+        station_df = pl.from_dicts(station_json["features"], schema={"properties": SCHEMA_API_BDX_PROPERTIES})
+    else:
+        contents = [station_json] if isinstance(station_json, bytes) else station_json
+        station_df = pl.concat(
+            [
+                pl.read_json(
+                    io.BytesIO(content),
+                    schema={"features": pl.List(pl.Struct({"properties": SCHEMA_API_BDX_PROPERTIES}))},
+                )
+                .filter(pl.col("features").list.len() > 0)
+                .explode("features")
+                .unnest("features")
+                for content in contents
+            ],
+            how="vertical",
+        )
+    station_df = station_df.unnest("properties").lazy()
 
     # Naming from JSON DataFrame
     station_df = station_df.rename(
         mapping={
-            "properties.time": "date",
-            "properties.ident": "station_id",
-            "properties.etat": "status",
-            "properties.nbplaces": "available_stands",
-            "properties.nbvelos": "available_bikes",
+            "time": "date",
+            "ident": "station_id",
+            "etat": "status",
+            "nbplaces": "available_stands",
+            "nbvelos": "available_bikes",
         }
-    ).drop("type", "properties.gid", "properties.nom")  # drop unused columns
+    )
 
     # Status mapping
     status_dict = {"CONNECTEE": 1, "DECONNECTEE": 0, "MAINTENANCE": 0}
     station_df = station_df.with_columns(status=pl.col("status").replace_strict(status_dict, default=0).cast(pl.UInt8))
 
-    station_df = station_df.with_columns(station_id=pl.col("station_id").cast(pl.Int32()))
+    station_df = station_df.pipe(cast_to_schema)
     station_df = station_df.with_columns(
         # cast into datetime with tz_aware to Paris to none
         date=pl.col("date")
@@ -326,11 +1240,65 @@ def transform_json_api_bdx_station_data_to_df(station_json: dict) -> pl.LazyFram
         .dt.replace_time_zone(None),
     )
 
+    return station_df
+
+
+def process_api_bdx_station_data_(station_df: pl.LazyFrame, previous_state: pl.LazyFrame | None = None) -> pl.LazyFrame:
+    """
+    Seconde étape de transform_json_api_bdx_station_data_to_df() : dédoublonnage, tri,
+    création des transactions et resampling sur 10 min des données issues de
+    normalize_json_api_bdx_station_data_().
+
+    Si previous_state est renseigné (dernière ligne resamplée de chaque station d'un learning dataset
+    existant), seules les données brutes postérieures à cette ligne sont conservées et le dernier
+    état connu de la station sert de point de départ au calcul des transactions_* : les transactions
+    à la frontière entre anciennes et nouvelles données sont identiques à un calcul complet.
+
+    Parameters
+    ----------
+    station_df : LazyFrame
+        Données brutes (5 min) issues de normalize_json_api_bdx_station_data_()
+    previous_state : LazyFrame | None
+        Colonnes station_id, date, status, available_stands, available_bikes de la dernière
+        ligne de chaque station déjà connue (default is None)
+
+    Returns
+    -------
+    station_df_resample : LazyFrame
+        Time serie resampler sur 10 min.
+
+    Examples
+    --------
+    station_df_resample = process_api_bdx_station_data_(station_df)
+    """
+
+    if previous_state is not None:
+        # La date d'une ligne resamplée est la borne droite de sa fenêtre de 10 min :
+        # les données brutes antérieures sont déjà dans le learning dataset
+        station_df = (
+            station_df.join(
+                previous_state.select("station_id", pl.col("date").alias("date_previous")),
+                on="station_id",
+                how="left",
+            )
+            .filter(pl.col("date_previous").is_null() | (pl.col("date") >= pl.col("date_previous")))
+            .drop("date_previous")
+            .with_columns(is_previous_state=pl.lit(False))
+        )
+        # Dernier état connu placé juste avant les nouvelles données (retiré après le calcul des transactions)
+        previous_state = previous_state.select(
+            pl.col(col).cast(dtype) for col, dtype in station_df.collect_schema().items() if col != "is_previous_state"
+        ).with_columns(date=pl.col("date") - pl.duration(microseconds=1), is_previous_state=pl.lit(True))
+        station_df = pl.concat([previous_state, station_df])
+
     station_df = station_df.unique(subset=["station_id", "date"])
     station_df = station_df.sort(["station_id", "date"], descending=[False, False])
 
     # Create features
-    station_df = station_df.pipe(get_transactions_in).pipe(get_transactions_out).pipe(get_transactions_all)
+    station_df = station_df.pipe(get_transactions, is_sorted=True)
+
+    if previous_state is not None:
+        station_df = station_df.filter(~pl.col("is_previous_state")).drop("is_previous_state")
 
     ## Resampling
 
@@ -342,4 +1310,7 @@ def transform_json_api_bdx_station_data_to_df(station_json: dict) -> pl.LazyFram
         pl.col("transactions_out").sum(),
         pl.col("transactions_all").sum(),
     )
+    # Les sommes sont en Int64 : retour aux types de SCHEMA_ACTIVITY
+    station_df_resample = station_df_resample.pipe(cast_to_schema)
+
     return station_df_resample
@@ -1,9 +1,19 @@
+import glob
+import hashlib
 import io
+import json
+import os
+import threading
 import warnings
+from datetime import datetime
 
 import pandas as pd
 import polars as pl
 
+from vcub_keeper.config import SCHEMA_ACTIVITY, STATION_BUCKET_SIZE
+from vcub_keeper.reader.reader_utils import cast_to_schema
+from vcub_keeper.transform.features_factory import get_features_version_, get_station_activity_features
+
 
 def read_stations_attributes(
     path_directory: str, data: None | io.StringIO = None, file_name="station_attribute.csv", output_type: str = ""
@@ -29,7 +39,7 @@ def read_stations_attributes(
     stations = read_stations_attributes(path_directory=ROOT_DATA_REF)
     """
 
-    column_dtypes = {"station_id": pl.UInt16}
+    column_dtypes = {"station_id": SCHEMA_ACTIVITY["station_id"]}
 
     if isinstance(data, io.StringIO):
         file_path = data
@@ -79,12 +89,12 @@ def read_activity_vcub(file_path: str = "../../data/bordeaux.csv") -> pl.LazyFra
 
     column_dtypes = {
         "gid": pl.UInt8,
-        "ident": pl.UInt8,
+        "ident": SCHEMA_ACTIVITY["station_id"],
         "type": pl.Categorical,
         "name": pl.Utf8,
         "state": pl.String,
-        "available_stands": pl.Int8,
-        "available_bikes": pl.Int8,
+        "available_stands": SCHEMA_ACTIVITY["available_stands"],
+        "available_bikes": SCHEMA_ACTIVITY["available_bikes"],
     }
 
     state_dict = {"CONNECTEE": 1, "DECONNECTEE": 0}
@@ -206,15 +216,164 @@ def read_station_profile(path_directory: str, file_name: str = "station_profile.
 
     station_profile = read_station_profile(path_directory=ROOT_DATA_REF)
     """
-    column_dtypes = {"station_id": pl.UInt16}
+    column_dtypes = {"station_id": SCHEMA_ACTIVITY["station_id"]}
     station_profile = pl.read_csv(path_directory + file_name, separator=",", schema_overrides=column_dtypes)
 
     return station_profile
 
 
-def read_learning_dataset(file_path: str, file_name: str = "learning_dataset") -> pl.LazyFrame:
+# Profil des stations en mémoire par fichier : chemin -> ((st_mtime_ns, st_size), {station_id: profil})
+station_profile_lookup_ = {}
+station_profile_lookup_lock_ = threading.Lock()
+
+
+def get_station_profile_lookup(path_directory: str, file_name: str = "station_profile.csv") -> dict[int, str]:
+    """
+    Profil d'activité de chaque station ({station_id: "very high", ...}) gardé en mémoire.
+    Le fichier (cf read_station_profile()) n'est relu que si sa date de modification ou sa taille change :
+    l'apprentissage et la prédiction de plusieurs stations ne relisent pas le csv à chaque station.
+
+    Parameters
+    ----------
+    path_directory : str
+        chemin d'accès (ROOT_DATA_REF)
+    file_name : str
+        Nom du fichier
+
+    Returns
+    -------
+    dict[int, str]
+        Profil (profile_station_activity) de chaque station
+
+    Examples
+    --------
+    profile_station_activity = get_station_profile_lookup(path_directory=ROOT_DATA_REF)[110]
+    """
+    file = path_directory + file_name
+    stat = os.stat(file)
+    file_version = (stat.st_mtime_ns, stat.st_size)
+
+    with station_profile_lookup_lock_:
+        cached = station_profile_lookup_.get(file)
+        if cached is None or cached[0] != file_version:
+            station_profile = read_station_profile(path_directory=path_directory, file_name=file_name)
+            profile_by_station = dict(
+                station_profile.select("station_id", pl.col("profile_station_activity").cast(pl.String)).iter_rows()
+            )
+            cached = (file_version, profile_by_station)
+            station_profile_lookup_[file] = cached
+
+    return cached[1]
+
+
+def get_learning_dataset_files_(
+    file_path: str,
+    file_name: str = "learning_dataset",
+    station_id: int | list[int] | None = None,
+    start_date: str | None = None,
+    end_date: str | None = None,
+) -> list[str]:
+    """
+    Liste les fichiers du learning dataset partitionné (file_path/file_name/month=YYYY-MM/station_bucket=K/)
+    utiles pour les stations et la période demandées. Est uniquement utilisé par read_learning_dataset()
+
+    Parameters
+    ----------
+    file_path : str
+        Chemin vers le dossier du learning dataset.
+    file_name : str
+        Nom du learning dataset (default: "learning_dataset").
+    station_id : int | list[int] | None
+        Station(s) à lire (default: None, toutes les stations).
+    start_date : str | None
+        Date de début "YYYY-MM-DD" (default: None).
+    end_date : str | None
+        Date de fin "YYYY-MM-DD" (default: None).
+
+    Returns
+    -------
+    list[str]
+        Fichiers parquet triés
+
+    Example
+    -------
+    files = get_learning_dataset_files_(file_path=ROOT_DATA_CLEAN, station_id=106, start_date="2025-01-01")
+    """
+    if isinstance(station_id, int):
+        station_id = [station_id]
+    station_buckets = None if station_id is None else {station // STATION_BUCKET_SIZE for station in station_id}
+    start_month = None if start_date is None else start_date[:7]
+    end_month = None if end_date is None else end_date[:7]
+
+    files = []
+    for partition_file in glob.glob(f"{file_path}{file_name}/month=*/station_bucket=*/*.parquet"):
+        month = partition_file.split("month=")[-1].split("/")[0]
+        station_bucket = int(partition_file.split("station_bucket=")[-1].split("/")[0])
+        if station_buckets is not None and station_bucket not in station_buckets:
+            continue
+        if start_month is not None and month < start_month:
+            continue
+        if end_month is not None and month > end_month:
+            continue
+        files.append(partition_file)
+
+    return sorted(files)
+
+
+def filter_learning_dataset_(
+    data: pl.LazyFrame,
+    station_id: int | list[int] | None = None,
+    start_date: str | None = None,
+    end_date: str | None = None,
+) -> pl.LazyFrame:
+    """
+    Filtre sur les stations et la période demandées. Utilisé par read_learning_dataset() et read_features()
+
+    Parameters
+    ----------
+    data : pl.LazyFrame
+        Learning dataset
+    station_id : int | list[int] | None
+        Filtre sur une ou plusieurs stations (default: None).
+    start_date : str | None
+        Filtre sur les dates >= start_date "YYYY-MM-DD" (default: None).
+    end_date : str | None
+        Filtre sur les dates <= end_date "YYYY-MM-DD" (default: None).
+
+    Returns
+    -------
+    pl.LazyFrame
+
+    Example
+    -------
+    data = filter_learning_dataset_(data, station_id=106, start_date="2025-01-01")
+    """
+    if station_id is not None:
+        station_id = [station_id] if isinstance(station_id, int) else station_id
+        data = data.filter(pl.col("station_id").is_in(station_id))
+    if start_date is not None:
+        data = data.filter(pl.col("date") >= datetime.fromisoformat(start_date))
+    if end_date is not None:
+        data = data.filter(pl.col("date") <= datetime.fromisoformat(end_date))
+
+    return data
+
+
+def read_learning_dataset(
+    file_path: str,
+    file_name: str = "learning_dataset",
+    station_id: int | list[int] | None = None,
+    start_date: str | None = None,
+    end_date: str | None = None,
+) -> pl.LazyFrame:
     """
     Permets de lire les données d'apprentissage (fichier parquet).
+    Les données ajoutées par create/creator.py update_learning_dataset() (dossier {file_name}_append/)
+    sont lues avec le fichier principal et le résultat reste trié par station_id et date.
+
+    Si le learning dataset est partitionné (dossier file_path/file_name/, cf create/creator.py
+    compact_learning_dataset()), seuls les fichiers des partitions (mois et groupe de stations)
+    correspondant aux filtres sont lus.
 
     Parameters
     ----------
@@ -222,13 +381,168 @@ def read_learning_dataset(file_path: str, file_name: str = "learning_dataset") -
         Chemin vers le fichier.
     file_name : str
         Nom du fichier (default: "learning_dataset").
+    station_id : int | list[int] | None
+        Filtre sur une ou plusieurs stations (default: None).
+    start_date : str | None
+        Filtre sur les dates >= start_date "YYYY-MM-DD" (default: None).
+    end_date : str | None
+        Filtre sur les dates <= end_date "YYYY-MM-DD" (default: None).
     Returns
     -------
     pl.DataFrame
         Le DataFrame contenant les données d'apprentissage.
 
+    Raises
+    ------
+    FileNotFoundError
+        Si le dossier du learning dataset partitionné ne contient aucun fichier parquet.
+
     Example
     -------
     station_df = read_learning_dataset(file_path=ROOT_DATA_CLEAN, file_name="learning_dataset")
+    station_df = read_learning_dataset(file_path=ROOT_DATA_CLEAN, station_id=106, start_date="2025-01-01")
+    """
+    if os.path.isdir(f"{file_path}{file_name}"):
+        files = get_learning_dataset_files_(
+            file_path=file_path, file_name=file_name, station_id=station_id, start_date=start_date, end_date=end_date
+        )
+        if len(files) == 0:
+            # Aucune partition pour les filtres : on garde le schéma du learning dataset
+            files = get_learning_dataset_files_(file_path=file_path, file_name=file_name)[:1]
+            if len(files) == 0:
+                raise FileNotFoundError(
+                    f"Aucun fichier parquet dans le learning dataset partitionné {file_path}{file_name}/"
+                )
+            learning_dataset = pl.scan_parquet(files).head(0)
+        else:
+            learning_dataset = pl.scan_parquet(files, hive_partitioning=False).sort(["station_id", "date"])
+    else:
+        append_files = sorted(glob.glob(f"{file_path}{file_name}_append/*.parquet"))
+        if len(append_files) == 0:
+            learning_dataset = pl.scan_parquet(f"{file_path}{file_name}.parquet")
+        else:
+            learning_dataset = pl.scan_parquet([f"{file_path}{file_name}.parquet", *append_files]).sort(
+                ["station_id", "date"]
+            )
+
+    learning_dataset = filter_learning_dataset_(
+        learning_dataset, station_id=station_id, start_date=start_date, end_date=end_date
+    )
+
+    # Types compacts (y compris pour un learning dataset créé avant SCHEMA_ACTIVITY)
+    learning_dataset = cast_to_schema(learning_dataset)
+
+    return learning_dataset
+
+
+def get_features_store_key_(file_path: str, file_name: str = "learning_dataset") -> str:
     """
-    return pl.scan_parquet(f"{file_path}/{file_name}.parquet")
+    Clé du feature store : empreinte des fichiers du learning dataset (chemin, taille et date de
+    modification de chaque fichier, y compris les données ajoutées et les partitions) et de la version
+    des features (cf transform/features_factory.py get_features_version_()).
+
+    Parameters
+    ----------
+    file_path : str
+        Chemin vers le dossier du learning dataset.
+    file_name : str
+        Nom du learning dataset (default: "learning_dataset").
+
+    Returns
+    -------
+    str
+
+    Example
+    -------
+    key = get_features_store_key_(file_path=ROOT_DATA_CLEAN)
+    """
+    if os.path.isdir(f"{file_path}{file_name}"):
+        files = get_learning_dataset_files_(file_path=file_path, file_name=file_name)
+    else:
+        files = [f"{file_path}{file_name}.parquet", *sorted(glob.glob(f"{file_path}{file_name}_append/*.parquet"))]
+
+    key = hashlib.sha256(get_features_version_().encode())
+    for file in files:
+        stat = os.stat(file)
+        key.update(f"{os.path.relpath(file, file_path)}:{stat.st_size}:{stat.st_mtime_ns}\n".encode())
+
+    return key.hexdigest()
+
+
+def read_features_store_key_(path_features: str) -> str | None:
+    """
+    Clé du feature store enregistrée dans path_features/manifest.json (None si absent).
+
+    Parameters
+    ----------
+    path_features : str
+        Dossier du feature store ({file_path}{file_name}_features/)
+
+    Returns
+    -------
+    str | None
+
+    Example
+    -------
+    key = read_features_store_key_(f"{ROOT_DATA_CLEAN}learning_dataset_features/")
+    """
+    if not os.path.isfile(f"{path_features}manifest.json"):
+        return None
+
+    with open(f"{path_features}manifest.json") as f:
+        return json.load(f).get("key")
+
+
+def read_features(
+    file_path: str,
+    file_name: str = "learning_dataset",
+    station_id: int | list[int] | None = None,
+    start_date: str | None = None,
+    end_date: str | None = None,
+) -> pl.LazyFrame:
+    """
+    Permets de lire le learning dataset avec les features par station (transactions_in, transactions_out,
+    transactions_all et consecutive_no_transactions_out, cf transform/features_factory.py
+    get_station_activity_features()).
+
+    Si le feature store ({file_path}{file_name}_features/, cf create/creator.py create_features_store())
+    correspond au learning dataset et à la version des features, les colonnes sont lues dans le
+    feature store. Sinon, les features sont calculées à partir du learning dataset.
+
+    Parameters
+    ----------
+    file_path : str
+        Chemin vers le fichier.
+    file_name : str
+        Nom du fichier (default: "learning_dataset").
+    station_id : int | list[int] | None
+        Filtre sur une ou plusieurs stations (default: None).
+    start_date : str | None
+        Filtre sur les dates >= start_date "YYYY-MM-DD" (default: None).
+    end_date : str | None
+        Filtre sur les dates <= end_date "YYYY-MM-DD" (default: None).
+
+    Returns
+    -------
+    pl.LazyFrame
+        Le learning dataset avec les features, trié par station_id et date.
+
+    Example
+    -------
+    ts_activity = read_features(file_path=ROOT_DATA_CLEAN)
+    ts_activity = read_features(file_path=ROOT_DATA_CLEAN, station_id=106, start_date="2025-01-01")
+    """
+    path_features = f"{file_path}{file_name}_features/"
+
+    if read_features_store_key_(path_features) == get_features_store_key_(file_path=file_path, file_name=file_name):
+        features = pl.scan_parquet(sorted(glob.glob(f"{path_features}*.parquet")))
+        features = filter_learning_dataset_(features, station_id=station_id, start_date=start_date, end_date=end_date)
+
+        return cast_to_schema(features)
+
+    # Features calculées sur tout l'historique des stations demandées, puis filtre sur la période
+    features = read_learning_dataset(file_path=file_path, file_name=file_name, station_id=station_id).pipe(
+        get_station_activity_features, is_sorted=True
+    )
+
+    return filter_learning_dataset_(features, start_date=start_date, end_date=end_date)
@@ -2,6 +2,8 @@ from datetime import datetime
 
 import polars as pl
 
+from vcub_keeper.config import SCHEMA_ACTIVITY
+
 
 def filter_periode(data: pl.DataFrame, non_use_station_id: list[int] | None = None) -> pl.DataFrame:
     """
@@ -20,3 +22,29 @@ def filter_periode(data: pl.DataFrame, non_use_station_id: list[int] | None = No
     data = data.filter(~pl.col.station_id.is_in(non_use_station_id))
 
     return data
+
+
+def cast_to_schema(data: pl.LazyFrame, schema: dict[str, pl.DataType] = SCHEMA_ACTIVITY) -> pl.LazyFrame:
+    """
+    Applique les types du schéma (SCHEMA_ACTIVITY par défaut) aux colonnes présentes dans les données.
+    Les autres colonnes ne sont pas modifiées.
+
+    Parameters
+    ----------
+    data : LazyFrame
+        Activité des stations Vcub
+    schema : dict[str, pl.DataType]
+        Type de chaque colonne (default: SCHEMA_ACTIVITY)
+
+    Returns
+    -------
+    data : LazyFrame
+
+    Examples
+    --------
+    activite = cast_to_schema(activite)
+    """
+
+    columns = data.collect_schema().names()
+
+    return data.with_columns(pl.col(col).cast(dtype) for col, dtype in schema.items() if col in columns)
@@ -1,9 +1,96 @@
+import hashlib
+import inspect
+import warnings
+from functools import lru_cache, partial
+
 import numpy as np
-import pandas as pd
 import polars as pl
 
+from vcub_keeper.config import DTYPE_ENCODING_TIME, REGRESSION_ROLLING_WINDOWS, SCHEMA_ACTIVITY
+
+
+def is_sorted_by_station_(data: pl.LazyFrame | pl.DataFrame) -> bool:
+    """
+    Détecte à partir des métadonnées de tri de Polars (sans parcourir les données) si les lignes
+    d'une même station sont contiguës. Seul un pl.DataFrame porte ces métadonnées : pour un LazyFrame,
+    le mode pré-trié doit être demandé explicitement (is_sorted=True).
+
+    Parameters
+    ----------
+    data : LazyFrame | DataFrame
+        Activité des stations Vcub
+
+    Returns
+    -------
+    bool
+        True si la colonne 'station_id' est marquée comme triée
+
+    Examples
+    --------
+
+    is_sorted = is_sorted_by_station_(activite)
+    """
+
+    if not isinstance(data, pl.DataFrame):
+        return False
+
+    flags = data["station_id"].flags
+    return flags["SORTED_ASC"] or flags["SORTED_DESC"]
+
+
+def shift_by_station_(col: str, is_sorted: bool) -> pl.Expr:
+    """
+    Valeur précédente de `col` pour une même station (null sur la première ligne de la station).
+
+    Si les données sont triées par station (is_sorted=True), la colonne entière est décalée d'une ligne
+    et la valeur est masquée aux frontières entre stations (station_id différent de la ligne précédente),
+    sans partitionner les données par station_id comme le fait .over("station_id").
+
+    Parameters
+    ----------
+    col : str
+        Nom de la colonne à décaler
+    is_sorted : bool
+        Les lignes d'une même station sont contiguës (tri par station_id et date)
+
+    Returns
+    -------
+    pl.Expr
+
+    Examples
+    --------
+
+    data = data.with_columns(shift_by_station_("available_bikes", is_sorted=True).alias("available_bikes_shift"))
+    """
+
+    if is_sorted:
+        return pl.when(pl.col("station_id") == pl.col("station_id").shift(1)).then(pl.col(col).shift(1))
+
+    return pl.col(col).shift(1).over("station_id")
+
+
+def get_position_in_station_() -> pl.Expr:
+    """
+    Position de la ligne (0, 1, 2...) dans les données de sa station pour des données triées
+    par station_id et date. Utilisé par get_rolling_extrema() et par les features de regression
+    (cf ml/prediction_station/transform.py build_lag_and_rolling_feat_by_station())
 
-def get_transactions_out(data: pl.LazyFrame) -> pl.LazyFrame:
+    Returns
+    -------
+    pl.Expr
+
+    Examples
+    --------
+    data = data.with_columns(get_position_in_station_().alias("position_in_station"))
+    """
+
+    is_start = (pl.col("station_id") != pl.col("station_id").shift(1)).fill_null(True)
+    row_nr = pl.int_range(pl.len(), dtype=pl.Int64)
+
+    return row_nr - pl.when(is_start).then(row_nr).forward_fill()
+
+
+def get_transactions_out(data: pl.LazyFrame, is_sorted: bool | None = None) -> pl.LazyFrame:
     """
     Calcul le nombre de prise de vélo qu'il y a eu pour une même station entre 2 points de données
 
@@ -11,6 +98,10 @@ def get_transactions_out(data: pl.LazyFrame) -> pl.LazyFrame:
     ----------
     data : layzFrame
         Activité des stations Vcub
+    is_sorted : bool | None
+        Les données sont triées par station_id et date : calcul sur des segments contigus sans
+        .over("station_id"). Si None, détecté à partir des métadonnées de tri (cf is_sorted_by_station_)
+        (default: None).
 
     Returns
     -------
@@ -23,12 +114,21 @@ def get_transactions_out(data: pl.LazyFrame) -> pl.LazyFrame:
     activite = get_transactions_out(activite)
     """
 
-    data = data.with_columns(pl.col("available_stands").shift(1).over("station_id").alias("available_stands_shift"))
+    if is_sorted is None:
+        is_sorted = is_sorted_by_station_(data)
+
+    data = data.with_columns(shift_by_station_("available_stands", is_sorted).alias("available_stands_shift"))
     data = data.with_columns(pl.col("available_stands_shift").fill_null(pl.col("available_stands")))
-    data = data.with_columns(transactions_out=(pl.col("available_stands") - pl.col("available_stands_shift")))
+    # Différence signée (available_stands est non signé, cf SCHEMA_ACTIVITY)
+    data = data.with_columns(
+        transactions_out=(pl.col("available_stands").cast(pl.Int16) - pl.col("available_stands_shift").cast(pl.Int16))
+    )
 
     data = data.with_columns(
-        transactions_out=pl.when(pl.col("transactions_out") < 0).then(0).otherwise(pl.col("transactions_out"))
+        transactions_out=pl.when(pl.col("transactions_out") < 0)
+        .then(0)
+        .otherwise(pl.col("transactions_out"))
+        .cast(SCHEMA_ACTIVITY["transactions_out"])
     )
 
     # Drop non usefull column
@@ -37,7 +137,7 @@ def get_transactions_out(data: pl.LazyFrame) -> pl.LazyFrame:
     return data
 
 
-def get_transactions_in(data: pl.LazyFrame) -> pl.LazyFrame:
+def get_transactions_in(data: pl.LazyFrame, is_sorted: bool | None = None) -> pl.LazyFrame:
     """
     Calcul le nombre d'ajout de vélo qu'il y a eu pour une même station entre 2 points de données
 
@@ -45,6 +145,10 @@ def get_transactions_in(data: pl.LazyFrame) -> pl.LazyFrame:
     ----------
     data : lazyFrame
         Activité des stations Vcub
+    is_sorted : bool | None
+        Les données sont triées par station_id et date : calcul sur des segments contigus sans
+        .over("station_id"). Si None, détecté à partir des métadonnées de tri (cf is_sorted_by_station_)
+        (default: None).
 
     Returns
     -------
@@ -57,12 +161,21 @@ def get_transactions_in(data: pl.LazyFrame) -> pl.LazyFrame:
     activite = get_transactions_in(activite)
     """
 
-    data = data.with_columns(pl.col("available_bikes").shift(1).over("station_id").alias("available_bikes_shift"))
+    if is_sorted is None:
+        is_sorted = is_sorted_by_station_(data)
+
+    data = data.with_columns(shift_by_station_("available_bikes", is_sorted).alias("available_bikes_shift"))
     data = data.with_columns(pl.col("available_bikes_shift").fill_null(pl.col("available_bikes")))
-    data = data.with_columns(transactions_in=(pl.col("available_bikes") - pl.col("available_bikes_shift")))
+    # Différence signée (available_bikes est non signé, cf SCHEMA_ACTIVITY)
+    data = data.with_columns(
+        transactions_in=(pl.col("available_bikes").cast(pl.Int16) - pl.col("available_bikes_shift").cast(pl.Int16))
+    )
 
     data = data.with_columns(
-        transactions_in=pl.when(pl.col("transactions_in") < 0).then(0).otherwise(pl.col("transactions_in"))
+        transactions_in=pl.when(pl.col("transactions_in") < 0)
+        .then(0)
+        .otherwise(pl.col("transactions_in"))
+        .cast(SCHEMA_ACTIVITY["transactions_in"])
     )
 
     # Drop non usefull column
@@ -71,7 +184,7 @@ def get_transactions_in(data: pl.LazyFrame) -> pl.LazyFrame:
     return data
 
 
-def get_transactions_all(data: pl.LazyFrame) -> pl.LazyFrame:
+def get_transactions_all(data: pl.LazyFrame, is_sorted: bool | None = None) -> pl.LazyFrame:
     """
     Calcul le nombre de transactions de vélo (ajout et dépôt) qu'il y a eu pour une même
     station entre 2 points de données
@@ -80,6 +193,10 @@ def get_transactions_all(data: pl.LazyFrame) -> pl.LazyFrame:
     ----------
     data : lazyFrame
         Activité des stations Vcub
+    is_sorted : bool | None
+        Les données sont triées par station_id et date : calcul sur des segments contigus sans
+        .over("station_id"). Si None, détecté à partir des métadonnées de tri (cf is_sorted_by_station_)
+        (default: None).
 
     Returns
     -------
@@ -92,9 +209,17 @@ def get_transactions_all(data: pl.LazyFrame) -> pl.LazyFrame:
     activite = get_transactions_all(activite)
     """
 
-    data = data.with_columns(pl.col("available_bikes").shift(1).over("station_id").alias("available_bikes_shift"))
+    if is_sorted is None:
+        is_sorted = is_sorted_by_station_(data)
+
+    data = data.with_columns(shift_by_station_("available_bikes", is_sorted).alias("available_bikes_shift"))
     data = data.with_columns(pl.col("available_bikes_shift").fill_null(pl.col("available_bikes")))
-    data = data.with_columns(transactions_all=(pl.col("available_bikes") - pl.col("available_bikes_shift")).abs())
+    # Différence signée (available_bikes est non signé, cf SCHEMA_ACTIVITY)
+    data = data.with_columns(
+        transactions_all=(pl.col("available_bikes").cast(pl.Int16) - pl.col("available_bikes_shift").cast(pl.Int16))
+        .abs()
+        .cast(SCHEMA_ACTIVITY["transactions_all"])
+    )
 
     # Drop non usefull column
     data = data.drop("available_bikes_shift")
@@ -102,7 +227,98 @@ def get_transactions_all(data: pl.LazyFrame) -> pl.LazyFrame:
     return data
 
 
-def get_consecutive_no_transactions_out(data: pl.LazyFrame) -> pl.LazyFrame:
+def get_transactions(data: pl.LazyFrame, is_sorted: bool | None = None) -> pl.LazyFrame:
+    """
+    Calcul en une seule passe les colonnes 'transactions_in', 'transactions_out' et 'transactions_all'
+    (identique à get_transactions_in(), get_transactions_out() puis get_transactions_all()).
+
+    Les valeurs précédentes de 'available_bikes' et 'available_stands' sont calculées dans le même
+    contexte (une seule partition par station_id) et la différence de 'available_bikes' est partagée
+    entre 'transactions_in' et 'transactions_all'.
+
+    Parameters
+    ----------
+    data : lazyFrame
+        Activité des stations Vcub
+    is_sorted : bool | None
+        Les données sont triées par station_id et date : calcul sur des segments contigus sans
+        .over("station_id"). Si None, détecté à partir des métadonnées de tri (cf is_sorted_by_station_)
+        (default: None).
+
+    Returns
+    -------
+    data : lazyFrame
+        Ajout des colonnes 'transactions_in', 'transactions_out' et 'transactions_all'
+
+    Examples
+    --------
+
+    activite = get_transactions(activite)
+    """
+
+    if is_sorted is None:
+        is_sorted = is_sorted_by_station_(data)
+
+    data = data.with_columns(
+        shift_by_station_("available_bikes", is_sorted).alias("available_bikes_shift"),
+        shift_by_station_("available_stands", is_sorted).alias("available_stands_shift"),
+    )
+
+    # Différences signées (available_* sont non signés, cf SCHEMA_ACTIVITY)
+    bikes = pl.col("available_bikes").cast(pl.Int16)
+    stands = pl.col("available_stands").cast(pl.Int16)
+    diff_bikes = bikes - pl.col("available_bikes_shift").cast(pl.Int16).fill_null(bikes)
+    diff_stands = stands - pl.col("available_stands_shift").cast(pl.Int16).fill_null(stands)
+
+    data = data.with_columns(
+        transactions_in=diff_bikes.clip(lower_bound=0).cast(SCHEMA_ACTIVITY["transactions_in"]),
+        transactions_out=diff_stands.clip(lower_bound=0).cast(SCHEMA_ACTIVITY["transactions_out"]),
+        transactions_all=diff_bikes.abs().cast(SCHEMA_ACTIVITY["transactions_all"]),
+    )
+
+    # Drop non usefull column
+    data = data.drop("available_bikes_shift", "available_stands_shift")
+
+    return data
+
+
+def get_run_length_sorted_(col_logic: str, offset: pl.Expr | None = None) -> pl.Expr:
+    """
+    Longueur de la séquence en cours (1, 2, 3...) des lignes où `col_logic` == 1 pour des données triées
+    par station_id et date (0 si `col_logic` == 0). Le début d'une séquence est un changement de station
+    ou de `col_logic` par rapport à la ligne précédente. Utilisé par get_consecutive_no_transactions_out()
+    et ConsecutiveNoTransactionsOutState.
+
+    Parameters
+    ----------
+    col_logic : str
+        Nom de la colonne (0 ou 1)
+    offset : pl.Expr | None
+        Valeur ajoutée à toute la séquence, lue sur sa première ligne (default: None)
+
+    Returns
+    -------
+    pl.Expr
+
+    Examples
+    --------
+
+    data = data.with_columns(get_run_length_sorted_("logic").alias("consecutive_no_transactions_out"))
+    """
+
+    is_start = (
+        (pl.col("station_id") != pl.col("station_id").shift(1)) | (pl.col(col_logic) != pl.col(col_logic).shift(1))
+    ).fill_null(True)
+    row_nr = pl.int_range(pl.len(), dtype=pl.Int64)
+    # Position dans la séquence = n° de ligne - n° de ligne du début de la séquence
+    run_length = row_nr - pl.when(is_start).then(row_nr).forward_fill() + 1
+    if offset is not None:
+        run_length = run_length + pl.when(is_start).then(offset).forward_fill()
+
+    return pl.when(pl.col(col_logic) == 1).then(run_length).otherwise(0)
+
+
+def get_consecutive_no_transactions_out(data: pl.LazyFrame, is_sorted: bool | None = None) -> pl.LazyFrame:
     """
     Calcul depuis combien de temps la station n'a pas eu de prise de vélo. Plus le chiffre est haut,
     plus ça fait longtemps que la station est inactive sur la prise de vélo.
@@ -119,7 +335,11 @@ def get_consecutive_no_transactions_out(data: pl.LazyFrame) -> pl.LazyFrame:
     Parameters
     ----------
     data : LazyFrame
-        Activité des stations Vcub avec la feature `transactions_out` (get_transactions_out)
+        Activité des stations Vcub avec la feature `transactions_out` (get_transactions_out ou get_transactions)
+    is_sorted : bool | None
+        Les données sont triées par station_id et date : la longueur des séquences est calculée à partir
+        des frontières de segments (changement de station ou de 'logic') sans rle(). Si None, détecté à
+        partir des métadonnées de tri (cf is_sorted_by_station_) (default: None).
 
     Returns
     -------
@@ -132,19 +352,32 @@ def get_consecutive_no_transactions_out(data: pl.LazyFrame) -> pl.LazyFrame:
     activite = get_consecutive_no_transactions_out(activite)
     """
 
+    if is_sorted is None:
+        is_sorted = is_sorted_by_station_(data)
+
+    data = data.with_columns(
+        pl.when(
+            (pl.col("transactions_out") >= 1)
+            | (pl.col("status") == 0)
+            | (pl.col("available_bikes") <= 2)
+            | (pl.col("available_stands").is_null())
+        )
+        .then(0)
+        .otherwise(1)
+        .alias("logic")
+    )
+
+    if is_sorted:
+        data = data.with_columns(
+            get_run_length_sorted_("logic")
+            .cast(SCHEMA_ACTIVITY["consecutive_no_transactions_out"])
+            .alias("consecutive_no_transactions_out")
+        ).drop("logic")
+
+        return data
+
     data = (
         data.with_columns(
-            pl.when(
-                (pl.col("transactions_out") >= 1)
-                | (pl.col("status") == 0)
-                | (pl.col("available_bikes") <= 2)
-                | (pl.col("available_stands").is_null())
-            )
-            .then(0)
-            .otherwise(1)
-            .alias("logic")
-        )
-        .with_columns(
             pl.int_ranges(pl.struct("station_id", "logic").rle().struct.field("len"))
             .flatten()
             .alias("consecutive_no_transactions_out")
@@ -154,6 +387,7 @@ def get_consecutive_no_transactions_out(data: pl.LazyFrame) -> pl.LazyFrame:
             pl.when(pl.col("logic") == 1)
             .then(pl.col("consecutive_no_transactions_out"))
             .otherwise(0)
+            .cast(SCHEMA_ACTIVITY["consecutive_no_transactions_out"])
             .alias("consecutive_no_transactions_out")
         )
         .drop("logic")
@@ -162,8 +396,179 @@ def get_consecutive_no_transactions_out(data: pl.LazyFrame) -> pl.LazyFrame:
     return data
 
 
+def get_station_activity_features(data: pl.LazyFrame, is_sorted: bool | None = None) -> pl.LazyFrame:
+    """
+    Features par station de l'activité : 'transactions_in', 'transactions_out', 'transactions_all'
+    (get_transactions()) et 'consecutive_no_transactions_out' (get_consecutive_no_transactions_out()).
+    Ce sont les colonnes du feature store (cf create/creator.py create_features_store() et
+    reader/reader.py read_features()).
+
+    Parameters
+    ----------
+    data : LazyFrame
+        Activité des stations Vcub
+    is_sorted : bool | None
+        Les données sont triées par station_id et date (default: None, cf get_transactions())
+
+    Returns
+    -------
+    data : LazyFrame
+
+    Examples
+    --------
+    activite = get_station_activity_features(activite, is_sorted=True)
+    """
+
+    return data.pipe(get_transactions, is_sorted=is_sorted).pipe(
+        get_consecutive_no_transactions_out, is_sorted=is_sorted
+    )
+
+
+def get_features_version_() -> str:
+    """
+    Version des features du feature store : empreinte du code des fonctions utilisées par
+    get_station_activity_features() et des types de SCHEMA_ACTIVITY. Toute modification de ces fonctions
+    invalide le feature store (cf reader/reader.py get_features_store_key_()).
+
+    Returns
+    -------
+    str
+
+    Examples
+    --------
+    features_version = get_features_version_()
+    """
+
+    functions = [
+        get_station_activity_features,
+        get_transactions,
+        get_consecutive_no_transactions_out,
+        is_sorted_by_station_,
+        shift_by_station_,
+        get_run_length_sorted_,
+    ]
+    sources = [inspect.getsource(function) for function in functions] + [repr(SCHEMA_ACTIVITY)]
+
+    return hashlib.sha256("\n".join(sources).encode()).hexdigest()
+
+
+class ConsecutiveNoTransactionsOutState:
+    """
+    Calcul incrémental de get_transactions() et get_consecutive_no_transactions_out() pour les
+    données live : l'état conserve, par station, les derniers 'available_stands' / 'available_bikes'
+    et le compteur 'consecutive_no_transactions_out'. Chaque nouveau batch (quelques points de 10 min
+    par station, postérieurs à l'état) est calculé sans relire l'historique, avec un résultat identique
+    au calcul sur tout l'historique.
+
+    Parameters
+    ----------
+    state : pl.DataFrame | None
+        Colonnes station_id, available_stands, available_bikes, consecutive_no_transactions_out
+        (dernière ligne de chaque station), par exemple un état précédent (default: None)
+
+    Examples
+    --------
+    features_state = ConsecutiveNoTransactionsOutState()
+    activite = features_state.update(activite_history)
+    activite_live = features_state.update(activite_live)
+    """
+
+    STATE_COLUMNS = ("station_id", "available_stands", "available_bikes", "consecutive_no_transactions_out")
+
+    def __init__(self, state: pl.DataFrame | None = None):
+        """Initialise l'état par station (vide par défaut)."""
+        self.state = state.select(self.STATE_COLUMNS) if state is not None else None
+
+    def update(self, data: pl.LazyFrame | pl.DataFrame) -> pl.DataFrame:
+        """
+        Ajoute les colonnes 'transactions_in', 'transactions_out', 'transactions_all' et
+        'consecutive_no_transactions_out' au batch en partant de l'état de chaque station,
+        puis met à jour l'état avec la dernière ligne de chaque station du batch.
+
+        Parameters
+        ----------
+        data : LazyFrame | DataFrame
+            Nouveau batch d'activité des stations Vcub (station_id, date, status, available_stands,
+            available_bikes), postérieur à l'état
+
+        Returns
+        -------
+        data : DataFrame
+            Batch trié par station_id et date avec les features
+
+        Examples
+        --------
+        activite_live = features_state.update(activite_live)
+        """
+
+        data = data.lazy()
+        columns = data.collect_schema().names()
+        columns_features = [
+            "transactions_in",
+            "transactions_out",
+            "transactions_all",
+            "consecutive_no_transactions_out",
+        ]
+        columns = [*columns, *[col for col in columns_features if col not in columns]]
+
+        if self.state is None:
+            schema = data.collect_schema()
+            self.state = pl.DataFrame(
+                schema={
+                    **{col: schema[col] for col in self.STATE_COLUMNS[:-1]},
+                    "consecutive_no_transactions_out": SCHEMA_ACTIVITY["consecutive_no_transactions_out"],
+                }
+            )
+
+        # État des stations du batch, placé juste avant leurs nouvelles données
+        previous_state = (
+            self.state.lazy()
+            .join(data.select("station_id").unique(), on="station_id", how="semi")
+            .with_columns(is_previous_state=pl.lit(True))
+        )
+        data = pl.concat([data.with_columns(is_previous_state=pl.lit(False)), previous_state], how="diagonal_relaxed")
+        data = data.sort(["station_id", "is_previous_state", "date"], descending=[False, True, False])
+
+        data = data.pipe(get_transactions, is_sorted=True)
+
+        # Sur la ligne de l'état, la séquence en cours vaut déjà le compteur de la station
+        logic = (
+            pl.when(pl.col("is_previous_state"))
+            .then(pl.when(pl.col("consecutive_no_transactions_out") > 0).then(1).otherwise(0))
+            .when(
+                (pl.col("transactions_out") >= 1)
+                | (pl.col("status") == 0)
+                | (pl.col("available_bikes") <= 2)
+                | (pl.col("available_stands").is_null())
+            )
+            .then(0)
+            .otherwise(1)
+        )
+        offset = (
+            pl.when(pl.col("is_previous_state"))
+            .then(pl.col("consecutive_no_transactions_out").cast(pl.Int64) - 1)
+            .otherwise(0)
+        )
+        data = data.with_columns(logic.alias("logic"), offset.alias("offset"))
+        data = data.with_columns(
+            get_run_length_sorted_("logic", offset=pl.col("offset"))
+            .cast(SCHEMA_ACTIVITY["consecutive_no_transactions_out"])
+            .alias("consecutive_no_transactions_out")
+        )
+
+        data = data.filter(~pl.col("is_previous_state")).select(columns).collect()
+
+        # Mise à jour de l'état avec la dernière ligne de chaque station du batch
+        last_state = data.group_by("station_id", maintain_order=True).last().select(self.STATE_COLUMNS)
+        self.state = pl.concat(
+            [self.state.join(last_state, on="station_id", how="anti"), last_state], how="vertical_relaxed"
+        ).sort("station_id")
+
+        return data
+
+
 # https://github.com/armgilles/vcub_keeper/issues/42#issuecomment-718848126
-def get_meteo(data, meteo):
+def get_meteo(data: pl.LazyFrame, meteo: pl.LazyFrame) -> pl.LazyFrame:
     """
      AJoute les données météo suivantes :
          - 'temperature'
@@ -173,16 +578,20 @@ def get_meteo(data, meteo):
         - 'precipitation' (mm/h)
         - 'wind_speed' (m/s)
 
+    La jointure est faite à l'heure : la date de l'activité et celle de la météo sont tronquées à l'heure
+    (dt.truncate("1h")) puis jointes (left join avec maintain_order="left" : l'ordre des lignes de
+    l'activité, par station_id et date, est garanti).
+
      Parameters
      ----------
-     data : DataFrame
+     data : LazyFrame
          Activité des stations Vcub
-     meteo : DataFrame
+     meteo : LazyFrame
          Données météo
 
      Returns
      -------
-     data : DataFrame
+     data : LazyFrame
         Ajout des colonnes météo
 
     Examples
@@ -191,35 +600,211 @@ def get_meteo(data, meteo):
     ts_activity = get_meteo(data=ts_activity, meteo=meteo)
     """
 
-    def fast_parse_date_(s):
-        """
-        This is an extremely fast approach to datetime parsing.
-        For large data, the same dates are often repeated. Rather than
-        re-parse these, we store all unique dates, parse them, and
-        use a lookup to convert all dates.
-
-        cf https://github.com/sanand0/benchmarks/tree/master/date-parse
-        """
-        dates = {date: date.strftime(format="%Y-%m-%d %H") for date in pd.Series(s.unique())}
-        return s.apply(lambda v: dates[v])
-
-    # Creation des dates au format yyyy_mm avant jointure
-    data["date_year_month_hours"] = fast_parse_date_(data["date"])
-    meteo["date_year_month_hours"] = fast_parse_date_(meteo["date"])
+    # Même type de date que l'activité (précision, fuseau horaire) pour la jointure
+    dtype_date = data.collect_schema()["date"]
+    meteo = meteo.with_columns(date_hours=pl.col("date").cast(dtype_date).dt.truncate("1h")).drop("date")
 
     # Jointure
-    data = data.merge(meteo.drop("date", axis=1), on="date_year_month_hours", how="left")
+    data = data.with_columns(date_hours=pl.col("date").dt.truncate("1h"))
+    data = data.join(meteo, on="date_hours", how="left", maintain_order="left")
 
-    # On supprime la colonne 'date_year_month'
-    data = data.drop("date_year_month_hours", axis=1)
+    # On supprime la colonne 'date_hours'
+    data = data.drop("date_hours")
 
     return data
 
 
-def get_encoding_time(data: pl.LazyFrame, col_date: str, max_val: int) -> pl.LazyFrame:
+def get_rolling_extrema_(values: pl.Series, windows: dict[str, int]) -> pl.Series:
+    """
+    Max et min glissants de toute la série pour toutes les tailles de fenêtre, en un seul appel.
+    Les fenêtres partagent leurs calculs : le max sur `2 * k` points est le max de deux fenêtres de `k`
+    points décalées de `k`, et toute fenêtre de `w` points (k < w <= 2 * k) est le max de deux fenêtres
+    de `k` points décalées de `w - k` (le max et le min sont idempotents). Chaque fenêtre est donc
+    obtenue à partir de la précédente en quelques np.maximum (np.minimum) : O(n log(max(windows))) pour
+    l'ensemble des fenêtres. Les `window` - 1 premières valeurs et les fenêtres contenant une valeur
+    nulle sont null, comme pl.Series.rolling_max(). Est uniquement utilisé par get_rolling_extrema()
+
+    Parameters
+    ----------
+    values : pl.Series
+        Série numérique (toute la colonne : les fenêtres ne doivent pas être coupées en batchs)
+    windows : dict[str, int]
+        Suffixe du nom de la feature : taille de la fenêtre
+
+    Returns
+    -------
+    pl.Series
+        Struct avec un champ [nom]_rolling_max_[suffixe] puis [nom]_rolling_min_[suffixe] par fenêtre
+
+    Examples
+    --------
+    rolling_extrema = get_rolling_extrema_(data["available_bikes"], windows={"6": 6, "1d": 144})
+    """
+
+    def combine(ufunc, rolling, shift):
+        # rolling[i] : fenêtre se terminant à la position i + taille - 1
+        return ufunc(rolling[shift:], rolling[: max(len(rolling) - shift, 0)])
+
+    def get_all_windows(x, ufunc):
+        rolling = {1: x}
+        size = 1
+        for window in sorted(set(windows.values())):
+            while 2 * size < window:
+                rolling[2 * size] = combine(ufunc, rolling[size], size)
+                size *= 2
+            if window > size:
+                rolling[window] = combine(ufunc, rolling[size], window - size)
+                size = window
+        return rolling
+
+    n = len(values)
+    x = values.fill_null(0).to_numpy() if values.null_count() > 0 else values.to_numpy()
+    has_null = get_all_windows(values.is_null().to_numpy(), np.logical_or) if values.null_count() > 0 else None
+
+    columns = {}
+    for agg, ufunc in [("max", np.maximum), ("min", np.minimum)]:
+        rolling = get_all_windows(x, ufunc)
+        for name, window in windows.items():
+            result = np.zeros(n, dtype=x.dtype)
+            is_null = np.ones(n, dtype=bool)
+            if n >= window:
+                result[window - 1 :] = rolling[window]
+                is_null[window - 1 :] = False if has_null is None else has_null[window]
+            columns[f"{values.name}_rolling_{agg}_{name}"] = (
+                pl.when(pl.lit(pl.Series(is_null))).then(None).otherwise(pl.lit(pl.Series(result, dtype=values.dtype)))
+            )
+
+    return pl.select(**columns).to_struct(values.name)
+
+
+def get_rolling_extrema(
+    data: pl.LazyFrame, col: str, windows: dict[str, int] = REGRESSION_ROLLING_WINDOWS, is_sorted: bool | None = None
+) -> pl.LazyFrame:
+    """
+    Max et min glissants de `col` par station pour toutes les tailles de fenêtre demandées.
+
+    Si les données sont triées par station_id et date (is_sorted=True), toutes les fenêtres sont
+    calculées en un seul appel sur toute la colonne (cf get_rolling_extrema_()) puis masquées (null)
+    lorsqu'elles débordent sur la station précédente. Sinon, calcul par Polars avec .over("station_id").
+
+    Le calcul porte sur toute la colonne (map_batches non elementwise) : ce noeud n'est pas exécuté par
+    le moteur streaming, qui découperait les fenêtres en batchs (cf is_streamable()).
+
+    Parameters
+    ----------
+    data : LazyFrame
+        Activité des stations Vcub
+    col : str
+        Nom de la colonne
+    windows : dict[str, int]
+        Suffixe du nom de la feature : taille de la fenêtre (default: REGRESSION_ROLLING_WINDOWS)
+    is_sorted : bool | None
+        Les données sont triées par station_id et date. Si None, détecté à partir des métadonnées de tri
+        (cf is_sorted_by_station_) (default: None).
+
+    Returns
+    -------
+    data : LazyFrame
+        Ajout des colonnes [col]_rolling_max_[nom] puis [col]_rolling_min_[nom]
+
+    Examples
+    --------
+    data = get_rolling_extrema(data, "available_bikes", is_sorted=True)
+    """
+
+    if is_sorted is None:
+        is_sorted = is_sorted_by_station_(data)
+
+    if not is_sorted:
+        return data.with_columns(
+            [
+                pl.col(col).rolling_max(window).over("station_id").alias(f"{col}_rolling_max_{name}")
+                for name, window in windows.items()
+            ]
+            + [
+                pl.col(col).rolling_min(window).over("station_id").alias(f"{col}_rolling_min_{name}")
+                for name, window in windows.items()
+            ]
+        )
+
+    dtype = data.collect_schema()[col]
+    features = {f"{col}_rolling_{agg}_{name}": window for agg in ["max", "min"] for name, window in windows.items()}
+    data = data.with_columns(
+        get_position_in_station_().alias("position_in_station"),
+        pl.col(col)
+        .map_batches(
+            partial(get_rolling_extrema_, windows=windows),
+            return_dtype=pl.Struct(dict.fromkeys(features, dtype)),
+            is_elementwise=False,
+        )
+        .alias("rolling_extrema"),
+    )
+    data = data.with_columns(
+        pl.when(pl.col("position_in_station") >= window - 1)
+        .then(pl.col("rolling_extrema").struct.field(feature))
+        .alias(feature)
+        for feature, window in features.items()
+    )
+
+    return data.drop("position_in_station", "rolling_extrema")
+
+
+@lru_cache
+def get_encoding_table_(max_val: int, n_values: int) -> tuple[pl.Series, pl.Series]:
+    """
+    Table des valeurs sin / cos de l'encodage cyclique pour les valeurs entières 0 à n_values - 1.
+    Calculée une seule fois par couple (max_val, n_values). Est uniquement utilisé par get_encoding_time()
+
+    Parameters
+    ----------
+    max_val : int
+        Valeur maximal que la valeur peut avoir (ex 12 pour le mois)
+    n_values : int
+        Nombre de valeurs de la table
+
+    Returns
+    -------
+    table_sin : pl.Series
+        sin(2 * pi * valeur / max_val) (DTYPE_ENCODING_TIME)
+    table_cos : pl.Series
+        cos(2 * pi * valeur / max_val) (DTYPE_ENCODING_TIME)
+
+    Examples
+    --------
+    table_sin, table_cos = get_encoding_table_(max_val=24, n_values=25)
+    """
+
+    angle = (2 * np.pi / max_val) * np.arange(n_values)
+    table_sin = pl.Series(np.sin(angle), dtype=DTYPE_ENCODING_TIME)
+    table_cos = pl.Series(np.cos(angle), dtype=DTYPE_ENCODING_TIME)
+
+    return table_sin, table_cos
+
+
+def get_encoding_values_(values: pl.Series, max_val: int, n_values: int, function: str) -> pl.Series:
+    """
+    Valeurs sin ou cos (function) de l'encodage cyclique d'une colonne entière : lues dans la table
+    pré-calculée (cf get_encoding_table_()) si toutes les valeurs sont dans [0, n_values), sinon calculées
+    ligne à ligne. Est uniquement utilisé par get_encoding_time()
+    """
+    if values.null_count() == len(values) or (values.min() >= 0 and values.max() < n_values):
+        table_sin, table_cos = get_encoding_table_(max_val, n_values)
+        table = table_sin if function == "sin" else table_cos
+        return table.gather(values)
+
+    angle = values.cast(pl.Float64) * (2 * np.pi / max_val)
+    return getattr(angle, function)().cast(DTYPE_ENCODING_TIME)
+
+
+def get_encoding_time(data: pl.LazyFrame, col_date: str, max_val: int, n_values: int | None = None) -> pl.LazyFrame:
     """
     Encoding time
 
+    Si la colonne à encoder contient des entiers (jour, heure...) entre 0 et n_values - 1, les valeurs
+    sin / cos sont lues dans une table pré-calculée (cf get_encoding_table_()) au lieu d'être calculées
+    pour chaque ligne. Les autres valeurs (entiers hors de la table, colonne décimale) sont encodées
+    par le calcul sin / cos.
+
     Parameters
     ----------
     data : LazyFrame
@@ -228,23 +813,45 @@ def get_encoding_time(data: pl.LazyFrame, col_date: str, max_val: int) -> pl.Laz
         Nom de la colonne à encoder
     max_val : int
         Valeur maximal que la valeur peut avoir (ex 12 pour le mois)
+    n_values : int | None
+        Nombre de valeurs de la table pré-calculée (default: max_val + 1)
 
     Returns
     -------
     data : LazyFrame
-        Ajout de colonne Sin_[col_date] & Cos_[col_date]
+        Ajout de colonne Sin_[col_date] & Cos_[col_date] (DTYPE_ENCODING_TIME)
 
     Examples
     --------
     data = get_encoding_time(data, 'month', max_val=12)
+    data = get_encoding_time(data, 'minutes', max_val=6, n_values=60)
     """
 
-    two_pi = 2 * np.pi
-    expr_two_pi_div_max_val = pl.lit(two_pi / max_val)
+    if n_values is None:
+        n_values = max_val + 1
+    if n_values < 1:
+        raise ValueError(f"n_values doit être supérieur ou égal à 1 (n_values={n_values}).")
+
+    if not data.collect_schema()[col_date].is_integer():
+        # Colonne décimale : calcul sin / cos ligne à ligne
+        expr_two_pi_div_max_val = pl.lit(2 * np.pi / max_val)
+        return data.with_columns(
+            [
+                (expr_two_pi_div_max_val * pl.col(col_date)).sin().cast(DTYPE_ENCODING_TIME).alias("Sin_" + col_date),
+                (expr_two_pi_div_max_val * pl.col(col_date)).cos().cast(DTYPE_ENCODING_TIME).alias("Cos_" + col_date),
+            ]
+        )
+
     data = data.with_columns(
         [
-            (expr_two_pi_div_max_val * pl.col(col_date)).sin().alias("Sin_" + col_date),
-            (expr_two_pi_div_max_val * pl.col(col_date)).cos().alias("Cos_" + col_date),
+            pl.col(col_date)
+            .map_batches(
+                partial(get_encoding_values_, max_val=max_val, n_values=n_values, function=function),
+                return_dtype=DTYPE_ENCODING_TIME,
+                is_elementwise=True,
+            )
+            .alias(name + col_date)
+            for function, name in [("sin", "Sin_"), ("cos", "Cos_")]
         ]
     )
     return data
@@ -284,3 +891,72 @@ def process_data_cluster(data: pl.LazyFrame) -> pl.LazyFrame:
     data = get_encoding_time(data, "hours", max_val=24)
 
     return data
+
+
+def is_streamable(data: pl.LazyFrame) -> bool:
+    """
+    Vérifie que l'ensemble du plan de la LazyFrame s'exécute avec le moteur streaming de Polars
+    (aucun noeud non streamable : shift, rle, forward_fill, median...).
+
+    Les features calculées par station (get_transactions(), get_consecutive_no_transactions_out())
+    ne sont pas streamables : elles doivent être calculées en amont par groupe de stations
+    (cf create/creator.py create_station_profilage_activity()).
+
+    Parameters
+    ----------
+    data : LazyFrame
+        Plan à vérifier
+
+    Returns
+    -------
+    bool
+        True si tout le plan est exécuté par le moteur streaming
+
+    Examples
+    --------
+
+    assert is_streamable(profile_station)
+    """
+
+    # Moteur streaming de polars 1.22 (streaming=True), déprécié au profit de engine="streaming"
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", DeprecationWarning)
+        plan = data.explain(streaming=True)
+
+    return plan.startswith("STREAMING:")
+
+
+def collect_streaming(data: pl.LazyFrame, path_to_export: str | None = None) -> pl.DataFrame | None:
+    """
+    Exécute la LazyFrame avec le moteur streaming de Polars (mémoire bornée, données plus grandes
+    que la RAM). Si path_to_export est renseigné, le résultat est écrit en parquet (sink_parquet)
+    sans être chargé en mémoire.
+
+    Parameters
+    ----------
+    data : LazyFrame
+        Plan à exécuter (doit être streamable, cf is_streamable())
+    path_to_export : str | None
+        Fichier parquet d'export (default: None)
+
+    Returns
+    -------
+    pl.DataFrame | None
+        Le résultat, ou None si il est exporté dans path_to_export
+
+    Examples
+    --------
+
+    profile_station = collect_streaming(profile_station)
+    collect_streaming(activite, path_to_export="activite.parquet")
+    """
+
+    if not is_streamable(data):
+        raise ValueError("Le plan contient des noeuds non compatibles avec le moteur streaming.")
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", DeprecationWarning)
+        if path_to_export is not None:
+            data.sink_parquet(path_to_export)
+            return None
+        return data.collect(streaming=True)
@@ -9,14 +9,12 @@ from plotly.offline import init_notebook_mode, iplot, offline
 from plotly.subplots import make_subplots
 from sklearn.pipeline import Pipeline
 
-from vcub_keeper.config import FEATURES_TO_USE_CLUSTER, MAPBOX_TOKEN, NON_USE_STATION_ID, THRESHOLD_PROFILE_STATION
-from vcub_keeper.ml.cluster import logistic_predict_proba_from_model, predict_anomalies_station
+from vcub_keeper.config import MAPBOX_TOKEN, NON_USE_STATION_ID, THRESHOLD_PROFILE_STATION
+from vcub_keeper.ml.cluster import predict_anomalies_station, score_anomalies_station
 from vcub_keeper.reader.reader_utils import filter_periode
 from vcub_keeper.transform.features_factory import (
     get_consecutive_no_transactions_out,
-    get_transactions_all,
-    get_transactions_in,
-    get_transactions_out,
+    get_transactions,
 )
 
 
@@ -187,7 +185,8 @@ def plot_station_anomalies(
     Parameters
     ----------
     data : pl.LazyFrame
-        Tableau temporelle de l'activité des stations Vcub
+        Tableau temporelle de l'activité des stations Vcub. Les features déjà présentes
+        (cf reader/reader.py read_features()) ne sont pas recalculées.
     clf : Pipeline Scikit Learn
         Estimator already fit
     station_id : Int
@@ -213,6 +212,7 @@ def plot_station_anomalies(
     Examples
     --------
 
+    ts_activity = read_features(file_path=ROOT_DATA_CLEAN, station_id=22)
     plot_station_anomalies(data=ts_activity, clf=clf, station_id=22)
     """
 
@@ -220,12 +220,9 @@ def plot_station_anomalies(
     data_station = data.filter(pl.col("station_id") == station_id)
 
     if "consecutive_no_transactions_out" not in data_station.collect_schema().names():
-        # Some features
-        data_station = (
-            data_station.pipe(get_transactions_in)
-            .pipe(get_transactions_out)
-            .pipe(get_transactions_all)
-            .pipe(get_consecutive_no_transactions_out)
+        # Some features (une seule station : données contiguës)
+        data_station = data_station.pipe(get_transactions, is_sorted=True).pipe(
+            get_consecutive_no_transactions_out, is_sorted=True
         )
 
     # Into pandas
@@ -711,7 +708,8 @@ def plot_station_anomalies_with_score(
     Parameters
     ----------
     data : pd.DataFrame
-        Tableau temporelle de l'activité des stations Vcub
+        Tableau temporelle de l'activité des stations Vcub. Les features déjà présentes
+        (cf reader/reader.py read_features()) ne sont pas recalculées.
     clf : Pipeline Scikit Learn
         Estimator already fit
     station_id : Int
@@ -737,6 +735,7 @@ def plot_station_anomalies_with_score(
     Examples
     --------
 
+    ts_activity = read_features(file_path=ROOT_DATA_CLEAN, station_id=22)
     plot_station_anomalies_with_score(data=ts_activity, clf=clf, station_id=22)
     """
 
@@ -744,23 +743,13 @@ def plot_station_anomalies_with_score(
     data_station = data.filter(pl.col("station_id") == station_id)
 
     if "consecutive_no_transactions_out" not in data_station.collect_schema().names():
-        # Some features
-        data_station = (
-            data_station.pipe(get_transactions_in)
-            .pipe(get_transactions_out)
-            .pipe(get_transactions_all)
-            .pipe(get_consecutive_no_transactions_out)
+        # Some features (une seule station : données contiguës)
+        data_station = data_station.pipe(get_transactions, is_sorted=True).pipe(
+            get_consecutive_no_transactions_out, is_sorted=True
         )
 
-    data_pred = predict_anomalies_station(data=data_station, clf=clf, station_id=station_id)
-
-    data_pred = data_pred.with_columns(
-        pl.Series(
-            name="anomaly_score",
-            values=logistic_predict_proba_from_model(clf.decision_function(data_pred.select(FEATURES_TO_USE_CLUSTER)))
-            * 100,
-        )
-    )
+    # anomaly & anomaly_score en un seul passage dans l'estimateur
+    data_pred = score_anomalies_station(data=data_station, clf=clf, station_id=station_id)
 
     # Into pandas
     data_pred = data_pred.to_pandas()
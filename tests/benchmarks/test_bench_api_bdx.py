@@ -0,0 +1,52 @@
+import time
+
+import pytest
+
+from vcub_keeper.production.data import get_data_from_api_bdx_by_station
+
+# 8 chunks de 25 stations (~200 stations comme sur le réseau Vcub)
+station_id_list = list(range(1, 201))
+LATENCY = 0.2  # Latence simulée par requête (secondes)
+
+
+def fetch_all_chunks(max_workers):
+    """Récupère les 8 chunks de stations sur 1 heure de données"""
+    return get_data_from_api_bdx_by_station(
+        station_id=station_id_list,
+        start_date="2024-12-29T00:00:00",
+        stop_date="2024-12-29T01:00:00",
+        max_workers=max_workers,
+    )
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("max_workers", [1, 2, 4, 8])
+def test_benchmark_get_data_from_api_bdx_concurrent(api_bdx_stub, max_workers):
+    """
+    Benchmark de la récupération des chunks avec différents niveaux de concurrence
+    sur le stub local de l'API Bordeaux.
+    """
+    api_bdx_stub.latency = LATENCY
+
+    station_json = fetch_all_chunks(max_workers=max_workers)
+
+    assert len(station_json["features"]) == len(station_id_list) * 12
+
+
+def test_concurrent_fetch_scales_with_workers(api_bdx_stub):
+    """
+    Le temps de récupération doit baisser de façon quasi linéaire avec la concurrence :
+    8 chunks * 0.2s en séquentiel (~1.6s) contre ~0.2s avec 8 workers.
+    """
+    api_bdx_stub.latency = LATENCY
+
+    elapsed = {}
+    for max_workers in [1, 2, 4, 8]:
+        start = time.perf_counter()
+        fetch_all_chunks(max_workers=max_workers)
+        elapsed[max_workers] = time.perf_counter() - start
+
+    assert elapsed[1] >= 8 * LATENCY
+    assert elapsed[2] < elapsed[1] * 0.75
+    assert elapsed[4] < elapsed[1] * 0.5
+    assert elapsed[8] < elapsed[1] * 0.35
@@ -0,0 +1,212 @@
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+import polars as pl
+import pytest
+from polars.testing import assert_frame_equal
+import pyarrow.parquet as pq
+
+from vcub_keeper.config import DTYPE_ENCODING_TIME, SCHEMA_ACTIVITY
+from vcub_keeper.create.creator import compact_learning_dataset, create_features_store, write_backfill_manifest_
+from vcub_keeper.reader.reader import read_features, read_learning_dataset
+from vcub_keeper.transform.features_factory import get_station_activity_features, process_data_cluster
+
+NUM_STATIONS = 100
+CHUNK_SIZE = 25
+
+
+def create_raw_parts(path_to_export, num_days, file_name="learning_dataset"):
+    """
+    Simule le résultat de run_backfill_() : des fichiers parquet de données brutes (5 min)
+    par unité (intervalle de 4 jours x chunk de 25 stations) et leur manifest.
+    """
+    rng = np.random.default_rng(2024)
+    path_parts = f"{path_to_export}{file_name}_parts/"
+    manifest = {"completed": {}, "failed": {}}
+    Path(path_parts).mkdir(parents=True, exist_ok=True)
+
+    start = datetime(2024, 1, 1)
+    for interval_start in range(0, num_days, 4):
+        dates = pl.datetime_range(
+            start + timedelta(days=interval_start),
+            start + timedelta(days=min(interval_start + 4, num_days)),
+            interval="5m",
+            closed="left",
+            eager=True,
+        )
+        for chunk_index, chunk_start in enumerate(range(1, NUM_STATIONS + 1, CHUNK_SIZE), start=1):
+            station_ids = list(range(chunk_start, chunk_start + CHUNK_SIZE))
+            unit_id = f"{interval_start:04d}_chunk_{chunk_index:03d}"
+            n_rows = len(dates) * len(station_ids)
+            available_bikes = rng.integers(0, 30, size=n_rows)
+            raw = pl.DataFrame(
+                {
+                    "date": pl.concat([dates] * len(station_ids)),
+                    "station_id": np.repeat(station_ids, len(dates)).astype(np.int32),
+                    "status": np.ones(n_rows, dtype=np.uint8),
+                    "available_stands": 30 - available_bikes,
+                    "available_bikes": available_bikes,
+                }
+            )
+            with pq.ParquetWriter(f"{path_parts}{unit_id}.parquet", raw.to_arrow().schema) as writer:
+                for raw_station in raw.partition_by("station_id", maintain_order=True):
+                    writer.write_table(raw_station.to_arrow())
+            manifest["completed"][unit_id] = {"station_id": station_ids, "n_rows": n_rows}
+
+    write_backfill_manifest_(manifest, path_parts)
+
+
+def peak_rss_mb(path_to_export, mode):
+    """
+    Lance la compaction dans un processus dédié et retourne son pic de mémoire (RSS, en Mo).
+        - streaming : compact_learning_dataset()
+        - in_memory : transformation de toutes les unités en une seule fois (ancien comportement)
+    """
+    code = f"""
+import resource
+import polars as pl
+from vcub_keeper.create.creator import compact_learning_dataset
+from vcub_keeper.production.data import process_api_bdx_station_data_
+
+if "{mode}" == "streaming":
+    compact_learning_dataset(path_to_export="{path_to_export}")
+else:
+    process_api_bdx_station_data_(pl.scan_parquet("{path_to_export}learning_dataset_parts/*.parquet")).collect()
+print("PEAK_RSS", resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+"""
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+    peak_rss_kb = int(output.split("PEAK_RSS")[-1].strip())
+    return peak_rss_kb / 1024
+
+
+@pytest.fixture(scope="module")
+def raw_parts_by_history(tmp_path_factory):
+    """Données brutes de 100 stations sur 8 jours et sur 64 jours"""
+    paths = {}
+    for num_days in [8, 64]:
+        path_to_export = f"{tmp_path_factory.mktemp(f'history_{num_days}')}/"
+        create_raw_parts(path_to_export, num_days=num_days)
+        paths[num_days] = path_to_export
+    return paths
+
+
+@pytest.mark.benchmark
+def test_benchmark_compact_learning_dataset(raw_parts_by_history):
+    """
+    Benchmark de la compaction station par station du learning dataset (64 jours x 100 stations)
+    """
+    compact_learning_dataset(path_to_export=raw_parts_by_history[64])
+
+
+def test_compact_learning_dataset_memory_is_bounded(raw_parts_by_history):
+    """
+    Multiplier l'historique par 8 fait croître le pic mémoire de la transformation en une fois,
+    mais beaucoup moins celui de la compaction station par station.
+    """
+    streaming = {num_days: peak_rss_mb(path, "streaming") for num_days, path in raw_parts_by_history.items()}
+    in_memory = {num_days: peak_rss_mb(path, "in_memory") for num_days, path in raw_parts_by_history.items()}
+    print(f"Pic RSS (Mo) streaming : {streaming} / en une fois : {in_memory}")
+
+    assert streaming[64] < in_memory[64]
+    assert streaming[64] - streaming[8] < (in_memory[64] - in_memory[8]) / 4
+
+
+def legacy_dtypes(data):
+    """Types avant SCHEMA_ACTIVITY : station_id en Int32, compteurs en Int64 et encodages en Float64"""
+    return data.with_columns(
+        pl.col("station_id").cast(pl.Int32),
+        pl.col(
+            "available_stands",
+            "available_bikes",
+            "transactions_in",
+            "transactions_out",
+            "transactions_all",
+        ).cast(pl.Int64),
+        pl.col("^(Sin|Cos)_.*$").cast(pl.Float64),
+    )
+
+
+@pytest.fixture(scope="module")
+def learning_dataset_features(raw_parts_by_history):
+    """Learning dataset (64 jours x 100 stations) avec les features du clustering"""
+    compact_learning_dataset(path_to_export=raw_parts_by_history[64])
+    return read_learning_dataset(file_path=raw_parts_by_history[64]).pipe(process_data_cluster).collect()
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("dtypes", ["legacy", "schema_activity"])
+def test_benchmark_learning_dataset_group_by(learning_dataset_features, dtypes):
+    """
+    Benchmark d'une agrégation par station du learning dataset selon les types des colonnes
+    """
+    data = legacy_dtypes(learning_dataset_features) if dtypes == "legacy" else learning_dataset_features
+    data.group_by("station_id").agg(pl.col("transactions_all").sum(), pl.col("^(Sin|Cos)_.*$").mean())
+
+
+def test_learning_dataset_schema_activity_memory(learning_dataset_features):
+    """
+    Les types de SCHEMA_ACTIVITY sont appliqués au learning dataset et divisent au moins par 2
+    sa taille en mémoire par rapport aux anciens types.
+    """
+    schema = learning_dataset_features.schema
+    for col in ["station_id", "available_stands", "available_bikes", "status", "transactions_all"]:
+        assert schema[col] == SCHEMA_ACTIVITY[col]
+    assert schema["Sin_hours"] == DTYPE_ENCODING_TIME
+
+    size_legacy = legacy_dtypes(learning_dataset_features).estimated_size("mb")
+    size_compact = learning_dataset_features.estimated_size("mb")
+    print(f"Taille du learning dataset (Mo) anciens types : {size_legacy:.1f} / SCHEMA_ACTIVITY : {size_compact:.1f}")
+
+    assert size_compact < size_legacy / 2
+
+
+@pytest.fixture(scope="module")
+def features_store(raw_parts_by_history, learning_dataset_features):
+    """Feature store du learning dataset (64 jours x 100 stations)"""
+    create_features_store(file_path=raw_parts_by_history[64])
+    return raw_parts_by_history[64]
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("source", ["computed", "features_store"])
+def test_benchmark_read_features(features_store, source):
+    """
+    Benchmark de la lecture du learning dataset avec les features par station :
+    calculées à chaque lecture ou lues dans le feature store
+    """
+    if source == "computed":
+        read_learning_dataset(file_path=features_store).pipe(get_station_activity_features, is_sorted=True).collect()
+    else:
+        read_features(file_path=features_store).collect()
+
+
+def test_read_features_store_faster(features_store):
+    """
+    La lecture du feature store est identique au calcul des features et plus rapide
+    (meilleur temps sur 3 essais)
+    """
+
+    def best_time(read):
+        elapsed = []
+        for _ in range(3):
+            start = time.perf_counter()
+            result = read()
+            elapsed.append(time.perf_counter() - start)
+        return min(elapsed), result
+
+    elapsed_computed, expected = best_time(
+        lambda: (
+            read_learning_dataset(file_path=features_store)
+            .pipe(get_station_activity_features, is_sorted=True)
+            .collect()
+        )
+    )
+    elapsed_store, result = best_time(lambda: read_features(file_path=features_store).collect())
+    print(f"Features calculées : {elapsed_computed:.2f}s / feature store : {elapsed_store:.2f}s")
+
+    assert_frame_equal(result, expected)
+    assert elapsed_store < elapsed_computed
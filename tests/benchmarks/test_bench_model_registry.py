@@ -0,0 +1,173 @@
+import time
+from datetime import datetime
+
+import numpy as np
+import polars as pl
+import pytest
+from polars.testing import assert_frame_equal
+
+from vcub_keeper.config import FEATURES_TO_USE_CLUSTER
+from vcub_keeper.ml.cluster import (
+    logistic_predict_proba_from_model,
+    predict_anomalies_station,
+    score_all_stations,
+    train_cluster_station,
+)
+from vcub_keeper.ml.cluster_utils import ModelRegistry, create_model_registry, export_model, load_model
+
+NUM_STATIONS = 180
+
+
+@pytest.fixture(scope="module")
+def path_model(tmp_path_factory):
+    """Dossier avec les modèles de 180 stations (un fichier par station) et le registre des modèles"""
+    rng = np.random.default_rng(2025)
+    dates = pl.datetime_range(datetime(2025, 3, 1), datetime(2025, 3, 15), "10m", closed="left", eager=True)
+    data = pl.LazyFrame(
+        {
+            "station_id": pl.Series([1] * len(dates), dtype=pl.UInt16),
+            "date": dates,
+            "status": pl.Series([1] * len(dates), dtype=pl.UInt8),
+            "consecutive_no_transactions_out": pl.Series(rng.geometric(0.1, size=len(dates)) - 1, dtype=pl.UInt32),
+        }
+    )
+    clf = train_cluster_station(data, station_id=1, profile_station_activity="medium")
+
+    path_directory = str(tmp_path_factory.mktemp("model")) + "/"
+    for station_id in range(1, NUM_STATIONS + 1):
+        export_model(clf, station_id=station_id, path_directory=path_directory)
+    create_model_registry(path_directory=path_directory)
+
+    return path_directory
+
+
+def load_models_by_file(path_model):
+    """Chargement des modèles de toutes les stations, un fichier par station"""
+    return [load_model(station_id, path_directory=path_model) for station_id in range(1, NUM_STATIONS + 1)]
+
+
+def load_models_from_registry(path_model):
+    """Chargement des modèles de toutes les stations depuis le registre (ouverture comprise)"""
+    with ModelRegistry(path_directory=path_model) as model_registry:
+        return [model_registry.load_model(station_id) for station_id in model_registry.stations_id]
+
+
+@pytest.mark.benchmark
+def test_benchmark_load_models_by_file(path_model):
+    """
+    Benchmark du chargement à froid des modèles de 180 stations (un fichier par station)
+    """
+    load_models_by_file(path_model)
+
+
+@pytest.mark.benchmark
+def test_benchmark_load_models_from_registry(path_model):
+    """
+    Benchmark du chargement à froid des modèles de 180 stations depuis le registre
+    """
+    load_models_from_registry(path_model)
+
+
+def test_load_models_from_registry_cold_start(path_model):
+    """
+    Le chargement à froid de toutes les stations depuis le registre est plus rapide que fichier par
+    fichier, et l'ouverture du registre (en-tête seul, chargement à la demande) est quasi immédiate.
+    """
+
+    start = time.perf_counter()
+    load_models_by_file(path_model)
+    elapsed_by_file = time.perf_counter() - start
+
+    start = time.perf_counter()
+    load_models_from_registry(path_model)
+    elapsed_registry = time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ModelRegistry(path_directory=path_model) as model_registry:
+        model_registry.load_model(NUM_STATIONS)
+    elapsed_one_station = time.perf_counter() - start
+
+    print(
+        f"Fichier par station : {elapsed_by_file:.3f}s / registre : {elapsed_registry:.3f}s "
+        f"/ registre, une station : {elapsed_one_station:.4f}s"
+    )
+    assert elapsed_registry < elapsed_by_file / 2
+    assert elapsed_one_station < elapsed_by_file / 20
+
+
+@pytest.fixture(scope="module")
+def latest_data():
+    """Dernières 24 heures (10 min) de l'activité des 180 stations"""
+    rng = np.random.default_rng(2025)
+    dates = pl.datetime_range(datetime(2025, 3, 14), datetime(2025, 3, 15), "10m", closed="left", eager=True)
+    n_rows = len(dates) * NUM_STATIONS
+    return pl.DataFrame(
+        {
+            "station_id": pl.Series(np.repeat(np.arange(1, NUM_STATIONS + 1), len(dates)), dtype=pl.UInt16),
+            "date": pl.concat([dates] * NUM_STATIONS),
+            "status": pl.Series(np.ones(n_rows), dtype=pl.UInt8),
+            "consecutive_no_transactions_out": pl.Series(rng.geometric(0.1, size=n_rows) - 1, dtype=pl.UInt32),
+        }
+    ).lazy()
+
+
+@pytest.fixture(scope="module")
+def model_registry(path_model):
+    """Registre des modèles avec tous les modèles en mémoire (comme entre deux rafraîchissements)"""
+    with ModelRegistry(path_directory=path_model) as model_registry:
+        for station_id in model_registry.stations_id:
+            model_registry.load_model(station_id)
+        yield model_registry
+
+
+def score_station_by_station(latest_data, model_registry):
+    """Anomalies et score station par station (predict() puis decision_function())"""
+    stations_pred = []
+    for station_id in model_registry.stations_id:
+        clf = model_registry.load_model(station_id)
+        station_pred = predict_anomalies_station(latest_data, clf=clf, station_id=station_id)
+        stations_pred.append(
+            station_pred.with_columns(
+                anomaly_score=logistic_predict_proba_from_model(
+                    clf.decision_function(station_pred.select(FEATURES_TO_USE_CLUSTER))
+                )
+                * 100
+            )
+        )
+    return pl.concat(stations_pred)
+
+
+@pytest.mark.benchmark
+def test_benchmark_score_station_by_station(latest_data, model_registry):
+    """
+    Benchmark du score des 180 stations station par station
+    """
+    score_station_by_station(latest_data, model_registry)
+
+
+@pytest.mark.benchmark
+def test_benchmark_score_all_stations(latest_data, model_registry):
+    """
+    Benchmark du score des 180 stations en une passe
+    """
+    score_all_stations(latest_data, model_registry=model_registry)
+
+
+def test_score_all_stations_faster(latest_data, model_registry):
+    """
+    Le score du réseau en une passe est plus rapide que station par station et tient largement
+    dans le rafraîchissement de 10 minutes
+    """
+
+    start = time.perf_counter()
+    expected = score_station_by_station(latest_data, model_registry)
+    elapsed_station_by_station = time.perf_counter() - start
+
+    start = time.perf_counter()
+    network_pred = score_all_stations(latest_data, model_registry=model_registry)
+    elapsed_all_stations = time.perf_counter() - start
+
+    print(f"Station par station : {elapsed_station_by_station:.2f}s / en une passe : {elapsed_all_stations:.2f}s")
+    assert_frame_equal(network_pred, expected)
+    assert elapsed_all_stations < elapsed_station_by_station / 1.5
+    assert elapsed_all_stations < 60
@@ -0,0 +1,118 @@
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import polars as pl
+import pytest
+from polars.testing import assert_frame_equal
+
+from vcub_keeper.ml.prediction_station.transform import (
+    build_feat_for_regression,
+    build_feat_for_regression_by_station,
+)
+from vcub_keeper.transform.features_factory import get_rolling_extrema
+
+NUM_STATIONS = 200
+NUM_DAYS = 14
+TARGET_COL = "available_bikes"
+
+
+@pytest.fixture(scope="module")
+def df_historical_station():
+    """Historique de 200 stations sur 14 jours (10 min), trié par station_id et date"""
+    rng = np.random.default_rng(2025)
+    dates = pl.datetime_range(
+        datetime(2025, 3, 1), datetime(2025, 3, 1) + timedelta(days=NUM_DAYS), "10m", closed="left", eager=True
+    )
+    n_rows = len(dates) * NUM_STATIONS
+    return pl.DataFrame(
+        {
+            "station_id": pl.Series(np.repeat(np.arange(1, NUM_STATIONS + 1), len(dates)), dtype=pl.UInt16),
+            "date": pl.concat([dates] * NUM_STATIONS),
+            "available_stands": pl.Series(rng.integers(0, 30, size=n_rows), dtype=pl.UInt8),
+            "available_bikes": pl.Series(rng.integers(0, 30, size=n_rows), dtype=pl.UInt8),
+        }
+    ).lazy()
+
+
+def build_feat_station_by_station(df_historical_station):
+    """Features de regression de chaque station, une station à la fois (ancien comportement)"""
+    return [
+        build_feat_for_regression(df_historical_station.filter(pl.col("station_id") == station_id), TARGET_COL)
+        for station_id in range(1, NUM_STATIONS + 1)
+    ]
+
+
+@pytest.mark.benchmark
+def test_benchmark_build_feat_for_regression_station_by_station(df_historical_station):
+    """
+    Benchmark des features de regression des 200 stations calculées station par station
+    """
+    build_feat_station_by_station(df_historical_station)
+
+
+@pytest.mark.benchmark
+def test_benchmark_build_feat_for_regression_by_station(df_historical_station):
+    """
+    Benchmark des features de regression des 200 stations calculées en une passe
+    """
+    build_feat_for_regression_by_station(df_historical_station, target_col=TARGET_COL)
+
+
+def test_build_feat_for_regression_by_station_faster(df_historical_station):
+    """
+    Le calcul en une passe est plus rapide que le calcul station par station
+    """
+
+    start = time.perf_counter()
+    build_feat_station_by_station(df_historical_station)
+    elapsed_station_by_station = time.perf_counter() - start
+
+    start = time.perf_counter()
+    build_feat_for_regression_by_station(df_historical_station, target_col=TARGET_COL)
+    elapsed_by_station = time.perf_counter() - start
+
+    print(f"Station par station : {elapsed_station_by_station:.2f}s / en une passe : {elapsed_by_station:.2f}s")
+    assert elapsed_by_station < elapsed_station_by_station / 2
+
+
+@pytest.fixture(scope="module")
+def df_historical_station_1y():
+    """Historique de 200 stations sur 1 an (10 min), trié par station_id et date (~10M lignes)"""
+    rng = np.random.default_rng(2025)
+    n_rows_by_station = 365 * 144
+    return pl.DataFrame(
+        {
+            "station_id": pl.Series(np.repeat(np.arange(1, NUM_STATIONS + 1), n_rows_by_station), dtype=pl.UInt16),
+            "available_bikes": pl.Series(rng.integers(0, 30, size=n_rows_by_station * NUM_STATIONS), dtype=pl.UInt8),
+        }
+    )
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("is_sorted", [False, True])
+def test_benchmark_get_rolling_extrema_1y(is_sorted, df_historical_station_1y):
+    """
+    Benchmark des max / min glissants (6, 12, 1d, 7d) de 200 stations sur 1 an :
+    Polars par station (.over("station_id")) ou une passe O(n) par fenêtre sur les données triées
+    """
+    get_rolling_extrema(df_historical_station_1y.lazy(), TARGET_COL, is_sorted=is_sorted).collect()
+
+
+def test_get_rolling_extrema_same_as_polars_and_faster(df_historical_station_1y):
+    """
+    Le calcul en une passe donne les mêmes valeurs que Polars (rolling_max / rolling_min par station)
+    en plus rapide
+    """
+
+    start = time.perf_counter()
+    expected = get_rolling_extrema(df_historical_station_1y.lazy(), TARGET_COL, is_sorted=False).collect()
+    elapsed_polars = time.perf_counter() - start
+
+    start = time.perf_counter()
+    result = get_rolling_extrema(df_historical_station_1y.lazy(), TARGET_COL, is_sorted=True).collect()
+    elapsed_sorted = time.perf_counter() - start
+
+    print(f"Polars .over() : {elapsed_polars:.2f}s / une passe : {elapsed_sorted:.2f}s")
+    assert_frame_equal(result, expected)
+    assert elapsed_sorted < elapsed_polars
@@ -0,0 +1,153 @@
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import polars as pl
+import pytest
+
+from vcub_keeper.ml.cluster import predict_anomalies_station, predict_anomalies_stations, train_cluster_station
+from vcub_keeper.ml.train_cluster import get_available_cpu_count_, train_cluster_stations
+from vcub_keeper.transform.features_factory import get_station_activity_features
+
+NUM_STATIONS = 16
+NUM_DAYS = 60
+PROFILE_STATION_ACTIVITY = dict.fromkeys(range(1, NUM_STATIONS + 1), "medium")
+
+
+@pytest.fixture(scope="module")
+def ts_activity():
+    """Activité de 16 stations sur 60 jours (10 min) avec la feature consecutive_no_transactions_out"""
+    rng = np.random.default_rng(2025)
+    dates = pl.datetime_range(
+        datetime(2025, 3, 1), datetime(2025, 3, 1) + timedelta(days=NUM_DAYS), "10m", closed="left", eager=True
+    )
+    n_rows = len(dates) * NUM_STATIONS
+    return pl.DataFrame(
+        {
+            "station_id": pl.Series(np.repeat(np.arange(1, NUM_STATIONS + 1), len(dates)), dtype=pl.UInt16),
+            "date": pl.concat([dates] * NUM_STATIONS),
+            "status": pl.Series(np.ones(n_rows), dtype=pl.UInt8),
+            "consecutive_no_transactions_out": pl.Series(rng.geometric(0.1, size=n_rows) - 1, dtype=pl.UInt32),
+        }
+    ).lazy()
+
+
+def train_cluster_stations_(ts_activity, path_directory, max_workers):
+    """Apprentissage des 16 stations, toutes doivent réussir"""
+    report = train_cluster_stations(
+        ts_activity,
+        stations_id=list(range(1, NUM_STATIONS + 1)),
+        profile_station_activity=PROFILE_STATION_ACTIVITY,
+        path_directory=str(path_directory) + "/",
+        max_workers=max_workers,
+    )
+    assert report.get_column("error").is_null().all()
+
+
+@pytest.mark.benchmark
+def test_benchmark_train_cluster_stations_sequential(ts_activity, tmp_path):
+    """
+    Benchmark de l'apprentissage des 16 stations dans le processus courant
+    """
+    train_cluster_stations_(ts_activity, tmp_path, max_workers=1)
+
+
+@pytest.mark.benchmark
+def test_benchmark_train_cluster_stations_parallel(ts_activity, tmp_path):
+    """
+    Benchmark de l'apprentissage des 16 stations sur tous les coeurs disponibles
+    """
+    train_cluster_stations_(ts_activity, tmp_path, max_workers=None)
+
+
+def test_train_cluster_stations_scaling(ts_activity, tmp_path):
+    """
+    L'apprentissage en parallèle sur 4 processus est au moins 2.5 fois plus rapide qu'en séquentiel
+    """
+    if get_available_cpu_count_() < 4:
+        pytest.skip("Au moins 4 coeurs sont nécessaires pour mesurer le passage à l'échelle.")
+
+    start = time.perf_counter()
+    train_cluster_stations_(ts_activity, tmp_path, max_workers=1)
+    elapsed_sequential = time.perf_counter() - start
+
+    start = time.perf_counter()
+    train_cluster_stations_(ts_activity, tmp_path, max_workers=4)
+    elapsed_parallel = time.perf_counter() - start
+
+    print(f"Séquentiel : {elapsed_sequential:.2f}s / 4 processus : {elapsed_parallel:.2f}s")
+    assert elapsed_parallel < elapsed_sequential / 2.5
+
+
+@pytest.fixture(scope="module")
+def ts_activity_lazy_features():
+    """
+    Activité brute de 100 stations sur 14 jours (10 min) avec les features calculées dans le plan lazy
+    (ré-exécutées à chaque collect())
+    """
+    num_stations = 100
+    rng = np.random.default_rng(2025)
+    dates = pl.datetime_range(datetime(2025, 3, 1), datetime(2025, 3, 15), "10m", closed="left", eager=True)
+    n_rows = len(dates) * num_stations
+    data = pl.DataFrame(
+        {
+            "station_id": pl.Series(np.repeat(np.arange(1, num_stations + 1), len(dates)), dtype=pl.UInt16),
+            "date": pl.concat([dates] * num_stations),
+            "available_stands": pl.Series(rng.integers(0, 30, size=n_rows), dtype=pl.UInt8),
+            "available_bikes": pl.Series(rng.integers(0, 30, size=n_rows), dtype=pl.UInt8),
+            "status": pl.Series(np.ones(n_rows), dtype=pl.UInt8),
+        }
+    )
+    return get_station_activity_features(data.lazy(), is_sorted=True)
+
+
+@pytest.fixture(scope="module")
+def clf_by_station(ts_activity_lazy_features):
+    """Un même estimateur pour les 100 stations (seul le coût de lecture / prédiction est mesuré)"""
+    data = ts_activity_lazy_features.filter(pl.col("station_id") == 1).collect()
+    data = data.with_columns(
+        consecutive_no_transactions_out=pl.Series(np.random.default_rng(2025).geometric(0.1, size=len(data)) - 1)
+    )
+    clf = train_cluster_station(data.lazy(), station_id=1, profile_station_activity="medium")
+    return dict.fromkeys(range(1, 101), clf)
+
+
+def predict_anomalies_station_by_station(ts_activity_lazy_features, clf_by_station):
+    """Prédiction station par station (le plan lazy est exécuté pour chaque station)"""
+    return [
+        predict_anomalies_station(ts_activity_lazy_features, clf=clf, station_id=station_id)
+        for station_id, clf in clf_by_station.items()
+    ]
+
+
+@pytest.mark.benchmark
+def test_benchmark_predict_anomalies_station_by_station(ts_activity_lazy_features, clf_by_station):
+    """
+    Benchmark de la prédiction des 100 stations station par station
+    """
+    predict_anomalies_station_by_station(ts_activity_lazy_features, clf_by_station)
+
+
+@pytest.mark.benchmark
+def test_benchmark_predict_anomalies_stations(ts_activity_lazy_features, clf_by_station):
+    """
+    Benchmark de la prédiction des 100 stations en une seule lecture
+    """
+    predict_anomalies_stations(ts_activity_lazy_features, clf_by_station)
+
+
+def test_predict_anomalies_stations_faster(ts_activity_lazy_features, clf_by_station):
+    """
+    Une seule lecture des données est plus rapide que la lecture station par station
+    """
+
+    start = time.perf_counter()
+    predict_anomalies_station_by_station(ts_activity_lazy_features, clf_by_station)
+    elapsed_station_by_station = time.perf_counter() - start
+
+    start = time.perf_counter()
+    predict_anomalies_stations(ts_activity_lazy_features, clf_by_station)
+    elapsed_batch = time.perf_counter() - start
+
+    print(f"Station par station : {elapsed_station_by_station:.2f}s / une seule lecture : {elapsed_batch:.2f}s")
+    assert elapsed_batch < elapsed_station_by_station / 2
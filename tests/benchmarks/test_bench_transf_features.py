@@ -1,18 +1,25 @@
 import pytest
 import polars as pl
+from polars.testing import assert_frame_equal
 import pandas as pd
+import numpy as np
 import json
+import time
+from datetime import datetime
 
 from vcub_keeper.transform.features_factory import (
     get_transactions_out,
     get_transactions_in,
     get_transactions_all,
+    get_transactions,
     get_consecutive_no_transactions_out,
+    get_encoding_time,
+    get_meteo,
     process_data_cluster,
 )
 from vcub_keeper.production.data import transform_json_api_bdx_station_data_to_df
 from vcub_keeper.reader.reader import read_activity_vcub
-from vcub_keeper.config import ROOT_TESTS_DATA
+from vcub_keeper.config import DTYPE_ENCODING_TIME, ROOT_TESTS_DATA
 
 
 def read_activity_data(file_name="activite_data.csv"):
@@ -68,6 +75,70 @@ def create_station_df_from_json_big(station_df_from_json: pd.DataFrame) -> pd.Da
     return station_df_from_json_big
 
 
+def create_meteo_data(start: datetime, end: datetime) -> pl.DataFrame:
+    """Hourly weather data between start and end"""
+
+    rng = np.random.default_rng(42)
+    date = pl.datetime_range(start, end, interval="1h", eager=True)
+    return pl.DataFrame(
+        {
+            "date": date,
+            "temperature": rng.uniform(-5, 35, len(date)).round(1),
+            "pressure": rng.uniform(990, 1030, len(date)).round(1),
+            "humidity": rng.integers(20, 100, len(date)),
+            "precipitation": rng.uniform(0, 5, len(date)).round(1),
+            "wind_speed": rng.uniform(0, 10, len(date)).round(1),
+        }
+    )
+
+
+def get_meteo_pandas(data: pd.DataFrame, meteo: pd.DataFrame) -> pd.DataFrame:
+    """Previous pandas implementation of get_meteo() (hourly key built with strftime)"""
+
+    def fast_parse_date_(s):
+        dates = {date: date.strftime(format="%Y-%m-%d %H") for date in pd.Series(s.unique())}
+        return s.apply(lambda v: dates[v])
+
+    data["date_year_month_hours"] = fast_parse_date_(data["date"])
+    meteo["date_year_month_hours"] = fast_parse_date_(meteo["date"])
+    data = data.merge(meteo.drop("date", axis=1), on="date_year_month_hours", how="left")
+    data = data.drop("date_year_month_hours", axis=1)
+
+    return data
+
+
+def get_encoding_time_sincos(data: pl.LazyFrame, col_date: str, max_val: int) -> pl.LazyFrame:
+    """Previous implementation of get_encoding_time() : sin / cos computed for every row"""
+    expr_two_pi_div_max_val = pl.lit(2 * np.pi / max_val)
+    return data.with_columns(
+        (expr_two_pi_div_max_val * pl.col(col_date)).sin().cast(DTYPE_ENCODING_TIME).alias("Sin_" + col_date),
+        (expr_two_pi_div_max_val * pl.col(col_date)).cos().cast(DTYPE_ENCODING_TIME).alias("Cos_" + col_date),
+    )
+
+
+def process_temporal_feat_by_encoding(data: pl.LazyFrame, encoding) -> pl.LazyFrame:
+    """process_temporal_feat() (regression) with the given encoding function"""
+    data = data.with_columns(
+        pl.col("date").dt.weekday().alias("weekday"),
+        pl.col("date").dt.hour().alias("hours"),
+        pl.col("date").dt.minute().alias("minutes"),
+    )
+    data = encoding(data, "weekday", max_val=7)
+    data = encoding(data, "hours", max_val=24)
+    return encoding(data, "minutes", max_val=6, **({"n_values": 60} if encoding is get_encoding_time else {}))
+
+
+def create_station_df_by_n_stations(station_df_from_json: pl.DataFrame, n_stations: int) -> pl.DataFrame:
+    """Replicate the station's data to n_stations stations, sorted by station_id & date"""
+
+    return (
+        station_df_from_json.join(pl.DataFrame({"offset": range(n_stations)}, schema={"offset": pl.Int32}), how="cross")
+        .with_columns(station_id=pl.col("station_id") + pl.col("offset"))
+        .drop("offset")
+        .sort(["station_id", "date"])
+    )
+
+
 activite_data = read_activity_data().collect()  # small dataset are collected
 activite_data_pd = activite_data.to_pandas()
 activite_data_big = pl.from_pandas(create_activite_data_big(activite_data_pd)).lazy()  # bigger dataset are in lazy mode
@@ -81,6 +152,22 @@ station_df_from_json_big = pl.from_pandas(
     create_station_df_from_json_big(station_df_from_json.to_pandas())
 ).lazy()  # bigger dataset are in lazy mode
 
+# To test get_meteo() function
+meteo_data = create_meteo_data(datetime(2017, 7, 1), datetime(2017, 8, 1))
+
+# To test the pre-sorted mode (is_sorted=True) : city scale (~ Bordeaux network) and 100x scale
+N_STATIONS_CITY = 200
+
+
+@pytest.fixture(scope="module")
+def station_df_city():
+    return create_station_df_by_n_stations(station_df_from_json, n_stations=N_STATIONS_CITY)
+
+
+@pytest.fixture(scope="module")
+def station_df_city_100x():
+    return create_station_df_by_n_stations(station_df_from_json, n_stations=N_STATIONS_CITY * 100)
+
 
 @pytest.mark.benchmark
 def test_benchmark_get_transaction_out(activite_data=activite_data):
@@ -136,6 +223,27 @@ def test_benchmark_get_transaction_all_big(activite_data=activite_data_big):
     activity_data_feature = get_transactions_all(activite_data).collect()
 
 
+@pytest.mark.benchmark
+def test_benchmark_get_transactions_pipe_big(activite_data=activite_data_big):
+    """
+    Benchmark for transforming all transactions features with three steps
+    (get_transactions_in, get_transactions_out, get_transactions_all)
+    """
+
+    activity_data_feature = (
+        activite_data.pipe(get_transactions_in).pipe(get_transactions_out).pipe(get_transactions_all).collect()
+    )
+
+
+@pytest.mark.benchmark
+def test_benchmark_get_transactions_big(activite_data=activite_data_big):
+    """
+    Benchmark for transforming all transactions features in a single pass (get_transactions)
+    """
+
+    activity_data_feature = get_transactions(activite_data).collect()
+
+
 @pytest.mark.benchmark
 def test_benchmark_get_consecutive_no_transactions_out(station_df_from_json=station_df_from_json):
     """
@@ -172,3 +280,116 @@ def test_benchmark_process_data_cluster_big(activite_data=activite_data_big):
     """
 
     activite_data_feature = process_data_cluster(activite_data).collect()
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("is_sorted", [False, True])
+def test_benchmark_get_features_city(is_sorted, station_df_city):
+    """
+    Benchmark for get_transactions() & get_consecutive_no_transactions_out() at city scale,
+    with (is_sorted=True) or without the pre-sorted mode
+    """
+
+    station_df_feature = (
+        station_df_city.lazy()
+        .pipe(get_transactions, is_sorted=is_sorted)
+        .pipe(get_consecutive_no_transactions_out, is_sorted=is_sorted)
+        .collect()
+    )
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("is_sorted", [False, True])
+def test_benchmark_get_features_city_100x(is_sorted, station_df_city_100x):
+    """
+    Benchmark for get_transactions() & get_consecutive_no_transactions_out() at 100x city scale,
+    with (is_sorted=True) or without the pre-sorted mode
+    """
+
+    station_df_feature = (
+        station_df_city_100x.lazy()
+        .pipe(get_transactions, is_sorted=is_sorted)
+        .pipe(get_consecutive_no_transactions_out, is_sorted=is_sorted)
+        .collect()
+    )
+
+
+def test_get_features_sorted_faster(station_df_city_100x):
+    """
+    Le mode pré-trié doit être plus rapide que le calcul par station (.over("station_id"))
+    à 100x l'échelle de la ville (meilleur temps sur 3 essais).
+    """
+
+    def best_time(is_sorted):
+        elapsed = []
+        for _ in range(3):
+            start = time.perf_counter()
+            station_df_city_100x.lazy().pipe(get_transactions, is_sorted=is_sorted).pipe(
+                get_consecutive_no_transactions_out, is_sorted=is_sorted
+            ).collect()
+            elapsed.append(time.perf_counter() - start)
+        return min(elapsed)
+
+    assert best_time(is_sorted=True) < best_time(is_sorted=False)
+
+
+@pytest.mark.benchmark
+def test_benchmark_get_meteo_pandas_big(activite_data=activite_data_big, meteo=meteo_data):
+    """
+    Benchmark for adding weather data with the previous pandas implementation
+    """
+
+    activite_data_feature = get_meteo_pandas(activite_data.collect().to_pandas(), meteo.to_pandas())
+
+
+@pytest.mark.benchmark
+def test_benchmark_get_meteo_big(activite_data=activite_data_big, meteo=meteo_data):
+    """
+    Benchmark for adding weather data (get_meteo)
+    """
+
+    activite_data_feature = get_meteo(activite_data, meteo.lazy()).collect()
+
+
+def test_get_meteo_same_as_pandas(activite_data=activite_data_big, meteo=meteo_data):
+    """
+    get_meteo() donne le même résultat que l'ancienne implémentation pandas
+    """
+
+    expected = pl.from_pandas(get_meteo_pandas(activite_data.collect().to_pandas(), meteo.to_pandas()))
+    result = get_meteo(activite_data, meteo.lazy()).collect()
+
+    assert_frame_equal(result, expected, check_dtypes=False)
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("encoding", ["sincos", "lookup"])
+def test_benchmark_get_encoding_time_100x(encoding, station_df_city_100x):
+    """
+    Benchmark of the time encoding of the regression features (weekday, hours, minutes)
+    computed row by row (sin / cos) or read in the lookup tables (get_encoding_time)
+    """
+
+    encoding_function = get_encoding_time_sincos if encoding == "sincos" else get_encoding_time
+    process_temporal_feat_by_encoding(station_df_city_100x.lazy(), encoding_function).collect()
+
+
+def test_get_encoding_time_lookup_same_and_faster(station_df_city_100x):
+    """
+    Les tables pré-calculées de get_encoding_time() donnent le même résultat que le calcul sin / cos
+    ligne à ligne, en plus rapide (meilleur temps sur 3 essais).
+    """
+
+    def best_time(encoding_function):
+        elapsed = []
+        for _ in range(3):
+            start = time.perf_counter()
+            result = process_temporal_feat_by_encoding(station_df_city_100x.lazy(), encoding_function).collect()
+            elapsed.append(time.perf_counter() - start)
+        return min(elapsed), result
+
+    elapsed_sincos, expected = best_time(get_encoding_time_sincos)
+    elapsed_lookup, result = best_time(get_encoding_time)
+
+    assert_frame_equal(result, expected)
+    assert elapsed_lookup < elapsed_sincos
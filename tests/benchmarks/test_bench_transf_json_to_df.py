@@ -1,5 +1,6 @@
 import json
 import random
+import time
 from datetime import datetime, timedelta, timezone
 
 import pytest
@@ -91,6 +92,22 @@ station_json_loaded = read_json_data()
 station_json_loaded_simu = generate_data(num_stations=3, num_days=3, seed=2024)  # (1296, 8)
 station_json_loaded_simu_big = generate_data(num_stations=7, num_days=15, seed=2024)  # (15127, 8)
 
+# Taille du json réel répliqué (1x : 288 points, 5000x : 1.44M points)
+PAYLOAD_SIZES = [1, 100, 5000]
+
+
+@pytest.fixture(scope="module", params=PAYLOAD_SIZES, ids=lambda n: f"{n}x")
+def station_json_replicated(request):
+    """Json réel dont les features sont répliquées n fois"""
+    return {"type": "FeatureCollection", "features": station_json_loaded["features"] * request.param}
+
+
+@pytest.fixture(scope="module", params=PAYLOAD_SIZES, ids=lambda n: f"{n}x")
+def station_bytes_replicated(request):
+    """Contenu brut (réponse de l'API) du json réel dont les features sont répliquées n fois"""
+    station_json = {"type": "FeatureCollection", "features": station_json_loaded["features"] * request.param}
+    return json.dumps(station_json).encode()
+
 
 @pytest.mark.benchmark
 def test_benchmark_transf_json_to_df(json_data=station_json_loaded):
@@ -101,6 +118,48 @@ def test_benchmark_transf_json_to_df(json_data=station_json_loaded):
     station_df_from_json = transform_json_api_bdx_station_data_to_df(json_data).collect()
 
 
+@pytest.mark.benchmark
+def test_benchmark_transf_json_to_df_replicated(station_json_replicated):
+    """
+    Benchmark for transforming decoded JSON (dict) data to DataFrame at 1x, 100x and 5000x payload sizes
+    """
+
+    station_df_from_json = transform_json_api_bdx_station_data_to_df(station_json_replicated).collect()
+
+
+@pytest.mark.benchmark
+def test_benchmark_transf_json_bytes_to_df_replicated(station_bytes_replicated):
+    """
+    Benchmark for transforming raw API response (bytes) to DataFrame at 1x, 100x and 5000x payload sizes
+    (fast path : Polars JSON reader, no Python dict per feature)
+    """
+
+    station_df_from_bytes = transform_json_api_bdx_station_data_to_df(station_bytes_replicated).collect()
+
+
+def test_transf_json_bytes_faster_than_json():
+    """
+    Le décodage du contenu brut doit être plus rapide que json.loads() + transformation
+    du json décodé (100x, meilleur temps sur 3 essais).
+    """
+
+    station_json = {"type": "FeatureCollection", "features": station_json_loaded["features"] * 100}
+    station_bytes = json.dumps(station_json).encode()
+
+    def best_time(func):
+        elapsed = []
+        for _ in range(3):
+            start = time.perf_counter()
+            func()
+            elapsed.append(time.perf_counter() - start)
+        return min(elapsed)
+
+    elapsed_json = best_time(lambda: transform_json_api_bdx_station_data_to_df(json.loads(station_bytes)).collect())
+    elapsed_bytes = best_time(lambda: transform_json_api_bdx_station_data_to_df(station_bytes).collect())
+
+    assert elapsed_bytes < elapsed_json
+
+
 @pytest.mark.benchmark
 def test_benchmark_pipepline_transform(json_data=station_json_loaded_simu):
     """
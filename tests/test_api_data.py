@@ -1,5 +1,16 @@
+import gzip
+import os
+import time
+from datetime import datetime, timedelta
+
+import polars as pl
+
 import pytest
 from vcub_keeper.production.data import (
+    AdaptiveChunkPlanner,
+    ApiClient,
+    ApiResponseCache,
+    RateLimiter,
     get_data_from_api_by_station,
     transform_json_station_data_to_df,
     get_data_from_api_bdx_by_station,
@@ -197,3 +208,355 @@ def test_get_api_bdx_data_with_chunk(capsys):
 def test_chunk_list_(station_id_list, chunk_size, expected):
     result = list(chunk_list_(station_id_list=station_id_list, chunk_size=chunk_size))
     assert result == expected
+
+
+def test_get_api_bdx_data_with_chunk_concurrent(api_bdx_stub):
+    """
+    On test la récupération concurrente des chunks (max_workers > 1) via le stub local de l'API :
+    le GeoJSON fusionné doit être identique à celui du mode séquentiel.
+    """
+
+    station_id = list(range(1, 11))
+    start_date = "2024-12-29"
+    stop_date = "2024-12-30"
+
+    station_json_serial = get_data_from_api_bdx_by_station(
+        station_id=station_id, start_date=start_date, stop_date=stop_date, chunk_size_station=3
+    )
+    station_json_concurrent = get_data_from_api_bdx_by_station(
+        station_id=station_id, start_date=start_date, stop_date=stop_date, chunk_size_station=3, max_workers=4
+    )
+
+    assert api_bdx_stub.request_count == 4 * 2
+    assert station_json_concurrent == station_json_serial
+    assert len(station_json_concurrent["features"]) == 10 * 288
+
+
+def test_get_api_bdx_data_with_chunk_error(api_bdx_stub):
+    """
+    Un chunk en erreur n'est jamais ignoré silencieusement : erreur avec as_bytes=True (les données
+    seraient écrites partiellement), chunk ignoré en GeoJSON, erreur si aucun chunk n'est récupéré.
+    """
+
+    station_id = list(range(1, 7))
+    start_date = "2024-12-29"
+    stop_date = "2024-12-30"
+
+    # Le premier chunk renvoie une erreur non retentée par le client (404)
+    api_bdx_stub.responses = [(404, {})]
+    with pytest.raises(RuntimeError, match="1 / 2 chunks"):
+        get_data_from_api_bdx_by_station(
+            station_id=station_id, start_date=start_date, stop_date=stop_date, chunk_size_station=3, as_bytes=True
+        )
+
+    api_bdx_stub.responses = [(404, {})]
+    station_json = get_data_from_api_bdx_by_station(
+        station_id=station_id, start_date=start_date, stop_date=stop_date, chunk_size_station=3
+    )
+    assert len(station_json["features"]) == 3 * 288
+
+    api_bdx_stub.responses = [(404, {}), (404, {})]
+    with pytest.raises(RuntimeError, match="2 / 2 chunks"):
+        get_data_from_api_bdx_by_station(
+            station_id=station_id, start_date=start_date, stop_date=stop_date, chunk_size_station=3
+        )
+
+
+def test_rate_limiter():
+    """
+    Le RateLimiter doit espacer les appels vers un même host, mais pas entre hosts différents.
+    """
+
+    rate_limiter = RateLimiter(max_requests_per_second=20)
+
+    start = time.perf_counter()
+    for _ in range(5):
+        rate_limiter.wait("http://host-a/api")
+    elapsed_same_host = time.perf_counter() - start
+
+    start = time.perf_counter()
+    rate_limiter.wait("http://host-b/api")
+    elapsed_other_host = time.perf_counter() - start
+
+    # 4 intervalles de 0.05s entre 5 appels
+    assert elapsed_same_host >= 0.19
+    assert elapsed_other_host < 0.05
+
+
+def test_api_client_keep_alive(api_bdx_stub):
+    """
+    Les appels successifs d'un même ApiClient doivent réutiliser la même connexion (keep-alive).
+    """
+
+    with ApiClient() as api_client:
+        for _ in range(5):
+            station_json = get_data_from_api_bdx_by_station(
+                station_id=1, start_date="2024-12-29", stop_date="2024-12-30", api_client=api_client
+            )
+            assert len(station_json["features"]) == 288
+        metrics = api_client.get_metrics()
+
+    assert api_bdx_stub.request_count == 5
+    assert api_bdx_stub.connection_count == 1
+    assert metrics["n_requests"] == 5
+    assert metrics["n_retries"] == 0
+    assert metrics["latency_p95"] >= metrics["latency_p50"]
+
+
+def test_api_client_retry_after(api_bdx_stub):
+    """
+    Sur un status 429, le client doit attendre le délai indiqué par le header Retry-After.
+    """
+
+    api_bdx_stub.responses = [(429, {"Retry-After": "1"})]
+
+    with ApiClient(backoff_factor=0.01) as api_client:
+        start = time.perf_counter()
+        station_json = get_data_from_api_bdx_by_station(
+            station_id=1, start_date="2024-12-29", stop_date="2024-12-30", api_client=api_client
+        )
+        elapsed = time.perf_counter() - start
+        metrics = api_client.get_metrics()
+
+    assert len(station_json["features"]) == 288
+    assert elapsed >= 1
+    assert metrics["n_retries"] == 1
+    assert metrics["n_errors"] == 1
+    assert api_bdx_stub.request_count == 2
+
+
+def test_api_client_backoff(api_bdx_stub):
+    """
+    Sur des erreurs 5xx, le client refait la requête avec un backoff exponentiel puis
+    lève une exception une fois le nombre de tentatives atteint.
+    """
+
+    api_bdx_stub.responses = [(503, {}), (502, {})]
+    with ApiClient(max_retries=3, backoff_factor=0.01) as api_client:
+        station_json = get_data_from_api_bdx_by_station(
+            station_id=1, start_date="2024-12-29", stop_date="2024-12-30", api_client=api_client
+        )
+        assert len(station_json["features"]) == 288
+        assert api_client.get_metrics()["n_retries"] == 2
+
+    api_bdx_stub.responses = [(503, {})] * 3
+    with ApiClient(max_retries=3, backoff_factor=0.01) as api_client, pytest.raises(Exception, match="3 tentatives"):
+        get_data_from_api_bdx_by_station(
+            station_id=1, start_date="2024-12-29", stop_date="2024-12-30", api_client=api_client
+        )
+
+    # Pas de nouvelle tentative sur une erreur client (404)
+    api_bdx_stub.responses = [(404, {})]
+    with ApiClient(max_retries=3, backoff_factor=0.01) as api_client, pytest.raises(Exception):
+        get_data_from_api_bdx_by_station(
+            station_id=1, start_date="2024-12-29", stop_date="2024-12-30", api_client=api_client
+        )
+    assert api_bdx_stub.request_count == 3 + 3 + 1
+
+
+@pytest.mark.parametrize("attempt, expected_max", [(1, 0.1), (2, 0.2), (3, 0.4), (10, 1)])
+def test_api_client_backoff_delay(attempt, expected_max):
+    api_client = ApiClient(backoff_factor=0.1, max_backoff=1)
+    delay = api_client.get_backoff_delay(attempt)
+    assert expected_max / 2 <= delay <= expected_max
+    assert api_client.get_backoff_delay(attempt, retry_after="2") == 1  # Borné par max_backoff
+    api_client.close()
+
+
+def test_adaptive_chunk_planner():
+    """
+    La taille des requêtes augmente (stations puis jours) tant que la requête estimée reste
+    sous les seuils, et diminue (stations puis jours) sur une erreur.
+    """
+
+    chunk_planner = AdaptiveChunkPlanner(chunk_size_station=10, chunk_days=2, target_latency=1, max_features=10_000)
+
+    chunk_planner.record_success(n_stations=10, n_days=2, latency=0.1, n_features=5760, n_stations_total=30)
+    assert (chunk_planner.chunk_size_station, chunk_planner.chunk_days) == (10, 2)  # 2 x 5760 > max_features
+
+    chunk_planner.record_success(n_stations=10, n_days=2, latency=0.1, n_features=1000, n_stations_total=30)
+    assert (chunk_planner.chunk_size_station, chunk_planner.chunk_days) == (20, 2)
+    chunk_planner.record_success(n_stations=20, n_days=2, latency=0.1, n_features=2000, n_stations_total=30)
+    assert (chunk_planner.chunk_size_station, chunk_planner.chunk_days) == (30, 2)  # Borné par le nombre de stations
+    # Toutes les stations tiennent dans une requête : on augmente le nombre de jours
+    chunk_planner.record_success(n_stations=30, n_days=2, latency=0.1, n_features=3000, n_stations_total=30)
+    assert (chunk_planner.chunk_size_station, chunk_planner.chunk_days) == (30, 4)
+    # Requête trop lente pour grandir
+    chunk_planner.record_success(n_stations=30, n_days=4, latency=0.8, n_features=3000, n_stations_total=30)
+    assert (chunk_planner.chunk_size_station, chunk_planner.chunk_days) == (30, 4)
+
+    assert chunk_planner.record_failure(n_stations=30, n_days=4, error=TimeoutError())
+    assert (chunk_planner.chunk_size_station, chunk_planner.chunk_days) == (15, 4)
+    # Pas de retour à la taille en erreur
+    chunk_planner.record_success(n_stations=15, n_days=4, latency=0.1, n_features=1000, n_stations_total=30)
+    assert (chunk_planner.chunk_size_station, chunk_planner.chunk_days) == (15, 4)
+
+    chunk_planner = AdaptiveChunkPlanner(chunk_size_station=1, chunk_days=2)
+    assert chunk_planner.record_failure(n_stations=1, n_days=2, error=TimeoutError())
+    assert (chunk_planner.chunk_size_station, chunk_planner.chunk_days) == (1, 1)
+    assert not chunk_planner.record_failure(n_stations=1, n_days=1, error=TimeoutError())
+
+    plan = chunk_planner.get_plan()
+    assert plan["status"].to_list() == ["error", "error"]
+
+
+def test_get_api_bdx_data_adaptive(api_bdx_stub):
+    """
+    Avec un AdaptiveChunkPlanner, les requêtes grandissent jusqu'à la limite de l'API (réponse
+    tronquée au-delà de max_features) puis diminuent : moins de requêtes qu'avec un découpage fixe
+    (4 jours x 25 stations) et les mêmes points.
+    """
+
+    station_id = list(range(1, 61))
+    start_date = "2024-12-01"
+    stop_date = "2024-12-17"
+    api_bdx_stub.max_features = 288 * 60 * 5  # 60 stations x 5 jours
+
+    chunk_planner = AdaptiveChunkPlanner(target_latency=10)
+    station_json_adaptive = get_data_from_api_bdx_by_station(
+        station_id=station_id, start_date=start_date, stop_date=stop_date, chunk_planner=chunk_planner
+    )
+    n_requests_adaptive = api_bdx_stub.request_count
+
+    plan = chunk_planner.get_plan()
+    assert (plan["status"] == "error").sum() >= 1
+    assert plan.filter(pl.col("status") == "ok")["n_features"].max() <= api_bdx_stub.max_features
+
+    api_bdx_stub.max_features = None
+    features_fixed = []
+    for start, stop in [("2024-12-01", "2024-12-05"), ("2024-12-05", "2024-12-09"),
+                        ("2024-12-09", "2024-12-13"), ("2024-12-13", "2024-12-17")]:  # fmt: skip
+        features_fixed.extend(
+            get_data_from_api_bdx_by_station(
+                station_id=station_id, start_date=start, stop_date=stop, chunk_size_station=25
+            )["features"]
+        )
+    n_requests_fixed = api_bdx_stub.request_count - n_requests_adaptive
+
+    def sort_key(feature):
+        return (feature["properties"]["ident"], feature["properties"]["time"])
+
+    assert n_requests_adaptive < n_requests_fixed
+    assert sorted(station_json_adaptive["features"], key=sort_key) == sorted(features_fixed, key=sort_key)
+
+
+def test_api_response_cache(api_bdx_stub, tmp_path):
+    """
+    Une requête sur une période passée déjà faite est lue depuis le cache (aucun appel réseau),
+    y compris depuis une autre instance du cache (autre session).
+    """
+
+    station_json = get_data_from_api_bdx_by_station(
+        station_id=list(range(1, 31)),
+        start_date="2024-12-29",
+        stop_date="2024-12-30",
+        chunk_size_station=10,
+        cache=ApiResponseCache(cache_dir=tmp_path),
+    )
+    assert api_bdx_stub.request_count == 3
+    assert len(list(tmp_path.glob("*.json.gz"))) == 3
+
+    with ApiClient(cache=ApiResponseCache(cache_dir=tmp_path)) as api_client:
+        station_json_cache = get_data_from_api_bdx_by_station(
+            station_id=list(range(1, 31)),
+            start_date="2024-12-29",
+            stop_date="2024-12-30",
+            chunk_size_station=10,
+            api_client=api_client,
+        )
+        assert api_client.get_metrics()["n_cache_hits"] == 3
+
+    assert api_bdx_stub.request_count == 3
+    assert station_json_cache == station_json
+
+
+@pytest.mark.parametrize(
+    "corrupt",
+    [
+        lambda data: data[: len(data) // 2],  # fichier tronqué
+        lambda data: b"not a gzip file",
+        lambda data: gzip.compress(b'{"expires_at": "demain"}\n{"features": []}'),  # en-tête invalide
+        lambda data: gzip.compress(b"pas d'en-tete"),
+    ],
+)
+def test_api_response_cache_corrupt(api_bdx_stub, tmp_path, corrupt):
+    """
+    Une entrée du cache illisible (fichier tronqué ou corrompu, en-tête invalide) est traitée comme
+    absente : elle est supprimée et la réponse est de nouveau demandée à l'API puis remise en cache.
+    """
+
+    cache = ApiResponseCache(cache_dir=tmp_path)
+    url = "http://api/ci_vcub_p?rangeStart=2024-12-01&rangeEnd=2024-12-02"
+    cache.set(url, b'{"features": []}')
+    cache_file = tmp_path / f"{cache.get_key(url)}.json.gz"
+    cache_file.write_bytes(corrupt(cache_file.read_bytes()))
+
+    assert ApiResponseCache(cache_dir=tmp_path).get(url) is None
+    assert not cache_file.exists()
+
+    kwargs = {"station_id": list(range(1, 11)), "start_date": "2024-12-29", "stop_date": "2024-12-30"}
+    station_json = get_data_from_api_bdx_by_station(**kwargs, cache=ApiResponseCache(cache_dir=tmp_path))
+    for cache_file in tmp_path.glob("*.json.gz"):
+        cache_file.write_bytes(corrupt(cache_file.read_bytes()))
+
+    cache = ApiResponseCache(cache_dir=tmp_path)
+    assert get_data_from_api_bdx_by_station(**kwargs, cache=cache) == station_json
+    assert api_bdx_stub.request_count == 2
+    assert get_data_from_api_bdx_by_station(**kwargs, cache=cache) == station_json
+    assert api_bdx_stub.request_count == 2
+    assert cache.size_bytes == sum(file.stat().st_size for file in tmp_path.glob("*.json.gz"))
+
+
+def test_api_response_cache_key():
+    """
+    La clé du cache ne dépend ni de la clé d'API, ni de l'ordre des stations.
+    """
+
+    cache_key = ApiResponseCache.normalize_url_
+    url = 'https://api/ci_vcub_p?key=A&rangeStart=2024-12-01&filter={"ident":{"$in":[3,1,2]}}&rangeEnd=2024-12-02'
+    url_same = (
+        'https://api/ci_vcub_p?rangeEnd=2024-12-02&key=B&filter={"ident": {"$in": [1,2,3]}}&rangeStart=2024-12-01'
+    )
+    url_other = 'https://api/ci_vcub_p?key=A&rangeStart=2024-12-01&filter={"ident":{"$in":[1,2]}}&rangeEnd=2024-12-02'
+
+    assert cache_key(url) == cache_key(url_same)
+    assert cache_key(url) != cache_key(url_other)
+
+
+def test_api_response_cache_ttl(tmp_path):
+    """
+    Les réponses sur une période passée n'expirent jamais, celles incluant "maintenant" expirent après ttl_recent.
+    """
+
+    cache = ApiResponseCache(cache_dir=tmp_path, ttl_recent=0)
+    tomorrow = (datetime.now() + timedelta(days=1)).strftime("%Y-%m-%d")
+    url_past = "http://api/ci_vcub_p?rangeStart=2024-12-01&rangeEnd=2024-12-02"
+    url_recent = f"http://api/ci_vcub_p?rangeStart=2024-12-01&rangeEnd={tomorrow}"
+
+    cache.set(url_past, b'{"features": []}')
+    cache.set(url_recent, b'{"features": []}')
+    time.sleep(0.01)
+
+    assert cache.get(url_past) == b'{"features": []}'
+    assert cache.get(url_recent) is None
+
+
+def test_api_response_cache_lru(tmp_path):
+    """
+    Au-delà de max_size_bytes, les entrées les moins récemment utilisées sont supprimées.
+    """
+
+    cache = ApiResponseCache(cache_dir=tmp_path)
+    urls = [f"http://api/ci_vcub_p?rangeStart=2024-12-0{day}&rangeEnd=2024-12-0{day + 1}" for day in range(1, 5)]
+
+    for i, url in enumerate(urls[:3]):
+        cache.set(url, b'{"features": [1, 2, 3]}')
+        os.utime(tmp_path / f"{cache.get_key(url)}.json.gz", (1000 * (i + 1), 1000 * (i + 1)))
+
+    assert cache.get(urls[0]) is not None  # urls[0] devient la plus récemment utilisée
+    cache.max_size_bytes = cache.size_bytes
+    cache.set(urls[3], b'{"features": [1, 2, 3]}')
+
+    assert cache.get(urls[1]) is None
+    assert all(cache.get(url) is not None for url in [urls[0], urls[2], urls[3]])
+    assert cache.size_bytes <= cache.max_size_bytes
@@ -1,10 +1,42 @@
 import io
+from datetime import datetime
+
 import pytest
 import pandas as pd
 import polars as pl
 from polars.testing import assert_frame_equal
-from vcub_keeper.create.creator import create_station_attribute, calculate_breakpoints_, generate_date_intervals_
-from vcub_keeper.reader.reader import read_stations_attributes
+from vcub_keeper.create.creator import (
+    create_station_attribute,
+    calculate_breakpoints_,
+    generate_date_intervals_,
+    generate_backfill_units_,
+    get_last_complete_window_,
+    create_features_store,
+    create_learning_dataset,
+    create_station_profilage_activity,
+    get_profile_station_activity_,
+    read_backfill_manifest_,
+    update_learning_dataset,
+    write_station_activity_features_,
+)
+from vcub_keeper.production.data import (
+    ApiResponseCache,
+    get_data_from_api_bdx_by_station,
+    transform_json_api_bdx_station_data_to_df,
+)
+from vcub_keeper.reader.reader import (
+    get_learning_dataset_files_,
+    read_features,
+    read_learning_dataset,
+    read_stations_attributes,
+)
+from vcub_keeper.transform.features_factory import (
+    collect_streaming,
+    get_consecutive_no_transactions_out,
+    get_station_activity_features,
+    get_transactions,
+    is_streamable,
+)
 
 
 def test_create_station_attribute():
@@ -148,3 +180,489 @@ def test_generate_date_intervals_(start_date, stop_date, chunk_days, expected):
     """Permets de tester la fonction generate_date_intervals_"""
     result = generate_date_intervals_(start_date=start_date, stop_date=stop_date, chunk_days=chunk_days)
     assert result == expected
+
+
+def test_generate_backfill_units_():
+    """Permets de tester la fonction generate_backfill_units_"""
+    intervals = generate_date_intervals_(start_date="2025-01-01", stop_date="2025-01-10", chunk_days=4)
+    units = generate_backfill_units_(station_id_list=[1, 2, 3, 4, 5], intervals=intervals, chunk_size=2)
+
+    # 3 intervalles x 3 chunks
+    assert len(units) == 9
+    assert len({unit["unit_id"] for unit in units}) == 9
+    assert units[0] == {
+        "unit_id": "2025-01-01_2025-01-05_chunk_001",
+        "start_date": "2025-01-01",
+        "stop_date": "2025-01-05",
+        "station_id": [1, 2],
+    }
+    assert units[-1]["station_id"] == [5]
+
+
+def test_create_learning_dataset(api_bdx_stub, monkeypatch, tmp_path):
+    """
+    Création du learning dataset via le stub local de l'API avec plusieurs workers :
+    le résultat doit être identique à la transformation d'un seul GeoJSON sur toute la période.
+    """
+    station_id_list = list(range(1, 8))
+    monkeypatch.setattr(
+        "vcub_keeper.create.creator.read_stations_attributes",
+        lambda path_directory: pl.DataFrame({"station_id": station_id_list}),
+    )
+
+    create_learning_dataset(
+        start_time="2025-01-01",
+        end_time="2025-01-10",
+        path_to_export=f"{tmp_path}/",
+        max_workers=4,
+        max_requests_per_second=50,
+    )
+
+    # 3 intervalles x 1 chunk (7 stations < 25)
+    assert api_bdx_stub.request_count == 3
+    assert len(list((tmp_path / "learning_dataset_parts").glob("*.parquet"))) == 3
+
+    learning_dataset = pl.read_parquet(tmp_path / "learning_dataset.parquet").sort(["station_id", "date"])
+
+    station_json = get_data_from_api_bdx_by_station(
+        station_id=station_id_list, start_date="2025-01-01", stop_date="2025-01-10"
+    )
+    expected = transform_json_api_bdx_station_data_to_df(station_json).collect()
+
+    assert_frame_equal(learning_dataset, expected)
+
+
+def test_create_learning_dataset_adaptive(api_bdx_stub, monkeypatch, tmp_path):
+    """
+    Avec adaptive=True, les requêtes grandissent tant que l'API répond (moins de requêtes
+    que le découpage fixe en intervalles de 4 jours) et le learning dataset est identique.
+    """
+    station_id_list = list(range(1, 9))
+    monkeypatch.setattr(
+        "vcub_keeper.create.creator.read_stations_attributes",
+        lambda path_directory: pl.DataFrame({"station_id": station_id_list}),
+    )
+    api_bdx_stub.max_features = 288 * 8 * 12  # 8 stations x 12 jours
+
+    create_learning_dataset(
+        start_time="2025-01-01", end_time="2025-02-10", path_to_export=f"{tmp_path}/", max_workers=2, adaptive=True
+    )
+
+    # 10 requêtes avec le découpage fixe (40 jours / 4)
+    assert api_bdx_stub.request_count < 10
+
+    api_bdx_stub.max_features = None
+    learning_dataset = pl.read_parquet(tmp_path / "learning_dataset.parquet")
+    station_json = get_data_from_api_bdx_by_station(
+        station_id=station_id_list, start_date="2025-01-01", stop_date="2025-02-10"
+    )
+    expected = transform_json_api_bdx_station_data_to_df(station_json).collect()
+
+    assert_frame_equal(learning_dataset, expected)
+
+
+def test_create_learning_dataset_cache(api_bdx_stub, monkeypatch, tmp_path):
+    """
+    Un backfill relancé sur la même période passée avec un cache ne fait aucun appel réseau.
+    """
+    station_id_list = list(range(1, 8))
+    monkeypatch.setattr(
+        "vcub_keeper.create.creator.read_stations_attributes",
+        lambda path_directory: pl.DataFrame({"station_id": station_id_list}),
+    )
+    cache = ApiResponseCache(cache_dir=tmp_path / "cache")
+
+    create_learning_dataset(
+        start_time="2025-01-01", end_time="2025-01-10", path_to_export=f"{tmp_path}/first/", cache=cache
+    )
+    assert api_bdx_stub.request_count == 3
+
+    create_learning_dataset(
+        start_time="2025-01-01", end_time="2025-01-10", path_to_export=f"{tmp_path}/second/", cache=cache
+    )
+    assert api_bdx_stub.request_count == 3
+
+    assert_frame_equal(
+        pl.read_parquet(tmp_path / "first" / "learning_dataset.parquet"),
+        pl.read_parquet(tmp_path / "second" / "learning_dataset.parquet"),
+    )
+
+
+def test_create_learning_dataset_resume(api_bdx_stub, monkeypatch, tmp_path):
+    """
+    Une unité en erreur est inscrite dans le manifest et bloque l'export.
+    Relancer create_learning_dataset() ne récupère que l'unité manquante.
+    """
+    station_id_list = [1, 2, 3]
+    monkeypatch.setattr(
+        "vcub_keeper.create.creator.read_stations_attributes",
+        lambda path_directory: pl.DataFrame({"station_id": station_id_list}),
+    )
+    # La première requête renvoie une erreur non retentée par le client (404)
+    api_bdx_stub.responses = [(404, {})]
+
+    with pytest.raises(RuntimeError, match="1 unités en erreur"):
+        create_learning_dataset(start_time="2025-01-01", end_time="2025-01-10", path_to_export=f"{tmp_path}/")
+
+    manifest = read_backfill_manifest_(f"{tmp_path}/learning_dataset_parts/")
+    assert list(manifest["failed"]) == ["2025-01-01_2025-01-05_chunk_001"]
+    assert len(manifest["completed"]) == 2
+    assert not (tmp_path / "learning_dataset.parquet").exists()
+
+    # Reprise
+    create_learning_dataset(start_time="2025-01-01", end_time="2025-01-10", path_to_export=f"{tmp_path}/")
+
+    assert api_bdx_stub.request_count == 3 + 1
+    manifest = read_backfill_manifest_(f"{tmp_path}/learning_dataset_parts/")
+    assert manifest["failed"] == {}
+    assert len(manifest["completed"]) == 3
+
+    learning_dataset = pl.read_parquet(tmp_path / "learning_dataset.parquet").sort(["station_id", "date"])
+    station_json = get_data_from_api_bdx_by_station(
+        station_id=station_id_list, start_date="2025-01-01", stop_date="2025-01-10"
+    )
+    expected = transform_json_api_bdx_station_data_to_df(station_json).collect()
+    assert_frame_equal(learning_dataset, expected)
+
+
+def test_update_learning_dataset(api_bdx_stub, monkeypatch, tmp_path):
+    """
+    La mise à jour incrémentale n'ajoute que les nouvelles données (sans réécrire le fichier existant)
+    et le résultat (transactions_* à la frontière compris) est identique à une création complète.
+    """
+    station_id_list = [1, 2, 3]
+    monkeypatch.setattr(
+        "vcub_keeper.create.creator.read_stations_attributes",
+        lambda path_directory: pl.DataFrame({"station_id": station_id_list}),
+    )
+    create_learning_dataset(start_time="2025-01-01", end_time="2025-01-05", path_to_export=f"{tmp_path}/")
+    learning_dataset_mtime = (tmp_path / "learning_dataset.parquet").stat().st_mtime_ns
+    request_count = api_bdx_stub.request_count
+
+    update_learning_dataset(path_to_export=f"{tmp_path}/", end_time="2025-01-09")
+
+    # Uniquement la nouvelle période est demandée à l'API
+    assert api_bdx_stub.request_count == request_count + 1
+    assert "rangeStart=2025-01-05" in api_bdx_stub.requested_urls[-1]
+    assert (tmp_path / "learning_dataset.parquet").stat().st_mtime_ns == learning_dataset_mtime
+    assert len(list((tmp_path / "learning_dataset_append").glob("*.parquet"))) == 1
+
+    learning_dataset = read_learning_dataset(file_path=f"{tmp_path}/").collect()
+
+    station_json = get_data_from_api_bdx_by_station(
+        station_id=station_id_list, start_date="2025-01-01", stop_date="2025-01-09"
+    )
+    expected = transform_json_api_bdx_station_data_to_df(station_json).collect()
+    assert_frame_equal(learning_dataset, expected)
+
+    # Rien de nouveau à ajouter
+    update_learning_dataset(path_to_export=f"{tmp_path}/", end_time="2025-01-09")
+    assert len(list((tmp_path / "learning_dataset_append").glob("*.parquet"))) == 1
+
+
+def test_get_last_complete_window():
+    """
+    La dernière fenêtre de 10 min terminée est "maintenant" arrondi à la dizaine de minutes inférieure.
+    """
+    assert get_last_complete_window_(datetime(2025, 1, 7, 12, 9, 59, 1)) == datetime(2025, 1, 7, 12, 0)
+    assert get_last_complete_window_(datetime(2025, 1, 7, 12, 10)) == datetime(2025, 1, 7, 12, 10)
+
+
+def test_update_learning_dataset_partial_window(api_bdx_stub, monkeypatch, tmp_path):
+    """
+    La fenêtre de 10 min en cours lors d'une mise à jour n'est pas ajoutée : elle l'est, complète, lors
+    de la mise à jour suivante et le résultat est identique à une création complète.
+    """
+    station_id_list = [1, 2, 3]
+    monkeypatch.setattr(
+        "vcub_keeper.create.creator.read_stations_attributes",
+        lambda path_directory: pl.DataFrame({"station_id": station_id_list}),
+    )
+    create_learning_dataset(start_time="2025-01-01", end_time="2025-01-05", path_to_export=f"{tmp_path}/")
+
+    # Mise à jour à 12h05 : le point de 12h00 est dans la fenêtre [12h00, 12h10) encore en cours
+    api_bdx_stub.now = datetime(2025, 1, 7, 12, 5)
+    monkeypatch.setattr("vcub_keeper.create.creator.get_last_complete_window_", lambda: datetime(2025, 1, 7, 12, 0))
+    update_learning_dataset(path_to_export=f"{tmp_path}/", end_time="2025-01-08")
+    assert read_learning_dataset(file_path=f"{tmp_path}/").collect()["date"].max() == datetime(2025, 1, 7, 12, 0)
+
+    api_bdx_stub.now = None
+    monkeypatch.setattr("vcub_keeper.create.creator.get_last_complete_window_", lambda: datetime(2025, 1, 9, 0, 0))
+    update_learning_dataset(path_to_export=f"{tmp_path}/", end_time="2025-01-09")
+
+    station_json = get_data_from_api_bdx_by_station(
+        station_id=station_id_list, start_date="2025-01-01", stop_date="2025-01-09"
+    )
+    expected = transform_json_api_bdx_station_data_to_df(station_json).collect()
+    assert_frame_equal(read_learning_dataset(file_path=f"{tmp_path}/").collect(), expected)
+
+
+def test_update_learning_dataset_station_out_of_service(api_bdx_stub, monkeypatch, tmp_path):
+    """
+    Une station sans données depuis longtemps (hors service) ou absente de la liste des stations ne
+    repousse pas le début de la période demandée à l'API.
+    """
+    monkeypatch.setattr(
+        "vcub_keeper.create.creator.read_stations_attributes",
+        lambda path_directory: pl.DataFrame({"station_id": [1, 2, 3]}),
+    )
+    learning_dataset = pl.concat(
+        [
+            transform_json_api_bdx_station_data_to_df(
+                get_data_from_api_bdx_by_station(station_id=station_id, start_date=start_date, stop_date="2025-02-01")
+            ).collect()
+            for station_id, start_date in [([1, 2], "2025-01-28"), ([3], "2025-01-01"), ([4], "2024-12-01")]
+        ]
+    )
+    learning_dataset = learning_dataset.filter((pl.col("station_id") != 3) | (pl.col("date") < datetime(2025, 1, 2)))
+    learning_dataset = learning_dataset.filter((pl.col("station_id") != 4) | (pl.col("date") < datetime(2024, 12, 2)))
+    learning_dataset.sort("station_id", "date").write_parquet(tmp_path / "learning_dataset.parquet")
+    request_count = api_bdx_stub.request_count
+
+    update_learning_dataset(path_to_export=f"{tmp_path}/", end_time="2025-02-03")
+
+    assert api_bdx_stub.request_count == request_count + 1
+    assert "rangeStart=2025-02-01" in api_bdx_stub.requested_urls[-1]
+    new_data = read_learning_dataset(file_path=f"{tmp_path}/", start_date="2025-02-01").collect()
+    assert new_data["station_id"].unique().sort().to_list() == [1, 2, 3]
+
+
+def test_create_learning_dataset_partitioned(api_bdx_stub, monkeypatch, tmp_path):
+    """
+    Learning dataset partitionné par mois et groupe de stations : la lecture d'une station
+    ne concerne que les fichiers de son groupe (et de la période demandée).
+    """
+    station_id_list = [1, 2, 30]
+    monkeypatch.setattr(
+        "vcub_keeper.create.creator.read_stations_attributes",
+        lambda path_directory: pl.DataFrame({"station_id": station_id_list}),
+    )
+    create_learning_dataset(
+        start_time="2025-01-29", end_time="2025-02-02", path_to_export=f"{tmp_path}/", partitioned=True
+    )
+
+    assert sorted(str(path.relative_to(tmp_path)) for path in (tmp_path / "learning_dataset").rglob("*.parquet")) == [
+        "learning_dataset/month=2025-01/station_bucket=0/part-0.parquet",
+        "learning_dataset/month=2025-01/station_bucket=1/part-0.parquet",
+        "learning_dataset/month=2025-02/station_bucket=0/part-0.parquet",
+        "learning_dataset/month=2025-02/station_bucket=1/part-0.parquet",
+    ]
+
+    station_json = get_data_from_api_bdx_by_station(
+        station_id=station_id_list, start_date="2025-01-29", stop_date="2025-02-02"
+    )
+    expected = transform_json_api_bdx_station_data_to_df(station_json).collect()
+
+    assert_frame_equal(read_learning_dataset(file_path=f"{tmp_path}/").collect(), expected)
+
+    # Filtres
+    assert get_learning_dataset_files_(file_path=f"{tmp_path}/", station_id=30, start_date="2025-02-01") == [
+        f"{tmp_path}/learning_dataset/month=2025-02/station_bucket=1/part-0.parquet"
+    ]
+    assert_frame_equal(
+        read_learning_dataset(file_path=f"{tmp_path}/", station_id=30, start_date="2025-02-01").collect(),
+        expected.filter((pl.col("station_id") == 30) & (pl.col("date") >= datetime(2025, 2, 1))),
+    )
+    assert_frame_equal(
+        read_learning_dataset(file_path=f"{tmp_path}/", station_id=[1, 2], end_date="2025-01-30").collect(),
+        expected.filter(pl.col("station_id").is_in([1, 2]) & (pl.col("date") <= datetime(2025, 1, 30))),
+    )
+
+    # Mise à jour incrémentale dans les partitions
+    update_learning_dataset(path_to_export=f"{tmp_path}/", end_time="2025-02-04")
+    assert (tmp_path / "learning_dataset/month=2025-02/station_bucket=1/part-20250204000000.parquet").exists()
+
+    station_json = get_data_from_api_bdx_by_station(
+        station_id=station_id_list, start_date="2025-01-29", stop_date="2025-02-04"
+    )
+    expected = transform_json_api_bdx_station_data_to_df(station_json).collect()
+    assert_frame_equal(read_learning_dataset(file_path=f"{tmp_path}/").collect(), expected)
+
+
+def test_create_station_profilage_activity_streaming(api_bdx_stub, monkeypatch, tmp_path):
+    """
+    Profilage des stations à mémoire bornée : features calculées par groupe de stations puis
+    filtre et aggrégation exécutés par le moteur streaming de Polars. Le résultat doit être identique
+    au calcul en mémoire.
+    """
+    station_id_list = list(range(1, 8))
+    monkeypatch.setattr(
+        "vcub_keeper.create.creator.read_stations_attributes",
+        lambda path_directory: pl.DataFrame({"station_id": station_id_list}),
+    )
+    monkeypatch.setattr("vcub_keeper.create.creator.ROOT_DATA_CLEAN", f"{tmp_path}/")
+    monkeypatch.setattr("vcub_keeper.create.creator.ROOT_DATA_REF", f"{tmp_path}/")
+
+    create_learning_dataset(start_time="2025-01-01", end_time="2025-01-10", path_to_export=f"{tmp_path}/")
+
+    # Features par groupe de 3 stations
+    path_features = f"{tmp_path}/learning_dataset_features/"
+    write_station_activity_features_(
+        file_path=f"{tmp_path}/", file_name="learning_dataset", path_features=path_features, station_bucket_size=3
+    )
+    assert len(list((tmp_path / "learning_dataset_features").glob("*.parquet"))) == 3
+
+    ts_activity = (
+        read_learning_dataset(file_path=f"{tmp_path}/").pipe(get_transactions).pipe(get_consecutive_no_transactions_out)
+    )
+    ts_activity_features = pl.scan_parquet(f"{path_features}*.parquet")
+    assert_frame_equal(ts_activity_features.collect(), ts_activity.collect())
+
+    # Aucun noeud non streamable dans le plan d'aggrégation (les features par station ne le sont pas)
+    assert not is_streamable(ts_activity)
+    profile_station_plan = get_profile_station_activity_(ts_activity_features)
+    assert is_streamable(profile_station_plan)
+
+    # Statistiques identiques à median(), std() et quantile()
+    transactions_out_bool = pl.col("transactions_out").clip(0, 1)
+    expected = (
+        ts_activity.filter((pl.col("status") == 1) & (pl.col("consecutive_no_transactions_out") <= 144))
+        .group_by("station_id")
+        .agg(
+            transactions_out_bool.count().alias("total_point"),
+            transactions_out_bool.mean().alias("mean"),
+            transactions_out_bool.median().alias("median"),
+            transactions_out_bool.std().alias("std"),
+            transactions_out_bool.quantile(0.95).alias("95%"),
+            transactions_out_bool.quantile(0.98).alias("98%"),
+            transactions_out_bool.quantile(0.99).alias("99%"),
+            transactions_out_bool.max().alias("max"),
+        )
+        .sort("station_id")
+        .collect()
+    )
+    assert_frame_equal(collect_streaming(profile_station_plan).sort("station_id"), expected)
+
+    # Profilage complet en mémoire (sans écriture du feature store) puis en streaming
+    create_station_profilage_activity()
+    profile_station = pl.read_csv(tmp_path / "station_profile.csv")
+    assert not (tmp_path / "learning_dataset_features" / "manifest.json").exists()
+
+    # Streaming sans feature store à jour : erreur explicite plutôt qu'un plan non streamable
+    with pytest.raises(ValueError, match="features_store=True"):
+        create_station_profilage_activity(streaming=True)
+
+    create_station_profilage_activity(streaming=True, features_store=True)
+    assert (tmp_path / "learning_dataset_features" / "manifest.json").exists()
+    profile_station_streaming = pl.read_csv(tmp_path / "station_profile.csv")
+
+    # Feature store à jour : il est lu sans être recalculé
+    create_station_profilage_activity(streaming=True)
+
+    assert_frame_equal(profile_station_streaming, profile_station)
+
+
+def test_create_features_store(api_bdx_stub, monkeypatch, tmp_path):
+    """
+    Le feature store n'est calculé qu'une fois par version du learning dataset et des features :
+    read_features() lit alors les colonnes du feature store, sinon les features sont calculées.
+    """
+    station_id_list = list(range(1, 8))
+    monkeypatch.setattr(
+        "vcub_keeper.create.creator.read_stations_attributes",
+        lambda path_directory: pl.DataFrame({"station_id": station_id_list}),
+    )
+    create_learning_dataset(start_time="2025-01-01", end_time="2025-01-10", path_to_export=f"{tmp_path}/")
+
+    def is_read_from_store(features):
+        return "learning_dataset_features" in features.explain()
+
+    expected = read_learning_dataset(file_path=f"{tmp_path}/").pipe(get_station_activity_features).collect()
+
+    # Pas de feature store : features calculées
+    features = read_features(file_path=f"{tmp_path}/")
+    assert not is_read_from_store(features)
+    assert_frame_equal(features.collect(), expected)
+
+    # Feature store (3 groupes de stations) puis lecture
+    assert create_features_store(file_path=f"{tmp_path}/", station_bucket_size=3)
+    assert not create_features_store(file_path=f"{tmp_path}/", station_bucket_size=3)
+    features = read_features(file_path=f"{tmp_path}/")
+    assert is_read_from_store(features)
+    assert_frame_equal(features.collect(), expected)
+
+    # Filtres : les features sont calculées sur tout l'historique de la station
+    features_filtered = read_features(file_path=f"{tmp_path}/", station_id=[2, 5], start_date="2025-01-05")
+    expected_filtered = expected.filter(pl.col("station_id").is_in([2, 5]) & (pl.col("date") >= datetime(2025, 1, 5)))
+    assert_frame_equal(features_filtered.collect(), expected_filtered)
+    monkeypatch.setattr("vcub_keeper.reader.reader.get_features_version_", lambda: "new version")
+    features_filtered = read_features(file_path=f"{tmp_path}/", station_id=[2, 5], start_date="2025-01-05")
+    assert not is_read_from_store(features_filtered)
+    assert_frame_equal(features_filtered.collect(), expected_filtered)
+
+    # Nouvelle version des features : feature store recalculé
+    assert create_features_store(file_path=f"{tmp_path}/", station_bucket_size=3)
+    assert is_read_from_store(read_features(file_path=f"{tmp_path}/"))
+
+    # Nouvelles données dans le learning dataset : feature store invalidé
+    update_learning_dataset(end_time="2025-01-12", path_to_export=f"{tmp_path}/")
+    features = read_features(file_path=f"{tmp_path}/")
+    assert not is_read_from_store(features)
+    assert features.select(pl.col("date").max()).collect().item() > expected["date"].max()
+    assert create_features_store(file_path=f"{tmp_path}/", station_bucket_size=3)
+    assert_frame_equal(
+        read_features(file_path=f"{tmp_path}/").collect(),
+        read_learning_dataset(file_path=f"{tmp_path}/").pipe(get_station_activity_features).collect(),
+    )
+
+
+def test_collect_streaming(tmp_path):
+    """
+    collect_streaming() refuse un plan non streamable et exporte le résultat avec sink_parquet.
+    """
+    data = pl.LazyFrame({"station_id": [1, 1, 2], "available_bikes": [3, 1, 2]})
+
+    with pytest.raises(ValueError):
+        collect_streaming(data.with_columns(pl.col("available_bikes").shift(1)))
+
+    collect_streaming(data.filter(pl.col("available_bikes") > 1), path_to_export=f"{tmp_path}/data.parquet")
+    assert_frame_equal(pl.read_parquet(tmp_path / "data.parquet"), data.filter(pl.col("available_bikes") > 1).collect())
+
+
+def test_create_learning_dataset_other_period(api_bdx_stub, monkeypatch, tmp_path):
+    """
+    Une construction sur une autre période dans le même dossier ne conserve pas les données
+    de la construction précédente.
+    """
+    station_id_list = [1, 2, 3]
+    monkeypatch.setattr(
+        "vcub_keeper.create.creator.read_stations_attributes",
+        lambda path_directory: pl.DataFrame({"station_id": station_id_list}),
+    )
+    create_learning_dataset(start_time="2025-01-01", end_time="2025-01-05", path_to_export=f"{tmp_path}/")
+    create_learning_dataset(start_time="2025-02-01", end_time="2025-02-03", path_to_export=f"{tmp_path}/")
+
+    manifest = read_backfill_manifest_(f"{tmp_path}/learning_dataset_parts/")
+    assert list(manifest["completed"]) == ["2025-02-01_2025-02-03_chunk_001"]
+    assert len(list((tmp_path / "learning_dataset_parts").glob("*.parquet"))) == 1
+
+    learning_dataset = pl.read_parquet(tmp_path / "learning_dataset.parquet").sort(["station_id", "date"])
+    station_json = get_data_from_api_bdx_by_station(
+        station_id=station_id_list, start_date="2025-02-01", stop_date="2025-02-03"
+    )
+    expected = transform_json_api_bdx_station_data_to_df(station_json).collect()
+    assert_frame_equal(learning_dataset, expected)
+
+
+def test_create_learning_dataset_after_update(api_bdx_stub, monkeypatch, tmp_path):
+    """
+    Une reconstruction complète supprime les données ajoutées par update_learning_dataset()
+    """
+    station_id_list = [1, 2, 3]
+    monkeypatch.setattr(
+        "vcub_keeper.create.creator.read_stations_attributes",
+        lambda path_directory: pl.DataFrame({"station_id": station_id_list}),
+    )
+    create_learning_dataset(start_time="2025-01-01", end_time="2025-01-05", path_to_export=f"{tmp_path}/")
+    update_learning_dataset(path_to_export=f"{tmp_path}/", end_time="2025-01-09")
+    assert (tmp_path / "learning_dataset_append").exists()
+
+    create_learning_dataset(start_time="2025-02-01", end_time="2025-02-03", path_to_export=f"{tmp_path}/")
+
+    assert not (tmp_path / "learning_dataset_append").exists()
+    learning_dataset = read_learning_dataset(file_path=f"{tmp_path}/").collect()
+    station_json = get_data_from_api_bdx_by_station(
+        station_id=station_id_list, start_date="2025-02-01", stop_date="2025-02-03"
+    )
+    expected = transform_json_api_bdx_station_data_to_df(station_json).collect()
+    assert_frame_equal(learning_dataset, expected)
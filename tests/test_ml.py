@@ -1,9 +1,23 @@
+from datetime import datetime
+
+import numpy as np
 import pandas as pd
 import polars as pl
 import pytest
 from vcub_keeper.production.data import get_data_from_api_bdx_by_station, transform_json_api_bdx_station_data_to_df
 from vcub_keeper.transform.features_factory import get_consecutive_no_transactions_out, process_data_cluster
-from vcub_keeper.ml.cluster import train_cluster_station, predict_anomalies_station, logistic_predict_proba_from_model
+from polars.testing import assert_frame_equal
+from vcub_keeper.ml.cluster import (
+    get_data_by_station,
+    train_cluster_station,
+    predict_anomalies_station,
+    predict_anomalies_stations,
+    score_all_stations,
+    score_anomalies_station,
+    logistic_predict_proba_from_model,
+)
+from vcub_keeper.ml.cluster_utils import ModelRegistry, create_model_registry, load_model
+from vcub_keeper.ml.train_cluster import train_cluster_stations
 from vcub_keeper.config import FEATURES_TO_USE_CLUSTER
 
 
@@ -71,3 +85,191 @@ def test_ml_train_on_ne_station(data_activity, anomaly):
     elif anomaly == -1:  # Station KO
         # anomaly_score must be at =~ 59.16 (2025/02/25)
         assert 50 <= score_anomaly <= 65
+
+
+@pytest.fixture(scope="module")
+def ts_activity_stations():
+    """Activité synthétique de 3 stations sur 14 jours (10 min) avec la feature consecutive_no_transactions_out"""
+    rng = np.random.default_rng(2025)
+    dates = pl.datetime_range(datetime(2025, 3, 1), datetime(2025, 3, 15), "10m", closed="left", eager=True)
+    stations_id = [22, 106, 110]
+    n_rows = len(dates) * len(stations_id)
+    return pl.DataFrame(
+        {
+            "station_id": pl.Series(np.repeat(stations_id, len(dates)), dtype=pl.UInt16),
+            "date": pl.concat([dates] * len(stations_id)),
+            "status": pl.Series(np.ones(n_rows), dtype=pl.UInt8),
+            "consecutive_no_transactions_out": pl.Series(rng.geometric(0.1, size=n_rows) - 1, dtype=pl.UInt32),
+        }
+    ).lazy()
+
+
+def test_train_cluster_stations(ts_activity_stations, tmp_path):
+    """
+    Apprentissage en parallèle (processus) de plusieurs stations : mêmes modèles qu'en séquentiel,
+    une station sans données est reportée en erreur sans interrompre les autres.
+    """
+
+    stations_id = [22, 106, 110, 9999]  # 9999 : pas de données
+    profile_station_activity = {22: "hight", 106: "very high", 110: "medium", 9999: "low"}
+
+    path_sequential = str(tmp_path / "sequential") + "/"
+    path_parallel = str(tmp_path / "parallel") + "/"
+    (tmp_path / "sequential").mkdir()
+    (tmp_path / "parallel").mkdir()
+    report_sequential = train_cluster_stations(
+        ts_activity_stations, stations_id, profile_station_activity, path_directory=path_sequential, max_workers=1
+    )
+    report_parallel = train_cluster_stations(
+        ts_activity_stations, stations_id, profile_station_activity, path_directory=path_parallel, max_workers=2
+    )
+
+    for report in [report_sequential, report_parallel]:
+        assert report.get_column("station_id").to_list() == stations_id
+        assert report.filter(pl.col("error").is_not_null()).get_column("station_id").to_list() == [9999]
+        assert (report.get_column("elapsed") >= 0).all()
+
+    data_build = process_data_cluster(ts_activity_stations).collect().select(FEATURES_TO_USE_CLUSTER)
+    for station_id in [22, 106, 110]:
+        clf_sequential = load_model(station_id, path_directory=path_sequential)
+        clf_parallel = load_model(station_id, path_directory=path_parallel)
+        np.testing.assert_allclose(
+            clf_sequential.decision_function(data_build), clf_parallel.decision_function(data_build)
+        )
+
+
+def test_predict_anomalies_stations(ts_activity_stations):
+    """
+    La prédiction de plusieurs stations en une passe donne le même résultat que predict_anomalies_station()
+    station par station, et le plan lazy (features en amont) n'est exécuté qu'une seule fois.
+    """
+
+    clf_by_station = {
+        station_id: train_cluster_station(
+            ts_activity_stations, station_id=station_id, profile_station_activity="medium"
+        )
+        for station_id in [110, 22]
+    }
+    clf_by_station[9999] = clf_by_station[22]  # pas de données
+
+    n_scans = 0
+
+    def count_scan(s):
+        nonlocal n_scans
+        n_scans += 1
+        return s
+
+    data = ts_activity_stations.with_columns(
+        pl.col("station_id").map_batches(count_scan, return_dtype=pl.UInt16, is_elementwise=True)
+    )
+    stations_pred = predict_anomalies_stations(data, clf_by_station)
+    assert n_scans == 1
+
+    expected = pl.concat(
+        [
+            predict_anomalies_station(ts_activity_stations, clf=clf_by_station[station_id], station_id=station_id)
+            for station_id in [110, 22]
+        ]
+    )
+    assert_frame_equal(stations_pred, expected)
+    assert (stations_pred.get_column("anomaly") == -1).any()
+
+
+def test_get_data_by_station(ts_activity_stations):
+    """
+    Découpage par station (clé : station_id) avec filtre sur les stations et les colonnes
+    """
+
+    data_by_station = get_data_by_station(
+        ts_activity_stations, stations_id=[106, 22, 9999], columns=["station_id", "date"]
+    )
+
+    assert sorted(data_by_station) == [22, 106]
+    assert data_by_station[22].columns == ["station_id", "date"]
+    assert_frame_equal(
+        data_by_station[106],
+        ts_activity_stations.filter(pl.col("station_id") == 106).select("station_id", "date").collect(),
+    )
+
+
+def test_model_registry(ts_activity_stations, tmp_path):
+    """
+    Registre des modèles : mêmes modèles que les fichiers par station, métadonnées, cache LRU et version
+    """
+
+    path_directory = str(tmp_path) + "/"
+    train_cluster_stations(
+        ts_activity_stations,
+        [22, 106, 110],
+        {22: "hight", 106: "very high", 110: "medium"},
+        path_directory=path_directory,
+        max_workers=1,
+    )
+
+    create_model_registry(path_directory=path_directory)
+    data_build = process_data_cluster(ts_activity_stations).collect().select(FEATURES_TO_USE_CLUSTER)
+
+    with ModelRegistry(path_directory=path_directory, max_cached_models=2) as model_registry:
+        assert model_registry.version == 1
+        assert model_registry.stations_id == [22, 106, 110]
+        assert 106 in model_registry and 9999 not in model_registry
+
+        for station_id in model_registry.stations_id:
+            clf = load_model(station_id, path_directory=path_directory)
+            clf_registry = model_registry.load_model(station_id)
+            np.testing.assert_array_equal(clf_registry.decision_function(data_build), clf.decision_function(data_build))
+
+            metadata = model_registry.get_metadata(station_id)
+            assert metadata["contamination"] == clf.named_steps["cluster"].contamination
+            assert metadata["features"] == FEATURES_TO_USE_CLUSTER
+            assert datetime.fromisoformat(metadata["trained_at"]) <= datetime.now()
+
+        # LRU : seuls les 2 derniers modèles sont en mémoire, un modèle en mémoire n'est pas rechargé
+        assert list(model_registry.models) == [106, 110]
+        assert model_registry.load_model(110) is model_registry.load_model(110)
+
+        with pytest.raises(KeyError):
+            model_registry.load_model(9999)
+
+    # Nouvelle version du registre
+    create_model_registry(path_directory=path_directory, stations_id=[22])
+    with ModelRegistry(path_directory=path_directory) as model_registry:
+        assert model_registry.version == 2
+        assert model_registry.stations_id == [22]
+
+
+def test_score_all_stations(ts_activity_stations, tmp_path):
+    """
+    Score de tout le réseau en une passe : mêmes anomalies que predict_anomalies_station() et même score
+    que logistic_predict_proba_from_model(clf.decision_function()), null pour les stations sans modèle.
+    """
+
+    path_directory = str(tmp_path) + "/"
+    train_cluster_stations(
+        ts_activity_stations, [22, 106], {22: "hight", 106: "very high"}, path_directory=path_directory, max_workers=1
+    )
+    create_model_registry(path_directory=path_directory)
+
+    # Données non triées, dont une station sans modèle (110)
+    latest_data = ts_activity_stations.sort("date", descending=True)
+    with ModelRegistry(path_directory=path_directory) as model_registry:
+        network_pred = score_all_stations(latest_data, model_registry=model_registry)
+
+    assert network_pred.get_column("station_id").unique().to_list() == [22, 106, 110]
+    assert network_pred.height == ts_activity_stations.collect().height
+
+    for station_id in [22, 106]:
+        clf = load_model(station_id, path_directory=path_directory)
+        expected = predict_anomalies_station(ts_activity_stations, clf=clf, station_id=station_id)
+        expected = expected.with_columns(
+            anomaly_score=logistic_predict_proba_from_model(
+                clf.decision_function(expected.select(FEATURES_TO_USE_CLUSTER))
+            )
+            * 100
+        )
+        assert_frame_equal(network_pred.filter(pl.col("station_id") == station_id), expected)
+        assert_frame_equal(score_anomalies_station(ts_activity_stations, clf=clf, station_id=station_id), expected)
+
+    station_without_model = network_pred.filter(pl.col("station_id") == 110)
+    assert station_without_model.get_column("anomaly").is_null().all()
+    assert station_without_model.get_column("anomaly_score").is_null().all()
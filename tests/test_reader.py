@@ -1,7 +1,11 @@
+import os
+from unittest.mock import patch
+
 import pytest
 import polars as pl
 from datetime import datetime
 
+from vcub_keeper.reader.reader import get_station_profile_lookup, read_learning_dataset
 from vcub_keeper.reader.reader_utils import filter_periode
 from polars.testing import assert_frame_equal
 
@@ -45,3 +49,39 @@ def test_filter_period():
     result = filter_periode(data=df, non_use_station_id=[4])
 
     assert_frame_equal(result, expected_df)
+
+
+def test_get_station_profile_lookup(tmp_path):
+    """
+    Le profil des stations est lu une seule fois puis relu uniquement si le fichier est modifié
+    """
+
+    path_directory = str(tmp_path) + "/"
+    file = tmp_path / "station_profile.csv"
+    file.write_text("station_id,mean,profile_station_activity\n22,12.5,very high\n106,0.8,low\n")
+
+    profile_by_station = get_station_profile_lookup(path_directory=path_directory)
+    assert profile_by_station == {22: "very high", 106: "low"}
+
+    # Fichier inchangé : pas de relecture
+    with patch("vcub_keeper.reader.reader.read_station_profile") as read_station_profile_mock:
+        assert get_station_profile_lookup(path_directory=path_directory) is profile_by_station
+    read_station_profile_mock.assert_not_called()
+
+    # Fichier modifié : relecture
+    file.write_text("station_id,mean,profile_station_activity\n22,3.2,medium\n")
+    stat = file.stat()
+    os.utime(file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert get_station_profile_lookup(path_directory=path_directory) == {22: "medium"}
+
+
+def test_read_learning_dataset_partitioned_empty(tmp_path):
+    """
+    Un learning dataset partitionné sans fichier parquet lève une FileNotFoundError explicite.
+    """
+    (tmp_path / "learning_dataset" / "month=2025-01" / "station_bucket=0").mkdir(parents=True)
+
+    with pytest.raises(FileNotFoundError, match="Aucun fichier parquet"):
+        read_learning_dataset(file_path=f"{tmp_path}/")
+    with pytest.raises(FileNotFoundError, match="Aucun fichier parquet"):
+        read_learning_dataset(file_path=f"{tmp_path}/", station_id=106, start_date="2025-01-01")
@@ -6,7 +6,11 @@ from polars.testing import assert_frame_equal
 import numpy as np
 from vcub_keeper.ml.prediction_station.model import get_feature_to_use_for_model, train_model_for_station
 from vcub_keeper.ml.prediction_station.production import make_prediction_for_user
-from vcub_keeper.ml.prediction_station.transform import build_feat_for_regression
+from vcub_keeper.ml.prediction_station.transform import (
+    RegressionFeatureCache,
+    build_feat_for_regression,
+    build_feat_for_regression_by_station,
+)
 from vcub_keeper.ml.prediction_station.utils import create_target
 
 
@@ -232,3 +236,61 @@ def test_train_model_and_prediction(mock_histo_data):
     )
 
     assert prediction == 10
+
+
+@pytest.mark.parametrize("target_col", ["available_stands", "available_bikes"])
+def test_build_feat_for_regression_by_station(target_col):
+    """
+    Les features calculées pour toutes les stations en une passe sont identiques à celles calculées
+    station par station (fenêtres de 7 jours comprises, stations d'historiques différents).
+    """
+
+    rng = np.random.default_rng(2025)
+    station_dfs = []
+    for station_id, n_rows in [(1, 1200), (2, 50), (3, 1500)]:
+        station_dfs.append(
+            pl.DataFrame(
+                {
+                    "station_id": pl.Series([station_id] * n_rows, dtype=pl.UInt16),
+                    "date": pl.datetime_range(
+                        datetime(2025, 3, 1),
+                        datetime(2025, 3, 1) + timedelta(minutes=10 * (n_rows - 1)),
+                        "10m",
+                        eager=True,
+                    ),
+                    "available_stands": pl.Series(rng.integers(0, 30, size=n_rows), dtype=pl.UInt8),
+                    "available_bikes": pl.Series(rng.integers(0, 30, size=n_rows), dtype=pl.UInt8),
+                }
+            )
+        )
+    df_historical_station = pl.concat(station_dfs).lazy()
+
+    features = build_feat_for_regression_by_station(df_historical_station, target_col=target_col)
+
+    for station_id in [1, 2, 3]:
+        expected = build_feat_for_regression(
+            df_historical_station.filter(pl.col("station_id") == station_id), target_col=target_col
+        )
+        assert_frame_equal(features.filter(pl.col("station_id") == station_id), expected)
+
+
+def test_regression_feature_cache(mock_histo_data):
+    """
+    Le cache calcule les features une seule fois par colonne cible et les sert station par station
+    """
+
+    target_col = "available_bikes"
+    feature_cache = RegressionFeatureCache(mock_histo_data)
+
+    station_to_pred = feature_cache.get_station(102, target_col=target_col)
+    expected = build_feat_for_regression(mock_histo_data.filter(pl.col("station_id") == 102), target_col=target_col)
+    assert_frame_equal(station_to_pred, expected)
+
+    # Les features de la colonne cible ne sont pas recalculées
+    features_available_bikes = feature_cache.features_by_station[target_col]
+    feature_cache.get_station(101, target_col=target_col)
+    assert feature_cache.features_by_station[target_col] is features_available_bikes
+    assert list(feature_cache.features_by_station) == [target_col]
+
+    # Station absente de l'historique
+    assert feature_cache.get_station(999, target_col=target_col).shape == (0, expected.width)
@@ -5,6 +5,7 @@ import json
 
 from vcub_keeper.production.data import transform_json_api_bdx_station_data_to_df
 from vcub_keeper.config import ROOT_TESTS_DATA
+from vcub_keeper.reader.reader_utils import cast_to_schema
 
 
 def test_transf_json_to_df():
@@ -25,13 +26,37 @@ def test_transf_json_to_df():
     station_df_from_csv = pl.read_csv(
         ROOT_TESTS_DATA + "data_test_transf_json_to_df.csv",
         try_parse_dates=True,
-        schema_overrides={"station_id": pl.Int32, "status": pl.UInt8},
-    )
+    ).pipe(cast_to_schema)
 
     # assert len(station_df_from_json.compare(station_df_from_csv)) == 0
     assert_frame_equal(station_df_from_json, station_df_from_csv)
 
 
+def test_transf_json_bytes_to_df():
+    """
+    Le contenu brut de la réponse de l'API (bytes, une ou plusieurs réponses) donne
+    le même DataFrame que le json décodé.
+    """
+
+    with open(ROOT_TESTS_DATA + "data_test_api_from_bdx.json", "rb") as f:
+        station_bytes = f.read()
+    station_json_loaded = json.loads(station_bytes)
+
+    station_df_from_json = transform_json_api_bdx_station_data_to_df(station_json_loaded).collect()
+    station_df_from_bytes = transform_json_api_bdx_station_data_to_df(station_bytes).collect()
+    assert_frame_equal(station_df_from_bytes, station_df_from_json)
+
+    # Plusieurs réponses (chunks), dont une vide
+    features = station_json_loaded["features"]
+    station_bytes_chunks = [
+        json.dumps({"type": "FeatureCollection", "features": features[:100]}).encode(),
+        json.dumps({"type": "FeatureCollection", "features": []}).encode(),
+        json.dumps({"type": "FeatureCollection", "features": features[100:]}).encode(),
+    ]
+    station_df_from_chunks = transform_json_api_bdx_station_data_to_df(station_bytes_chunks).collect()
+    assert_frame_equal(station_df_from_chunks, station_df_from_json)
+
+
 def test_transf_json_to_df_with_new_status_value_165():
     """
     Check la fonction de transformation de données entre le json (from API call)
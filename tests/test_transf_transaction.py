@@ -3,14 +3,22 @@ import pandas as pd
 import polars as pl
 from polars.testing import assert_frame_equal
 import numpy as np
-from datetime import datetime
+from datetime import datetime, timedelta
 
+from vcub_keeper.config import DTYPE_ENCODING_TIME, SCHEMA_ACTIVITY
+from vcub_keeper.reader.reader_utils import cast_to_schema
 from vcub_keeper.transform.features_factory import (
+    ConsecutiveNoTransactionsOutState,
     get_transactions_out,
     get_transactions_in,
     get_transactions_all,
+    get_transactions,
     get_consecutive_no_transactions_out,
     get_encoding_time,
+    get_meteo,
+    get_rolling_extrema,
+    is_sorted_by_station_,
+    is_streamable,
 )
 
 
@@ -59,7 +67,7 @@ def test_get_transactions_out():
 
     result = get_transactions_out(df_activite)
 
-    expected = pl.LazyFrame(data)
+    expected = pl.LazyFrame(data).with_columns(pl.col("transactions_out").cast(SCHEMA_ACTIVITY["transactions_out"]))
 
     assert_frame_equal(result, expected)
 
@@ -109,7 +117,7 @@ def test_get_transactions_in():
 
     result = get_transactions_in(df_activite)
 
-    expected = pl.LazyFrame(data)
+    expected = pl.LazyFrame(data).with_columns(pl.col("transactions_in").cast(SCHEMA_ACTIVITY["transactions_in"]))
 
     assert_frame_equal(result, expected)
 
@@ -159,7 +167,28 @@ def test_get_transactions_all():
 
     result = get_transactions_all(df_activite)
 
-    expected = pl.LazyFrame(data)
+    expected = pl.LazyFrame(data).with_columns(pl.col("transactions_all").cast(SCHEMA_ACTIVITY["transactions_all"]))
+
+    assert_frame_equal(result, expected)
+
+
+def test_get_transactions():
+    """
+    test de la fonction get_transactions() : identique à get_transactions_in(), get_transactions_out()
+    puis get_transactions_all(), y compris avec des valeurs manquantes et des stations non triées
+    """
+    data = {
+        "station_id": [1, 1, 22, 1, 22, 22, 1, 22],
+        "available_stands": [11, 14, 33, None, 31, 33, 17, None],
+        "available_bikes": [9, 6, 0, None, 2, 0, 3, 1],
+        "date": [datetime(2017, 7, 9, 11, minute) for minute in range(0, 40, 5)],
+    }
+
+    df_activite = pl.LazyFrame(data)
+
+    result = get_transactions(df_activite)
+
+    expected = df_activite.pipe(get_transactions_in).pipe(get_transactions_out).pipe(get_transactions_all)
 
     assert_frame_equal(result, expected)
 
@@ -212,11 +241,182 @@ def test_get_consecutive_no_transactions_out():
 
     result = df_activite.pipe(get_transactions_out).pipe(get_consecutive_no_transactions_out)
 
-    expected = pl.LazyFrame(data)
+    expected = pl.LazyFrame(data).pipe(
+        cast_to_schema,
+        schema={k: SCHEMA_ACTIVITY[k] for k in ["transactions_out", "consecutive_no_transactions_out"]},
+    )
 
     pl.testing.assert_frame_equal(result, expected)
 
 
+@pytest.mark.parametrize("is_sorted", [False, True])
+def test_get_features_sorted(is_sorted):
+    """
+    Le mode pré-trié (is_sorted=True, segments contigus sans .over("station_id")) de get_transactions()
+    et get_consecutive_no_transactions_out() donne le même résultat que le calcul par station
+    """
+    rng = np.random.default_rng(42)
+    n_rows = 1000
+    data = pl.DataFrame(
+        {
+            "station_id": np.sort(rng.integers(1, 20, n_rows)).astype(np.int32),
+            "date": [datetime(2024, 1, 1)] * n_rows,
+            "available_stands": rng.integers(0, 5, n_rows),
+            "available_bikes": rng.integers(0, 5, n_rows),
+            "status": rng.choice([0, 1], n_rows, p=[0.1, 0.9]).astype(np.uint8),
+        }
+    ).with_columns(available_stands=pl.when(pl.int_range(pl.len()) % 97 == 0).then(None).otherwise("available_stands"))
+
+    expected = (
+        data.lazy()
+        .pipe(get_transactions, is_sorted=False)
+        .pipe(get_consecutive_no_transactions_out, is_sorted=False)
+        .collect()
+    )
+
+    result = (
+        data.lazy()
+        .pipe(get_transactions, is_sorted=is_sorted)
+        .pipe(get_consecutive_no_transactions_out, is_sorted=is_sorted)
+        .collect()
+    )
+
+    assert_frame_equal(result, expected)
+
+
+def test_is_sorted_by_station_():
+    """
+    Détection du mode pré-trié à partir des métadonnées de tri de Polars
+    """
+    data = pl.DataFrame(
+        {
+            "station_id": [22, 1, 22, 1],
+            "date": [datetime(2024, 1, 1, 0, minute) for minute in [0, 0, 10, 10]],
+            "available_stands": [1, 2, 3, 4],
+            "available_bikes": [4, 3, 2, 1],
+        }
+    )
+
+    assert not is_sorted_by_station_(data)
+    assert not is_sorted_by_station_(data.sort(["station_id", "date"]).lazy())
+
+    data_sorted = data.sort(["station_id", "date"])
+    assert is_sorted_by_station_(data_sorted)
+
+    # Détection automatique (is_sorted=None) sur un DataFrame trié
+    assert_frame_equal(get_transactions(data_sorted), get_transactions(data).sort(["station_id", "date"]))
+
+
+def test_consecutive_no_transactions_out_state():
+    """
+    Le calcul incrémental (ConsecutiveNoTransactionsOutState) par batch donne le même résultat
+    que get_transactions() puis get_consecutive_no_transactions_out() sur tout l'historique,
+    y compris pour une station absente d'un batch ou qui apparait en cours de route.
+    """
+    rng = np.random.default_rng(0)
+    n_dates = 300
+    data = pl.DataFrame(
+        {
+            "station_id": np.repeat(np.arange(1, 6, dtype=np.int32), n_dates),
+            "date": pl.datetime_range(
+                datetime(2024, 1, 1), datetime(2024, 1, 1) + (n_dates - 1) * timedelta(minutes=10), "10m", eager=True
+            ).to_list()
+            * 5,
+            "available_stands": rng.choice([10, 11], n_dates * 5, p=[0.9, 0.1]),
+            "available_bikes": rng.integers(2, 20, n_dates * 5),
+            "status": rng.choice([0, 1], n_dates * 5, p=[0.02, 0.98]).astype(np.uint8),
+        }
+    ).with_columns(available_stands=pl.when(pl.int_range(pl.len()) % 53 == 0).then(None).otherwise("available_stands"))
+    # Station 5 : pas de données dans l'historique
+    data = data.filter((pl.col("station_id") != 5) | (pl.col("date") >= datetime(2024, 1, 2, 12)))
+
+    expected = data.lazy().pipe(get_transactions).pipe(get_consecutive_no_transactions_out).collect()
+
+    date_batches = [datetime(2024, 1, 1), datetime(2024, 1, 2, 12), datetime(2024, 1, 2, 12, 30), datetime(2024, 1, 3)]
+    batches = [
+        data.filter(pl.col("date").is_between(start, end, closed="left"))
+        for start, end in zip(date_batches, date_batches[1:] + [datetime(2024, 1, 4)])
+    ]
+    # Station 3 absente d'un batch
+    batches[2] = batches[2].filter(pl.col("station_id") != 3)
+    batches[3] = pl.concat(
+        [
+            data.filter(pl.col("station_id") == 3, pl.col("date").is_between(date_batches[2], date_batches[3], "left")),
+            batches[3],
+        ]
+    )
+
+    features_state = ConsecutiveNoTransactionsOutState()
+    result = []
+    for batch in batches:
+        result.append(features_state.update(batch))
+        # Des séquences en cours à la fin du batch
+        assert features_state.state["consecutive_no_transactions_out"].max() > 1
+    result = pl.concat(result).sort(["station_id", "date"])
+
+    assert_frame_equal(result, expected)
+    assert_frame_equal(
+        features_state.state,
+        expected.group_by("station_id", maintain_order=True)
+        .last()
+        .select(ConsecutiveNoTransactionsOutState.STATE_COLUMNS),
+    )
+
+    # Reprise à partir d'un état sauvegardé
+    features_state_restored = ConsecutiveNoTransactionsOutState(state=features_state.state)
+    assert_frame_equal(features_state_restored.state, features_state.state)
+
+
+def test_get_meteo():
+    """
+    test de la fonction get_meteo() : jointure de la météo à l'heure (ordre de l'activité conservé,
+    valeurs manquantes si pas de météo pour l'heure)
+    """
+    data = pl.LazyFrame(
+        {
+            "station_id": [1, 1, 1, 22, 22],
+            "date": [
+                datetime(2020, 9, 17, 19, 4),
+                datetime(2020, 9, 17, 19, 54),
+                datetime(2020, 9, 17, 21, 14),
+                datetime(2020, 9, 17, 20, 0),
+                datetime(2020, 9, 17, 20, 59),
+            ],
+        }
+    )
+    meteo = pl.LazyFrame(
+        {
+            "date": [datetime(2020, 9, 17, 19), datetime(2020, 9, 17, 20), datetime(2020, 9, 17, 22)],
+            "temperature": [26.4, 24.2, 24.4],
+            "wind_speed": [1.5, 0.5, 3.1],
+        }
+    )
+
+    result = get_meteo(data=data, meteo=meteo)
+
+    expected = data.with_columns(
+        temperature=pl.Series([26.4, 26.4, None, 24.2, 24.2]),
+        wind_speed=pl.Series([1.5, 1.5, None, 0.5, 0.5]),
+    )
+
+    assert_frame_equal(result, expected)
+
+    # Ordre de l'activité (station_id, date) conservé sur un historique plus long
+    dates = pl.datetime_range(datetime(2020, 1, 1), datetime(2020, 3, 1), interval="10m", eager=True)
+    data = pl.LazyFrame(
+        {
+            "station_id": pl.Series(np.repeat(np.arange(1, 21), len(dates)), dtype=pl.UInt16),
+            "date": pl.concat([dates] * 20),
+        }
+    )
+    meteo = pl.LazyFrame({"date": pl.datetime_range(datetime(2020, 1, 1), datetime(2020, 3, 1), "1h", eager=True)})
+    meteo = meteo.with_columns(temperature=pl.int_range(pl.len()).cast(pl.Float64))
+
+    result = get_meteo(data=data, meteo=meteo).collect()
+
+    assert_frame_equal(result.select("station_id", "date"), data.collect())
+
+
 def test_get_encoding_time_quarter():
     """
     test de la fonction get_encoding_time() pour les trimestres
@@ -231,8 +431,8 @@ def test_get_encoding_time_quarter():
 
     result = get_encoding_time(data, "quarter", max_val=4)
 
-    expected_sin = np.sin(2 * np.pi * data["quarter"] / 4)
-    expected_cos = np.cos(2 * np.pi * data["quarter"] / 4)
+    expected_sin = np.sin(2 * np.pi * data["quarter"] / 4).cast(DTYPE_ENCODING_TIME)
+    expected_cos = np.cos(2 * np.pi * data["quarter"] / 4).cast(DTYPE_ENCODING_TIME)
 
     pl.testing.assert_series_equal(result["Sin_quarter"], expected_sin, check_names=False)
     pl.testing.assert_series_equal(result["Cos_quarter"], expected_cos, check_names=False)
@@ -252,8 +452,8 @@ def test_get_encoding_time_weekday():
 
     result = get_encoding_time(data, "weekday", max_val=7)
 
-    expected_sin = np.sin(2 * np.pi * data["weekday"] / 7)
-    expected_cos = np.cos(2 * np.pi * data["weekday"] / 7)
+    expected_sin = np.sin(2 * np.pi * data["weekday"] / 7).cast(DTYPE_ENCODING_TIME)
+    expected_cos = np.cos(2 * np.pi * data["weekday"] / 7).cast(DTYPE_ENCODING_TIME)
 
     pl.testing.assert_series_equal(result["Sin_weekday"], expected_sin, check_names=False)
     pl.testing.assert_series_equal(result["Cos_weekday"], expected_cos, check_names=False)
@@ -275,8 +475,110 @@ def test_get_encoding_time_hours():
 
     result = get_encoding_time(data, "hours", max_val=24)
 
-    expected_sin = np.sin(2 * np.pi * data["hours"] / 24)
-    expected_cos = np.cos(2 * np.pi * data["hours"] / 24)
+    expected_sin = np.sin(2 * np.pi * data["hours"] / 24).cast(DTYPE_ENCODING_TIME)
+    expected_cos = np.cos(2 * np.pi * data["hours"] / 24).cast(DTYPE_ENCODING_TIME)
 
     pl.testing.assert_series_equal(result["Sin_hours"], expected_sin, check_names=False)
     pl.testing.assert_series_equal(result["Cos_hours"], expected_cos, check_names=False)
+
+
+def test_get_encoding_time_minutes():
+    """
+    test de la fonction get_encoding_time() pour les minutes (table de 60 valeurs)
+    """
+
+    data = pl.DataFrame(
+        {
+            "date": pl.datetime_range(
+                start=datetime(2022, 1, 1, 0, 0, 0), end=datetime(2022, 1, 1, 0, 59, 0), interval="1m", eager=True
+            ),
+            "minutes": list(range(60)),
+        }
+    )
+
+    result = get_encoding_time(data, "minutes", max_val=6, n_values=60)
+
+    expected_sin = np.sin(2 * np.pi * data["minutes"] / 6).cast(DTYPE_ENCODING_TIME)
+    expected_cos = np.cos(2 * np.pi * data["minutes"] / 6).cast(DTYPE_ENCODING_TIME)
+
+    pl.testing.assert_series_equal(result["Sin_minutes"], expected_sin, check_names=False, atol=1e-6)
+    pl.testing.assert_series_equal(result["Cos_minutes"], expected_cos, check_names=False, atol=1e-6)
+
+
+@pytest.mark.parametrize("dtype", [pl.Int8, pl.UInt8, pl.Int64, pl.Float32, pl.Float64])
+def test_get_encoding_time_out_of_table(dtype):
+    """
+    Les valeurs hors de la table pré-calculée (entiers > max_val, négatifs) et les colonnes décimales
+    sont encodées par le calcul sin / cos (comme avant les tables pré-calculées)
+    """
+
+    values = [0, 5, 6, 59, 3, None] if dtype == pl.UInt8 else [0, 5, 6, 59, -3, None]
+    data = pl.LazyFrame({"minutes": pl.Series(values, dtype=dtype)})
+
+    result = get_encoding_time(data, "minutes", max_val=6).collect()
+
+    expected = (pl.Series(values, dtype=pl.Float64) * 2 * np.pi / 6).alias("Sin_minutes")
+    pl.testing.assert_series_equal(
+        result["Sin_minutes"], expected.sin().cast(DTYPE_ENCODING_TIME), check_names=False, atol=1e-6
+    )
+    pl.testing.assert_series_equal(
+        result["Cos_minutes"], expected.cos().cast(DTYPE_ENCODING_TIME), check_names=False, atol=1e-6
+    )
+
+    with pytest.raises(ValueError, match="n_values"):
+        get_encoding_time(data, "minutes", max_val=6, n_values=0)
+
+
+@pytest.mark.parametrize("col", ["available_bikes", "available_bikes_with_null", "ratio"])
+def test_get_rolling_extrema(col):
+    """
+    Les max / min glissants calculés en une passe sur les données triées sont identiques à ceux de
+    Polars par station (rolling_max / rolling_min .over("station_id")), y compris avec des valeurs nulles
+    et des stations dont l'historique est plus court que la fenêtre.
+    """
+
+    rng = np.random.default_rng(2025)
+    n_rows_by_station = [1200, 50, 1008, 1007, 3000]
+    n_rows = sum(n_rows_by_station)
+    available_bikes = rng.integers(0, 30, size=n_rows)
+    data = pl.DataFrame(
+        {
+            "station_id": pl.Series(np.repeat(np.arange(1, 6), n_rows_by_station), dtype=pl.UInt16),
+            "available_bikes": pl.Series(available_bikes, dtype=pl.UInt8),
+            "available_bikes_with_null": pl.Series(available_bikes, dtype=pl.UInt8).scatter(
+                np.flatnonzero(rng.random(n_rows) < 0.01), None
+            ),
+            "ratio": rng.random(n_rows),
+        }
+    )
+
+    result = get_rolling_extrema(data.lazy(), col, is_sorted=True)
+    expected = get_rolling_extrema(data.lazy(), col, is_sorted=False)
+
+    assert_frame_equal(result, expected)
+    assert result.collect_schema().names()[-8:] == [
+        f"{col}_rolling_{agg}_{name}" for agg in ["max", "min"] for name in ["6", "12", "1d", "7d"]
+    ]
+
+
+def test_get_rolling_extrema_windows_not_nested():
+    """
+    Les fenêtres qui ne sont pas des multiples les unes des autres (ou plus longues que les données)
+    sont calculées dans le même appel. Le calcul porte sur toute la colonne : le plan n'est pas
+    exécuté par le moteur streaming.
+    """
+
+    rng = np.random.default_rng(2025)
+    data = pl.DataFrame(
+        {
+            "station_id": pl.Series(np.repeat([1, 2, 3], [40, 3, 200]), dtype=pl.UInt16),
+            "available_bikes": pl.Series(rng.integers(0, 30, size=243), dtype=pl.UInt8),
+        }
+    ).lazy()
+    windows = {"1": 1, "7": 7, "5": 5, "33": 33, "250": 250}
+
+    result = get_rolling_extrema(data, "available_bikes", windows=windows, is_sorted=True)
+    expected = get_rolling_extrema(data, "available_bikes", windows=windows, is_sorted=False)
+
+    assert_frame_equal(result, expected)
+    assert not is_streamable(result)